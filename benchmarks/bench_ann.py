@@ -0,0 +1,63 @@
+"""
+Benchmark: recall@k vs. latency of the IVF index against exact search.
+
+Usage:
+    python -m benchmarks.bench_ann [--size 200000] [--dim 64] [--n-lists 256]
+"""
+import argparse
+import logging
+import time
+import numpy as np
+from memory_store.vector_db import VectorDatabase
+
+
+def clustered_data(size: int, dim: int, clusters: int, rng) -> np.ndarray:
+    """Gaussian mixture, closer to real embeddings than isotropic noise"""
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size)
+    return centers[labels] + 0.5 * rng.standard_normal((size, dim)).astype(np.float32)
+
+
+def timed_search(db: VectorDatabase, queries: np.ndarray, top_k: int, nprobe: int = None):
+    ids, start = [], time.perf_counter()
+    for query in queries:
+        ids.append({r["metadata"] for r in db.search(query, top_k, nprobe=nprobe)})
+    return ids, (time.perf_counter() - start) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--n-lists", type=int, default=256)
+    parser.add_argument("--nprobe", default="1,2,4,8,16,32,64")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    rng = np.random.default_rng(0)
+    data = clustered_data(args.size, args.dim, 100, rng)
+    queries = clustered_data(args.queries, args.dim, 100, rng)
+
+    exact = VectorDatabase(dim=args.dim)
+    ivf = VectorDatabase(dim=args.dim, index="ivf", index_params={"n_lists": args.n_lists})
+    for i, row in enumerate(data):
+        exact.add(row, i)
+    start = time.perf_counter()
+    for i, row in enumerate(data):
+        ivf.add(row, i)
+    print(f"size={args.size} dim={args.dim} n_lists={args.n_lists} top_k={args.top_k} "
+          f"ivf build={time.perf_counter() - start:.2f}s")
+
+    truth, exact_ms = timed_search(exact, queries, args.top_k)
+    print(f"{'nprobe':>8} {'recall@k':>9} {'ms/query':>9}")
+    print(f"{'exact':>8} {1.0:9.3f} {exact_ms:9.2f}")
+    for nprobe in (int(n) for n in args.nprobe.split(",")):
+        found, ms = timed_search(ivf, queries, args.top_k, nprobe)
+        recall = np.mean([len(f & t) / len(t) for f, t in zip(found, truth)])
+        print(f"{nprobe:>8} {recall:9.3f} {ms:9.2f}")
+
+
+if __name__ == "__main__":
+    main()
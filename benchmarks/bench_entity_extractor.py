@@ -0,0 +1,73 @@
+"""
+Benchmark: entity extraction throughput and graph input size, EntityExtractor vs. the old whitespace split.
+
+Usage:
+    python -m benchmarks.bench_entity_extractor [--texts 5000] [--words 300]
+"""
+import argparse
+import time
+import numpy as np
+from memory_store.entity_extractor import EntityExtractor, STOPWORDS
+
+TECH_TERMS = [
+    "flask", "numpy", "gunicorn", "docker", "kubernetes", "main.py", "os.path.join", "vector_db",
+    "Knowledge Graph", "Memory Node", "New York", "PyTorch", "embedding", "orchestrator", "latency",
+    "throughput", "database", "index", "query", "cache", "server", "client", "request", "response",
+]
+FILLER = sorted(STOPWORDS) + ["really", "thing", "things", "something", "basically", "actually"]
+
+
+def synthetic_texts(count: int, words: int, rng, vocabulary: int = 5000) -> list:
+    """LLM-output-like text: mostly filler and stopwords, Zipf-distributed terms, punctuation"""
+    terms = TECH_TERMS + [f"{TECH_TERMS[i % len(TECH_TERMS)].split()[0]}_{i}" for i in range(vocabulary)]
+    texts = []
+    for _ in range(count):
+        tokens = []
+        for _ in range(words):
+            r = rng.random()
+            if r < 0.25:
+                tokens.append(terms[min(rng.zipf(1.3), len(terms)) - 1])
+            elif r < 0.3:
+                tokens.append(f"{rng.integers(1000)}.")
+            else:
+                tokens.append(FILLER[rng.integers(len(FILLER))] + ("," if r > 0.95 else ""))
+        texts.append(" ".join(tokens))
+    return texts
+
+
+def legacy_extract(text: str) -> list:
+    return [word for word in text.split() if len(word) > 4]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--texts", type=int, default=5000)
+    parser.add_argument("--words", type=int, default=300)
+    parser.add_argument("--batch", type=int, default=64)
+    args = parser.parse_args()
+
+    texts = synthetic_texts(args.texts, args.words, np.random.default_rng(0))
+    mb = sum(len(t) for t in texts) / 1e6
+
+    start = time.perf_counter()
+    legacy = [list(set(legacy_extract(t))) for t in texts]
+    legacy_s = time.perf_counter() - start
+
+    extractor = EntityExtractor()
+    start = time.perf_counter()
+    extracted = []
+    for i in range(0, len(texts), args.batch):
+        extracted.extend(extractor.extract_batch(texts[i:i + args.batch]))
+    new_s = time.perf_counter() - start
+
+    print(f"texts={args.texts} words/text={args.words} ({mb:.1f} MB)")
+    print(f"{'extractor':>10} {'texts/s':>9} {'MB/s':>6} {'entities/text':>14} {'clique edges/text':>18}")
+    for name, seconds, lists in (("legacy", legacy_s, legacy), ("new", new_s, extracted)):
+        sizes = np.array([len(entities) for entities in lists])
+        print(f"{name:>10} {args.texts / seconds:9.0f} {mb / seconds:6.1f} {sizes.mean():14.1f} "
+              f"{(sizes * (sizes - 1) / 2).mean():18.0f}")
+    print(f"sample: {extracted[0][:12]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark: per-call overhead of the LLM backends against the local Ollama stub,
+pooled keep-alive session vs. a new connection per call vs. `ollama run` (if installed).
+
+Usage:
+    python -m benchmarks.bench_llm_backend [--calls 500] [--threads 4]
+"""
+import argparse
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from benchmarks.ollama_stub import serve
+from core.llm_backends import OllamaHTTPBackend, OllamaCLIBackend
+
+PROMPT = "You are Kamil, an advanced AI assistant.\n" * 20 + "Summarize the last conversation."
+
+
+class UnpooledBackend(OllamaHTTPBackend):
+    """Same requests, but a fresh connection for every call"""
+
+    def generate(self, model, prompt, max_tokens=1024, temperature=None, timeout=None):
+        response = requests.post(f"{self.base_url}/api/generate", json={
+            "model": model, "prompt": prompt, "stream": False, "options": {"num_predict": max_tokens}
+        }, timeout=timeout)
+        return response.json()["response"]
+
+
+def run(backend, calls: int, threads: int) -> float:
+    """Calls per second"""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(lambda _: backend.generate("stub:latest", PROMPT, timeout=30), range(calls)))
+    return calls / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    server = serve()
+    url = f"http://127.0.0.1:{server.port}"
+    backends = [("http pooled", OllamaHTTPBackend(base_url=url)), ("http unpooled", UnpooledBackend(base_url=url))]
+    if shutil.which("ollama"):
+        backends.append(("ollama run", OllamaCLIBackend()))
+
+    print(f"calls={args.calls} threads={args.threads}")
+    print(f"{'backend':>14} {'calls/s':>9} {'ms/call':>8}")
+    for name, backend in backends:
+        calls = args.calls if name != "ollama run" else min(args.calls, 20)
+        rate = run(backend, calls, args.threads)
+        print(f"{name:>14} {rate:9.0f} {1000 * args.threads / rate:8.2f}")
+        backend.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
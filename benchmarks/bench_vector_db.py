@@ -0,0 +1,74 @@
+"""
+Benchmark: VectorDatabase insert/search, legacy list-of-lists path vs the
+contiguous float32 matrix.
+
+Usage:
+    python -m benchmarks.bench_vector_db [--sizes 10000,100000,1000000] [--dim 64]
+"""
+import argparse
+import logging
+import time
+import numpy as np
+from memory_store.vector_db import VectorDatabase
+
+
+def legacy_search(vectors: list, query_vector, top_k: int = 5) -> np.ndarray:
+    """The original search path: rebuild the matrix and all norms per query"""
+    matrix = np.array(vectors)
+    query_vec = np.array(query_vector)
+    norm_vectors = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+    similarities = np.dot(norm_vectors, query_vec / np.linalg.norm(query_vec))
+    return np.argsort(similarities)[-top_k:][::-1]
+
+
+def _time_per_call(fn, repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def run(size: int, dim: int, queries: int, top_k: int, skip_legacy: bool):
+    rng = np.random.default_rng(0)
+    data = rng.standard_normal((size, dim)).astype(np.float32)
+    query_set = rng.standard_normal((queries, dim)).astype(np.float32)
+
+    db = VectorDatabase(dim=dim)
+    start = time.perf_counter()
+    for row in data:
+        db.add(row, None)
+    insert_s = time.perf_counter() - start
+
+    it = iter(query_set)
+    new_ms = _time_per_call(lambda: db.search(next(it), top_k), queries)
+
+    legacy_ms = None
+    if not skip_legacy:
+        vectors = data.tolist()
+        it = iter(query_set.tolist())
+        legacy_ms = _time_per_call(lambda: legacy_search(vectors, next(it), top_k), queries)
+
+    legacy_col = f"{legacy_ms:10.2f}" if legacy_ms is not None else f"{'skipped':>10}"
+    speedup = f"{legacy_ms / new_ms:7.1f}x" if legacy_ms is not None else f"{'-':>8}"
+    print(f"{size:>9} {insert_s:10.2f} {legacy_col} {new_ms:10.2f} {speedup}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--legacy-max", type=int, default=1000000,
+                        help="skip the legacy path above this size (it holds Python floats)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    print(f"dim={args.dim} queries={args.queries} top_k={args.top_k}")
+    print(f"{'vectors':>9} {'insert s':>10} {'legacy ms':>10} {'new ms':>10} {'speedup':>8}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        run(size, args.dim, args.queries, args.top_k, size > args.legacy_max)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Local stand-in for the Ollama REST API, for exercising the LLM backends
+without a model: /api/generate answers with a deterministic echo of the
+prompt, either whole or streamed as NDJSON chunks like Ollama does.
+
+Usage:
+    python -m benchmarks.ollama_stub [--port 11434] [--delay 0.0] [--token-delay 0.0]
+"""
+import argparse
+import json
+import logging
+import threading
+import time
+from flask import Flask, Response, jsonify, request
+from werkzeug.serving import make_server
+
+
+def stub_response(prompt: str) -> str:
+    words = prompt.split()
+    return "Stub answer to: " + " ".join(words[-12:])
+
+
+def create_app(delay: float = 0.0, token_delay: float = 0.0) -> Flask:
+    """`delay` seconds before answering (model latency), `token_delay` between streamed words"""
+    app = Flask("ollama_stub")
+    app.calls = 0
+
+    @app.route("/api/version", methods=["GET"])
+    def version():
+        return jsonify({"version": "stub"})
+
+    @app.route("/api/tags", methods=["GET"])
+    def tags():
+        return jsonify({"models": [{"name": "stub:latest"}]})
+
+    @app.route("/api/generate", methods=["POST"])
+    def generate():
+        data = request.json
+        app.calls += 1
+        time.sleep(delay)
+        words = stub_response(data.get("prompt", "")).split(" ")
+        words = words[:data.get("options", {}).get("num_predict", len(words))]
+        if not data.get("stream", True):
+            return jsonify({"model": data.get("model"), "response": " ".join(words), "done": True})
+
+        def chunks():
+            for i, word in enumerate(words):
+                time.sleep(token_delay)
+                piece = word if i == 0 else " " + word
+                yield json.dumps({"model": data.get("model"), "response": piece, "done": False}) + "\n"
+            yield json.dumps({"model": data.get("model"), "response": "", "done": True}) + "\n"
+        return Response(chunks(), mimetype="application/x-ndjson")
+
+    return app
+
+
+def serve(port: int = 0, host: str = "127.0.0.1", **options):
+    """Run the stub in a background thread; returns the server (its port is server.port)"""
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)  # no per-request access log
+    server = make_server(host, port, create_app(**options), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--delay", type=float, default=0.0)
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    args = parser.parse_args()
+    server = serve(args.port, delay=args.delay, token_delay=args.token_delay)
+    print(f"Ollama stub listening on 127.0.0.1:{server.port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
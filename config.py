@@ -1,4 +1,35 @@
 MODEL_NAME = "mistral:latest"  # Or "llama3", "mixtral", etc.
 TIMEOUT_SECONDS = 300
-MAX_MEMORY_ITEMS = 1000
+LLM_BACKEND = "ollama"  # "ollama" (REST API, pooled keep-alive connections) or "ollama-cli" (`ollama run` per call)
+OLLAMA_URL = "http://localhost:11434"  # Ollama server used by the "ollama" backend
+OLLAMA_KEEP_ALIVE = "30m"  # How long Ollama keeps the model loaded after a request
+LLM_WORKERS = 4  # Queued generations LLMEngine runs concurrently against the backend
+MAX_MEMORY_ITEMS = 1000  # Hot memory cap; least important items are demoted to the cold tier
+MEMORY_HALF_LIFE_SECONDS = 7 * 24 * 3600  # Decay of retrieval-hit importance used for eviction
 EMBEDDING_MODEL = "all-MiniLM-L6-v2"  # For sentence embeddings
+EMBEDDING_BACKEND = "hashing"  # "hashing" (offline, 512-d) or "sentence-transformer" (EMBEDDING_MODEL on CPU)
+EMBEDDING_CACHE_SIZE = 10000  # Embeddings kept in the in-memory LRU
+QUERY_CACHE_SIZE = 1024  # Retrieval results cached until the next memory write
+VECTOR_INDEX = "flat"  # "flat" (exact) or "ivf" (approximate, for large stores)
+VECTOR_QUANTIZATION = "none"  # "none", "int8" or "pq" (compact codes in RAM, exact re-rank from disk)
+MEMORY_STORAGE_PATH = "memory_data"  # On-disk memory for the memory node
+INGESTION_WORKERS = 2  # Background threads embedding and committing stored interactions
+INGESTION_QUEUE_SIZE = 1024  # Pending interactions before store calls block
+INGESTION_BATCH_SIZE = 64  # Interactions embedded and committed together
+REPLICATION_LOG_SIZE = 100000  # Write-log entries a primary memory node keeps for replicas to catch up from
+REPLICA_POLL_INTERVAL = 0.5  # Seconds between a replica's pulls of the primary's write log
+REPLICA_MAX_LAG_SECONDS = 5.0  # A replica further behind refuses reads, so they fall back to the primary
+NODE_HEALTH_INTERVAL = 10.0  # Seconds between the orchestrator's health checks of registered nodes
+NODE_HEALTH_FAILURES = 3  # Consecutive failed checks before a node is dropped (memory nodes leave the ring)
+MEMORY_SNAPSHOT_INTERVAL = 300  # Seconds between snapshots of persistent memory's indexes and graph (0 disables)
+AGENT_MEMORY_PATH = "memory_data/agent"  # On-disk memory of the monolithic KamilAgent
+RESPONSE_CACHE_SIZE = 512  # Generated LLM responses kept in the in-memory LRU
+RESPONSE_CACHE_TTL = 24 * 3600  # Seconds a cached LLM response stays valid
+RESPONSE_CACHE_PATH = "memory_data/llm_responses.sqlite"  # On-disk tier of the response cache (None: in-memory only)
+SEMANTIC_CACHE_ENABLED = False  # Answer paraphrases of earlier user turns from the semantic cache (opt-in)
+SEMANTIC_CACHE_THRESHOLD = 0.92  # Cosine similarity of user turns needed to reuse an answer
+SEMANTIC_CACHE_SIZE = 2000  # Entries in the semantic cache's index; the least recently used are replaced
+SEMANTIC_CACHE_INTENTS = {  # Intents whose answers may be reused (context and history are not compared)
+    "chat": True, "general": True, "research": True,
+    "coding": False, "automation": False, "file_operation": False, "ml_training": False,
+}
@@ -1,10 +1,12 @@
 import logging
 import re
 from core.memory import VectorMemory
+from core.ingestion import IngestionQueue
 from core.model_manager import ModelPool
 from core.task_orchestrator import TaskOrchestrator
 from core.llm_engine import LLMEngine
 from tools.tool_registry import ToolRegistry
+from config import AGENT_MEMORY_PATH
 SAFETY_KEYWORDS = [
     "kill myself", "suicide", "self-harm", 
     "end my life", "want to die"
@@ -18,7 +20,9 @@ FILE_COMMANDS = [
 class KamilAgent:
     def __init__(self):
         # Phase 1: Create basic components without dependencies
-        self.memory = VectorMemory()
+        # Persistent memory warm-starts from its last snapshot
+        self.memory = VectorMemory(storage_path=AGENT_MEMORY_PATH)
+        self.ingestion = IngestionQueue(self.memory)
         self.logger = logging.getLogger("KamilAgent")
         
         # Phase 2: Create LLM engine (needs memory and will get tools later)
@@ -45,7 +49,17 @@ class KamilAgent:
         
         # Start services
         self.llm_engine.start()
+        self.model_pool.llm_engine.start()
         self.logger.info("Agent initialized")
+
+    def shutdown(self):
+        """Stop the LLM engines, commit queued interactions, then close persistent memory (writing its final snapshot)"""
+        self.llm_engine.stop()
+        self.model_pool.llm_engine.stop()
+        self.ingestion.close()
+        self.memory.close()
+        self.logger.info("Agent shut down")
+
     def is_smalltalk(self, text):
         greetings = ["hello", "hi", "hey", "how are you", "what's up", "yo", "sup", "good morning", "good evening"]
         text = text.lower()
@@ -77,8 +91,9 @@ class KamilAgent:
         results = self.task_orchestrator.execute_plan(plan, user_input)
 
         
-        # Update memory
-        self.memory.store_interaction(user_input, results)
+        # Update memory (embedded and committed in the background)
+        self.ingestion.submit(user_input, results,
+                              metadata={"task_type": task_type, "source": "agent"})
         
         # Format final response
         if task_type == "research":
@@ -87,7 +102,18 @@ class KamilAgent:
             return results.get('show_code', 'Code generated successfully')
         else:
             return "\n".join([f"{k}: {v}" for k, v in results.items()])
-    
+
+    def process_request_stream(self, user_input, context=None, history=None):
+        """Like process_request, but yields the response in chunks; casual chat streams as it is generated"""
+        lowered = user_input.lower()
+        if (self.is_smalltalk(user_input)
+                and not any(cmd in lowered for cmd in FILE_COMMANDS)
+                and not any(keyword in lowered for keyword in SAFETY_KEYWORDS)):
+            self.logger.info(f"Streaming chat response: {user_input}")
+            yield from self.llm_engine.chat_stream(user_input, history)
+        else:
+            yield self.process_request(user_input, context, history)
+
     def format_search_results(self, raw_results):
         """Convert raw search results to readable format"""
         if not raw_results:
@@ -0,0 +1,96 @@
+import logging
+import queue
+import threading
+import uuid
+from config import INGESTION_WORKERS, INGESTION_QUEUE_SIZE, INGESTION_BATCH_SIZE
+
+
+class IngestionQueue:
+    """
+    Write-behind ingestion for VectorMemory.
+    submit() only enqueues and returns the interaction's key; worker threads
+    drain the queue in batches of up to `batch_size`, embed each batch in one
+    call and commit it with a single VectorMemory.store_batch(). When
+    `max_pending` interactions are waiting, submit() blocks (backpressure).
+    """
+
+    def __init__(self, memory, workers: int = INGESTION_WORKERS,
+                 max_pending: int = INGESTION_QUEUE_SIZE, batch_size: int = INGESTION_BATCH_SIZE,
+                 batch_wait: float = 0.02):
+        self.memory = memory
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.committed = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._unfinished = 0
+        self._done = threading.Condition()
+        # Embedding runs in parallel across workers; commits into memory are serialized
+        self._commit_lock = threading.Lock()
+        self._closed = False  # submit() refuses new work once set
+        self._running = True
+        self.logger = logging.getLogger("IngestionQueue")
+        self._workers = [
+            threading.Thread(target=self._run, name=f"Ingestion-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    @property
+    def pending(self) -> int:
+        """Interactions submitted but not yet committed"""
+        with self._done:
+            return self._unfinished
+
+    def submit(self, user_input: str, output: any, metadata: dict = None, key: str = None) -> str:
+        """Queue an interaction for storage and return the key it will be stored under"""
+        key = key or uuid.uuid4().hex
+        with self._done:
+            if self._closed:
+                raise RuntimeError("Ingestion queue is closed")
+            self._unfinished += 1
+        self._queue.put({"user_input": user_input, "output": output, "metadata": metadata, "key": key})
+        return key
+
+    def flush(self, timeout: float = None) -> bool:
+        """Block until every queued interaction is committed; False if `timeout` expires first"""
+        with self._done:
+            return self._done.wait_for(lambda: self._unfinished == 0, timeout)
+
+    def close(self, timeout: float = None):
+        """Commit what is queued, then stop the workers; later submits raise RuntimeError"""
+        with self._done:
+            self._closed = True
+        self.flush(timeout)
+        self._running = False
+        for worker in self._workers:
+            worker.join(timeout)
+
+    def _run(self):
+        while self._running:
+            try:
+                batch = [self._queue.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+            # Give concurrent submitters a moment to fill the batch
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=self.batch_wait))
+                except queue.Empty:
+                    break
+            self._commit(batch)
+
+    def _commit(self, batch: list):
+        try:
+            embeddings = self.memory.embedder.embed([self.memory.interaction_text(item) for item in batch])
+            with self._commit_lock:
+                self.memory.store_batch(batch, embeddings)
+            self.committed += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            self.logger.error(f"Failed to store {len(batch)} interactions: {e}")
+        finally:
+            with self._done:
+                self._unfinished -= len(batch)
+                self._done.notify_all()
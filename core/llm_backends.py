@@ -0,0 +1,125 @@
+"""
+Text generation backends for LLMEngine.
+The default talks to a local Ollama server over its REST API with a pooled
+keep-alive HTTP session, and asks Ollama to keep the model loaded between
+calls. The CLI backend forks `ollama run` per call and is kept as a fallback.
+Both raise TimeoutError when a generation exceeds its timeout, and offer
+generate_stream(), which yields the text in chunks as the model produces it.
+"""
+import json
+import logging
+import subprocess
+import requests
+from requests.adapters import HTTPAdapter
+from config import OLLAMA_URL, OLLAMA_KEEP_ALIVE
+
+
+class OllamaHTTPBackend:
+    """Ollama /api/generate over a shared requests.Session (connections reused across calls and threads)"""
+
+    name = "ollama"
+
+    def __init__(self, base_url: str = OLLAMA_URL, keep_alive: str = OLLAMA_KEEP_ALIVE,
+                 pool_size: int = 8):
+        self.base_url = base_url.rstrip("/")
+        self.keep_alive = keep_alive
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.logger = logging.getLogger("OllamaHTTPBackend")
+
+    def generate(self, model: str, prompt: str, max_tokens: int = 1024,
+                 temperature: float = None, timeout: float = None) -> str:
+        response = self._post(model, prompt, max_tokens, temperature, timeout, stream=False)
+        return response.json().get("response", "")
+
+    def generate_stream(self, model: str, prompt: str, max_tokens: int = 1024,
+                        temperature: float = None, timeout: float = None):
+        # With stream=True, `timeout` bounds the wait for each chunk rather than the whole answer
+        response = self._post(model, prompt, max_tokens, temperature, timeout, stream=True)
+        try:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise RuntimeError(f"Ollama error: {chunk['error']}")
+                if chunk.get("response"):
+                    yield chunk["response"]
+                if chunk.get("done"):
+                    break
+        except requests.Timeout as e:
+            raise TimeoutError(f"Ollama stalled for over {timeout}s") from e
+        finally:
+            response.close()
+
+    def _post(self, model: str, prompt: str, max_tokens: int, temperature: float,
+              timeout: float, stream: bool):
+        options = {"num_predict": max_tokens}
+        if temperature is not None:
+            options["temperature"] = temperature
+        try:
+            response = self.session.post(f"{self.base_url}/api/generate", json={
+                "model": model,
+                "prompt": prompt,
+                "stream": stream,
+                "keep_alive": self.keep_alive,
+                "options": options
+            }, timeout=timeout, stream=stream)
+        except requests.Timeout as e:
+            raise TimeoutError(f"Ollama did not answer within {timeout}s") from e
+        if response.status_code != 200:
+            raise RuntimeError(f"Ollama returned {response.status_code}: {response.text[:200]}")
+        return response
+
+    def close(self):
+        self.session.close()
+
+
+class OllamaCLIBackend:
+    """`ollama run <model> <prompt>` in a subprocess per call"""
+
+    name = "ollama-cli"
+
+    def generate(self, model: str, prompt: str, max_tokens: int = 1024,
+                 temperature: float = None, timeout: float = None) -> str:
+        # The CLI takes no sampling options; max_tokens and temperature are ignored
+        try:
+            result = subprocess.run(
+                ["ollama", "run", model, prompt],
+                capture_output=True,
+                text=True,
+                timeout=timeout
+            )
+        except subprocess.TimeoutExpired as e:
+            raise TimeoutError(f"ollama run did not finish within {timeout}s") from e
+        return result.stdout
+
+    def generate_stream(self, model: str, prompt: str, max_tokens: int = 1024,
+                        temperature: float = None, timeout: float = None):
+        # Lines are yielded as the CLI prints them; `timeout` is not enforced while streaming
+        process = subprocess.Popen(["ollama", "run", model, prompt], stdout=subprocess.PIPE,
+                                   stderr=subprocess.DEVNULL, text=True, bufsize=1)
+        try:
+            for line in process.stdout:
+                yield line
+        finally:
+            process.kill()
+            process.wait()
+
+    def close(self):
+        pass
+
+
+LLM_BACKENDS = {
+    OllamaHTTPBackend.name: OllamaHTTPBackend,
+    OllamaCLIBackend.name: OllamaCLIBackend,
+}
+
+
+def create_llm_backend(backend: str, **params):
+    """Build a generation backend by name"""
+    if backend not in LLM_BACKENDS:
+        raise ValueError(f"Unknown LLM backend: {backend}")
+    return LLM_BACKENDS[backend](**params)
@@ -1,38 +1,160 @@
 import logging
-import subprocess
 import json
-import threading
 import time
-from queue import Queue
-from config import MODEL_NAME, TIMEOUT_SECONDS
+from contextlib import nullcontext
+from config import (MODEL_NAME, TIMEOUT_SECONDS, LLM_BACKEND, LLM_WORKERS, RESPONSE_CACHE_SIZE,
+                    RESPONSE_CACHE_TTL, RESPONSE_CACHE_PATH, SEMANTIC_CACHE_ENABLED,
+                    SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_SIZE, SEMANTIC_CACHE_INTENTS,
+                    EMBEDDING_BACKEND, EMBEDDING_MODEL, EMBEDDING_CACHE_SIZE)
+from core.llm_backends import create_llm_backend
+from core.llm_scheduler import GenerationScheduler, PRIORITY_INTERACTIVE, PRIORITY_NORMAL
+from core.response_cache import ResponseCache
+from core.semantic_cache import SemanticCache
+from memory_store.embeddings import CachedEmbedder, SentenceTransformerEmbedder, create_embedder
 from utils.helpers import clean_code
 
+# Replies given when generation fails; never cached
+TIMEOUT_REPLY = "I need more time to think about that. Could you clarify?"
+ERROR_REPLY = "I encountered an error processing your request."
+
 class LLMEngine:
-    def __init__(self, memory, tools):
+    def __init__(self, memory, tools, model_name=MODEL_NAME, backend=LLM_BACKEND,
+                 cache_path=RESPONSE_CACHE_PATH, semantic_cache=SEMANTIC_CACHE_ENABLED):
         self.memory = memory
         self.tools = tools
         self.logger = logging.getLogger("LLMEngine")
-        self.model_name = MODEL_NAME
+        self.model_name = model_name
+        self.backend = create_llm_backend(backend)
+        # Repeated prompts are answered from here; see _cache_key for what is cached
+        self.cache = ResponseCache(RESPONSE_CACHE_SIZE, cache_path, RESPONSE_CACHE_TTL)
+        # Paraphrased user turns are answered from here (chat() and LLM node reasoning)
+        self.semantic_cache = None
+        if semantic_cache:
+            params = {"model_name": EMBEDDING_MODEL} if EMBEDDING_BACKEND == SentenceTransformerEmbedder.name else {}
+            self.semantic_cache = SemanticCache(
+                CachedEmbedder(create_embedder(EMBEDDING_BACKEND, **params), cache_size=EMBEDDING_CACHE_SIZE),
+                threshold=SEMANTIC_CACHE_THRESHOLD,
+                capacity=SEMANTIC_CACHE_SIZE,
+                intents=SEMANTIC_CACHE_INTENTS,
+                ttl=RESPONSE_CACHE_TTL
+            )
         self.fast_model = "mistral:7b-instruct"  # Faster model for simple queries
         self.timeout = TIMEOUT_SECONDS
-        self.response_queue = Queue()
+        # Worker pool for submit(), created by start()
+        self.scheduler = None
         self.is_running = False
-        self.logger.info(f"LLM Engine initialized with model: {MODEL_NAME}")
+        self.logger.info(f"LLM Engine initialized with model: {model_name} ({backend} backend)")
         
         if not tools:
             self.logger.warning("Tools registry not provided at initialization")
 
-    def start(self):
+    def start(self, workers=LLM_WORKERS):
         self.is_running = True
-        threading.Thread(target=self._process_requests, daemon=True).start()
-        self.logger.info("LLM Engine started")
+        self.scheduler = GenerationScheduler(workers)
+        self.logger.info(f"LLM Engine started ({workers} workers)")
 
     def stop(self):
         self.is_running = False
+        if self.scheduler is not None:
+            self.scheduler.close()
+            self.scheduler = None
+        self.backend.close()
+        self.cache.close()
         self.logger.info("LLM Engine stopped")
 
-    def generate(self, prompt, context=None, max_tokens=1024):
-        """Generate response from LLM with optimizations"""
+    def generate(self, prompt, context=None, max_tokens=1024, temperature=None, cache=None):
+        """
+        Generate response from LLM with optimizations.
+        `cache` True/False forces the response cache on/off for this call;
+        by default only deterministic (temperature 0) requests use it.
+        """
+        full_prompt, model_to_use = self._prepare(prompt, context)
+        key = self._cache_key(model_to_use, full_prompt, max_tokens, temperature, cache)
+        result = self.cache.get(key) if key else None
+        
+        try:
+            if result is None:
+                result = self.backend.generate(
+                    model_to_use,
+                    full_prompt,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    timeout=self._timeout(model_to_use)
+                )
+                if key:
+                    self.cache.put(key, result)
+            output = clean_code(result.strip())
+            self.logger.debug(f"Received response: {output[:100]}...")
+            return output
+        except TimeoutError:
+            self.logger.warning("LLM generation timed out")
+            return TIMEOUT_REPLY
+        except Exception as e:
+            self.logger.error(f"LLM generation error: {str(e)}")
+            return ERROR_REPLY
+
+    def submit(self, prompt, context=None, priority=PRIORITY_NORMAL, **options):
+        """
+        Queue generate(prompt, context, **options) on the worker pool and return
+        a Future for the response. Lower `priority` values run first.
+        """
+        if self.scheduler is None:
+            raise RuntimeError("LLM Engine is not started")
+        return self.scheduler.submit(self.generate, prompt, context, priority=priority, **options)
+
+    def run(self, prompt, context=None, priority=PRIORITY_NORMAL, **options):
+        """
+        generate() through the worker pool, waiting for the response, so callers
+        share its concurrency limit and priorities; runs inline before start().
+        """
+        if self.scheduler is None:
+            return self.generate(prompt, context, **options)
+        return self.submit(prompt, context, priority=priority, **options).result()
+
+    def generate_stream(self, prompt, context=None, max_tokens=1024, temperature=None, cache=None,
+                        fallback=True, priority=PRIORITY_NORMAL):
+        """
+        Like generate(), but yields the response in chunks as the model produces
+        them. Chunks are raw model text (code blocks are not extracted); a cached
+        response is yielded whole. Once started, the engine streams only while
+        holding a worker slot, queued at `priority` like run().
+        If generation fails the stream ends with a fallback reply, or with
+        `fallback` False the error is raised, so callers can tell a cut-off
+        answer from a complete one.
+        """
+        full_prompt, model_to_use = self._prepare(prompt, context)
+        key = self._cache_key(model_to_use, full_prompt, max_tokens, temperature, cache)
+        cached = self.cache.get(key) if key else None
+        if cached is not None:
+            yield cached
+            return
+        try:
+            parts = []
+            with self.scheduler.slot(priority) if self.scheduler is not None else nullcontext():
+                for chunk in self.backend.generate_stream(
+                    model_to_use,
+                    full_prompt,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    timeout=self._timeout(model_to_use)
+                ):
+                    parts.append(chunk)
+                    yield chunk
+            if key:
+                self.cache.put(key, "".join(parts))
+        except TimeoutError:
+            self.logger.warning("LLM generation timed out")
+            if not fallback:
+                raise
+            yield TIMEOUT_REPLY
+        except Exception as e:
+            self.logger.error(f"LLM generation error: {str(e)}")
+            if not fallback:
+                raise
+            yield ERROR_REPLY
+
+    def _prepare(self, prompt, context):
+        """Full prompt and model for a generation request"""
         full_prompt = self._build_prompt(prompt, context)
         self.logger.debug(f"Sending prompt: {full_prompt[:100]}...")
         
@@ -43,23 +165,29 @@ class LLMEngine:
         if len(full_prompt) > 4000:
             full_prompt = full_prompt[:2000] + " [...] " + full_prompt[-2000:]
             self.logger.info("Truncated long prompt")
-        
-        try:
-            result = subprocess.run(
-                ["ollama", "run", model_to_use, full_prompt],
-                capture_output=True,
-                text=True,
-                timeout=15 if model_to_use == self.fast_model else self.timeout
-            )
-            output = clean_code(result.stdout.strip())
-            self.logger.debug(f"Received response: {output[:100]}...")
-            return output
-        except subprocess.TimeoutExpired:
-            self.logger.warning("LLM generation timed out")
-            return "I need more time to think about that. Could you clarify?"
-        except Exception as e:
-            self.logger.error(f"LLM generation error: {str(e)}")
-            return "I encountered an error processing your request."
+        return full_prompt, model_to_use
+
+    def _timeout(self, model):
+        return 15 if model == self.fast_model else self.timeout
+
+    def _cache_key(self, model, full_prompt, max_tokens, temperature, cache):
+        """Response cache key for this call, or None if it bypasses the cache"""
+        if cache is False or (cache is None and temperature != 0):
+            return None
+        return self.cache.make_key(model, full_prompt, max_tokens, temperature)
+
+    def cached_answer(self, user_turn, intent):
+        """Semantic cache answer for a paraphrase of an earlier `intent` turn, or None"""
+        if self.semantic_cache is None or not self.semantic_cache.enabled_for(intent):
+            return None
+        return self.semantic_cache.lookup(user_turn, intent, scope=self.model_name)
+
+    def remember_answer(self, user_turn, intent, answer):
+        """Offer a generated answer to the semantic cache"""
+        if (self.semantic_cache is None or not self.semantic_cache.enabled_for(intent)
+                or not answer or answer in (TIMEOUT_REPLY, ERROR_REPLY)):
+            return
+        self.semantic_cache.store(user_turn, intent, answer, scope=self.model_name)
 
     def _select_model(self, prompt):
         """Choose the appropriate model based on prompt complexity"""
@@ -69,10 +197,39 @@ class LLMEngine:
             return self.fast_model
         return self.model_name
 
-    def chat(self, user_input, history=None):
+    def chat(self, user_input, history=None, intent="chat"):
         """Generate conversational response"""
+        cached = self.cached_answer(user_input, intent)
+        if cached is not None:
+            return cached
+        response = self.run(self._chat_prompt(user_input, history), max_tokens=512,
+                            priority=PRIORITY_INTERACTIVE)
+        self.remember_answer(user_input, intent, response)
+        return response
+
+    def chat_stream(self, user_input, history=None, intent="chat"):
+        """Conversational response, yielded in chunks as it is generated"""
+        cached = self.cached_answer(user_input, intent)
+        if cached is not None:
+            yield cached
+            return
+        parts = []
+        try:
+            for chunk in self.generate_stream(self._chat_prompt(user_input, history), max_tokens=512,
+                                              fallback=False, priority=PRIORITY_INTERACTIVE):
+                parts.append(chunk)
+                yield chunk
+        except TimeoutError:
+            yield TIMEOUT_REPLY
+            return  # a partial answer is never remembered
+        except Exception:
+            yield ERROR_REPLY
+            return
+        self.remember_answer(user_input, intent, "".join(parts))
+
+    def _chat_prompt(self, user_input, history):
         context = self._build_chat_context(user_input, history)
-        prompt = f"""<|system|>
+        return f"""<|system|>
 You are Kamil, an advanced AI assistant. Respond helpfully and concisely.
 Use available tools when appropriate. Maintain natural conversation flow.
 Current time: {time.strftime("%Y-%m-%d %H:%M")}
@@ -82,7 +239,6 @@ Context: {context}
 {user_input}
 </s>
 <|assistant|>"""
-        return self.generate(prompt, max_tokens=512)
 
     def execute_task(self, user_input):
         """Generate and execute task-based response"""
@@ -101,7 +257,7 @@ Context:
 <|assistant|>
 Plan:"""
         
-        plan = self.generate(prompt, max_tokens=256)
+        plan = self.run(prompt, max_tokens=256, priority=PRIORITY_INTERACTIVE)
         self.logger.info(f"Generated plan: {plan}")
         return self._execute_plan(plan, user_input)
 
@@ -151,13 +307,3 @@ Current time: {time.strftime("%Y-%m-%d %H:%M")}
         except Exception as e:
             self.logger.error(f"Plan execution error: {str(e)}")
             return self.chat(user_input)
-
-    def _process_requests(self):
-        """Background processing of queued requests"""
-        while self.is_running:
-            if not self.response_queue.empty():
-                request = self.response_queue.get()
-                response = self.generate(request['prompt'], request.get('context'))
-                if request.get('callback'):
-                    request['callback'](response)
-            time.sleep(0.1)
@@ -0,0 +1,133 @@
+"""
+Priority scheduling of generations for LLMEngine.
+submit() pushes a call onto a heap and wakes a worker through a condition
+variable, so a queued generation starts as soon as a worker is free; up to
+`workers` generations run against the backend at once. Each call gets a
+concurrent.futures.Future for its result. A streamed generation runs on its
+consumer's thread instead, holding a worker's slot for as long as it streams.
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from utils.metrics import LatencyMetrics
+
+# Lower runs first; calls with equal priority run in submission order
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 10
+PRIORITY_BACKGROUND = 20
+
+
+class GenerationScheduler:
+    """Worker pool draining a priority queue of calls"""
+
+    def __init__(self, workers: int = 4, name: str = "LLMWorker"):
+        self.completed = 0
+        self.failed = 0
+        self.streams = 0
+        self.max_depth = 0
+        self.metrics = LatencyMetrics()
+        self._heap = []
+        self._sequence = itertools.count()
+        self._running_calls = 0
+        self._ready = threading.Condition()
+        self._running = True
+        self.logger = logging.getLogger("GenerationScheduler")
+        self._workers = [
+            threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    @property
+    def depth(self) -> int:
+        """Calls waiting for a worker"""
+        with self._ready:
+            return len(self._heap)
+
+    def submit(self, fn, *args, priority: int = PRIORITY_NORMAL, **kwargs) -> Future:
+        """Queue fn(*args, **kwargs); the returned future resolves to its result"""
+        future = Future()
+        with self._ready:
+            if not self._running:
+                raise RuntimeError("Scheduler is stopped")
+            heapq.heappush(self._heap, (priority, next(self._sequence), time.perf_counter(),
+                                        future, fn, args, kwargs))
+            self.max_depth = max(self.max_depth, len(self._heap))
+            self._ready.notify()
+        return future
+
+    @contextmanager
+    def slot(self, priority: int = PRIORITY_NORMAL):
+        """
+        Hold one worker for the duration of the with-block (a streamed generation),
+        queued and prioritized like submit(); raises CancelledError if the scheduler
+        stops first
+        """
+        granted, release = Future(), threading.Event()
+
+        def hold():
+            granted.set_result(None)
+            release.wait()
+
+        held = self.submit(hold, priority=priority)
+        held.add_done_callback(lambda future: granted.cancel() if future.cancelled() else None)
+        try:
+            granted.result()
+            self.streams += 1
+            yield
+        finally:
+            release.set()
+
+    def close(self, timeout: float = None):
+        """Stop the workers after the calls already running; queued calls are cancelled"""
+        with self._ready:
+            self._running = False
+            pending, self._heap = self._heap, []
+            self._ready.notify_all()
+        for entry in pending:
+            entry[3].cancel()
+        for worker in self._workers:
+            worker.join(timeout)
+
+    def stats(self) -> dict:
+        with self._ready:
+            depth, running = len(self._heap), self._running_calls
+        return {
+            "workers": len(self._workers),
+            "queue_depth": depth,
+            "max_queue_depth": self.max_depth,
+            "running": running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "streams": self.streams,
+            "latency": self.metrics.snapshot()
+        }
+
+    def _run(self):
+        while True:
+            with self._ready:
+                self._ready.wait_for(lambda: self._heap or not self._running)
+                if not self._running:
+                    return
+                _, _, queued_at, future, fn, args, kwargs = heapq.heappop(self._heap)
+                if not future.set_running_or_notify_cancel():
+                    continue
+                self._running_calls += 1
+            started = time.perf_counter()
+            self.metrics.observe("wait", started - queued_at)
+            try:
+                future.set_result(fn(*args, **kwargs))
+                self.completed += 1
+            except Exception as e:
+                self.failed += 1
+                self.logger.error(f"Scheduled generation failed: {e}")
+                future.set_exception(e)
+            finally:
+                self.metrics.observe("run", time.perf_counter() - started)
+                with self._ready:
+                    self._running_calls -= 1
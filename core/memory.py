@@ -1,51 +1,430 @@
 import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+import numpy as np
 from memory_store.vector_db import VectorDatabase
 from memory_store.knowledge_graph import KnowledgeGraph
+from memory_store.cold_tier import ColdTier
+from memory_store.embeddings import CachedEmbedder, SentenceTransformerEmbedder, create_embedder
+from memory_store.query_cache import QueryCache
+from memory_store.entity_extractor import EntityExtractor
+from memory_store.snapshot import save_snapshot, load_snapshot
+from config import (VECTOR_INDEX, VECTOR_QUANTIZATION, MAX_MEMORY_ITEMS, MEMORY_HALF_LIFE_SECONDS,
+                    EMBEDDING_BACKEND, EMBEDDING_MODEL, EMBEDDING_CACHE_SIZE, QUERY_CACHE_SIZE,
+                    MEMORY_SNAPSHOT_INTERVAL)
 
 class VectorMemory:
-    def __init__(self):
-        self.vector_db = VectorDatabase()
-        self.knowledge_graph = KnowledgeGraph()
+    def __init__(self, storage_path: str = None, max_items: int = MAX_MEMORY_ITEMS,
+                 half_life: float = MEMORY_HALF_LIFE_SECONDS, embedding_backend: str = EMBEDDING_BACKEND,
+                 snapshot_interval: float = MEMORY_SNAPSHOT_INTERVAL):
+        """
+        Keep memory in-process, or under `storage_path` so it survives restarts.
+        At most `max_items` interactions stay in the hot vector DB; beyond that the
+        least important ones (retrieval hits decayed with `half_life` seconds since
+        last use) are demoted to a compressed on-disk cold tier.
+        Persistent memory snapshots its indexes, graph and statistics every
+        `snapshot_interval` seconds (and on close) and restarts from the latest one.
+        """
+        self.storage_path = storage_path
+        self.snapshot_path = os.path.join(storage_path, "snapshots") if storage_path else None
+        snapshot = load_snapshot(self.snapshot_path) if storage_path else {}
+        self.max_items = max_items
+        self.half_life = half_life
+        self.vector_db = VectorDatabase(
+            index=VECTOR_INDEX,
+            quantization=VECTOR_QUANTIZATION,
+            text_fields=("input", "output"),
+            storage_path=os.path.join(storage_path, "vectors") if storage_path else None
+        )
+        self.entity_extractor = EntityExtractor()
+        self.knowledge_graph = KnowledgeGraph(
+            storage_path=os.path.join(storage_path, "graph") if storage_path else None,
+            state=snapshot.get("graph")
+        )
+        params = {"model_name": EMBEDDING_MODEL} if embedding_backend == SentenceTransformerEmbedder.name else {}
+        self.embedder = CachedEmbedder(
+            create_embedder(embedding_backend, **params),
+            cache_size=EMBEDDING_CACHE_SIZE,
+            cache_path=os.path.join(storage_path, "embeddings.sqlite") if storage_path else None
+        )
+        self.cold_tier = ColdTier(
+            os.path.join(storage_path, "cold") if storage_path else tempfile.mkdtemp(prefix="kamil_cold_")
+        )
+        # Bumped on every write; cached retrieval results from older generations are stale
+        self.generation = 0
+        self.query_cache = QueryCache(QUERY_CACHE_SIZE)
+        # key -> [last access time, retrieval hits]; seeded from stored metadata on first eviction
+        self._access = {}
+        self._access_seeded = len(self.vector_db) == 0
+        # Called as on_change(operation, keys) after each write: "upsert", "delete" or "demote"
+        self.on_change = None
+        # Serializes writes (store, import, update, delete, demote and the evictions they trigger)
+        self._write_lock = threading.RLock()
         self.logger = logging.getLogger("VectorMemory")
+        self._restore(snapshot)
+
+        self._snapshot_generation = self.generation
+        self._stop_snapshots = threading.Event()
+        self._snapshotter = None
+        if storage_path and snapshot_interval:
+            self._snapshotter = threading.Thread(target=self._snapshot_periodically, args=(snapshot_interval,),
+                                                 name="MemorySnapshot", daemon=True)
+            self._snapshotter.start()
         self.logger.info("Memory system initialized")
 
-    def store_interaction(self, user_input: str, output: any):
-        # Create text representation for embedding
-        if isinstance(output, dict):
-            output_str = "\n".join([f"{k}: {v}" for k, v in output.items()])
-        else:
-            output_str = str(output)
-            
-        text = f"{user_input}\n{output_str}"
-        
-        # Generate embedding from the combined text
-        embedding = self._generate_embedding(text)
-        
-        # Store in vector DB
-        self.vector_db.add(embedding, metadata={
-            "input": user_input,
-            "output": output
+    def store_interaction(self, user_input: str, output: any, metadata: dict = None,
+                          key: str = None) -> str:
+        """
+        Store an interaction under `key` (generated if omitted) and return the key.
+        `metadata` may carry filterable fields such as session, task_type and
+        source; a timestamp is added automatically.
+        """
+        return self.store_batch([{
+            "user_input": user_input, "output": output, "metadata": metadata, "key": key
+        }])[0]
+
+    def store_batch(self, interactions: list, embeddings=None) -> list:
+        """
+        Store several interactions ({"user_input", "output", "metadata", "key"} dicts,
+        as taken by store_interaction) in one vector DB write; returns their keys.
+        `embeddings` may be passed when the caller has already computed them
+        with interaction_text().
+        """
+        if embeddings is None:
+            embeddings = self.embedder.embed([self.interaction_text(item) for item in interactions])
+
+        with self._write_lock:
+            keys, records = [], []
+            for item in interactions:
+                key = item.get("key") or uuid.uuid4().hex
+                record = {"timestamp": time.time()}
+                record.update(item.get("metadata") or {})
+                record.update({
+                    "key": key,
+                    "input": item["user_input"],
+                    "output": item["output"]
+                })
+                keys.append(key)
+                records.append(record)
+            self.vector_db.add_batch(embeddings, records)
+            self.generation += 1
+
+            entity_lists = self.entity_extractor.extract_batch(
+                [self.interaction_text(item) for item in interactions]
+            )
+            for item, record, entities in zip(interactions, records, entity_lists):
+                self._access[record["key"]] = [record["timestamp"], 0]
+                self.knowledge_graph.add_entities(entities)
+                self.logger.info(f"Stored interaction: {item['user_input'][:50]}...")
+            self._notify("upsert", keys)
+            self._enforce_capacity()
+            return keys
+
+    def interaction_text(self, interaction: dict) -> str:
+        """Text embedded for an interaction: input and output combined"""
+        return f"{interaction['user_input']}\n{self._output_text(interaction['output'])}"
+
+    def keys(self) -> list:
+        """Keys of all stored interactions"""
+        return self.vector_db.keys()
+
+    def export_items(self, keys: list) -> list:
+        """Stored interactions for `keys`, with their embeddings, for transfer to another node"""
+        return self.vector_db.get(keys)
+
+    def import_items(self, items: list):
+        """Store interactions exported by another node without re-embedding them"""
+        with self._write_lock:
+            for item in items:
+                record = item["metadata"]
+                self.vector_db.add(item["vector"], metadata=record)
+                self.generation += 1
+                self._access[record.get("key")] = [time.time(), 0]
+                self.knowledge_graph.add_entities(self._interaction_entities(
+                    record.get("input", ""), self._output_text(record.get("output", ""))
+                ))
+            self.logger.info(f"Imported {len(items)} interactions")
+            self._notify("upsert", [item["metadata"].get("key") for item in items])
+            self._enforce_capacity()
+
+    def update(self, key: str, user_input: str = None, output: any = None,
+               metadata: dict = None) -> bool:
+        """
+        Replace parts of the interaction stored under `key`; returns False if there
+        is none. The embedding is recomputed only when input or output changes.
+        An interaction in the cold tier is promoted back to the vector DB.
+        """
+        with self._write_lock:
+            items = self.vector_db.get([key])
+            promote = not items
+            if promote:
+                items = self.cold_tier.get([key])
+                if not items:
+                    return False
+            record = dict(items[0]["metadata"])
+            record.update(metadata or {})
+            if user_input is None and output is None:
+                embedding = items[0]["vector"]
+            else:
+                record["input"] = record.get("input", "") if user_input is None else user_input
+                record["output"] = record.get("output", "") if output is None else output
+                embedding = self._generate_embedding(self.interaction_text(
+                    {"user_input": record["input"], "output": record["output"]}
+                ))
+                self.knowledge_graph.add_entities(self._interaction_entities(
+                    record["input"], self._output_text(record["output"])
+                ))
+            record["key"] = key
+            if promote:
+                self.vector_db.add(embedding, metadata=record)
+                self.cold_tier.delete([key])
+                self._access[key] = [time.time(), 0]
+                updated = True
+            else:
+                updated = self.vector_db.update(key, embedding, record)
+            self.generation += 1
+            if updated:
+                self._notify("upsert", [key])
+            if promote:
+                self._enforce_capacity()
+            return updated
+
+    def delete(self, keys: list) -> int:
+        """Remove the interactions stored under `keys`, from the vector DB and the cold tier"""
+        with self._write_lock:
+            for key in keys:
+                self._access.pop(key, None)
+            removed = self.vector_db.remove(keys) + self.cold_tier.delete(keys)
+            self.generation += 1
+            self._notify("delete", keys)
+            return removed
+
+    def demote(self, keys: list):
+        """Move the interactions stored under `keys` from the vector DB to the cold tier"""
+        with self._write_lock:
+            self.cold_tier.append(self.vector_db.get(keys))
+            self.vector_db.remove(keys)
+            self.generation += 1
+            for key in keys:
+                self._access.pop(key, None)
+            self._notify("demote", keys)
+        self.logger.info(f"Demoted {len(keys)} memories to the cold tier")
+
+    def snapshot(self):
+        """Write a snapshot of the vector DB indexes, knowledge graph and statistics"""
+        if not self.snapshot_path:
+            return
+        with self._write_lock:
+            generation = self.generation
+            keys = list(self._access)
+            access = np.array([self._access[key] for key in keys], dtype=np.float64).reshape(-1, 2)
+        save_snapshot(self.snapshot_path, {
+            "vector_db": self.vector_db.state(),
+            "graph": self.knowledge_graph.state(),
+            "entities": self.entity_extractor.state(),
+            "access": ({"keys": keys}, {"stats": access})
         })
-        
-        # Extract entities from both input and output
-        input_entities = self._extract_entities(user_input)
-        output_entities = self._extract_entities(output_str)
-        all_entities = list(set(input_entities + output_entities))
-        
-        self.knowledge_graph.add_entities(all_entities)
-        
-        self.logger.info(f"Stored interaction: {user_input[:50]}...")
-
-    def retrieve_relevant(self, query: str, top_k: int = 5) -> list:
-        """Retrieve relevant memories based on query similarity"""
-        embedding = self._generate_embedding(query)
-        results = self.vector_db.search(embedding, top_k)
-        return [item['metadata'] for item in results]
-
-    def _generate_embedding(self, text: str) -> list:
-        # Simplified embedding generation - should be replaced with real model
-        return [0.0] * 512  # Return a dummy embedding
+        self._snapshot_generation = generation
+        self.logger.info(f"Snapshot written to {self.snapshot_path}")
+
+    def close(self):
+        """Flush and close on-disk stores, taking a final snapshot"""
+        if self._snapshotter is not None:
+            self._stop_snapshots.set()
+            self._snapshotter.join()
+            self._snapshotter = None
+        if self.snapshot_path and self.generation != self._snapshot_generation:
+            self.snapshot()
+        self.vector_db.close()
+        self.knowledge_graph.close()
+        self.embedder.close()
+
+    def stats(self) -> dict:
+        """Sizes of the memory tiers, vector storage footprint and cache hit rates"""
+        lookups = self.embedder.hits + self.embedder.misses
+        return {
+            "memory_items": len(self.vector_db) + len(self.cold_tier),
+            "vector_db_size": len(self.vector_db),
+            "vector_db": self.vector_db.stats(),
+            "cold_tier_size": len(self.cold_tier),
+            "knowledge_graph_nodes": len(self.knowledge_graph),
+            "knowledge_graph_edges": self.knowledge_graph.edge_count,
+            "generation": self.generation,
+            "query_cache": self.query_cache.stats(),
+            "embedding_cache": {
+                "hits": self.embedder.hits,
+                "misses": self.embedder.misses,
+                "hit_rate": self.embedder.hits / lookups if lookups else 0.0
+            }
+        }
+
+    def retrieve_relevant(self, query: str, top_k: int = 5, filters: dict = None,
+                          include_cold: bool = False, mode: str = "dense") -> list:
+        """
+        Retrieve relevant memories based on query similarity, optionally filtered
+        by metadata. `include_cold` also searches demoted memories (slower).
+        `mode` is "dense" (embeddings), "lexical" (BM25 keywords) or "hybrid"
+        (both, merged by reciprocal-rank fusion).
+        """
+        return [item['metadata'] for item in self.retrieve_scored(query, top_k, filters, include_cold, mode)]
+
+    def retrieve_scored(self, query: str, top_k: int = 5, filters: dict = None,
+                        include_cold: bool = False, mode: str = "dense") -> list:
+        """Like retrieve_relevant, but keeps the {"similarity", "metadata"} result entries"""
+        if mode not in ("dense", "lexical", "hybrid"):
+            raise ValueError(f"Unknown retrieval mode: {mode}")
+        cache_key = QueryCache.make_key(query, top_k, filters, include_cold=include_cold, mode=mode)
+        # Read the generation first so a write racing this search invalidates the entry
+        generation = self.generation
+        results = self.query_cache.get(cache_key, generation)
+        if results is None:
+            results = self._search(query, top_k, filters, include_cold, mode)
+            self.query_cache.put(cache_key, generation, results)
+        self._touch(results)
+        return results
+
+    def _search(self, query: str, top_k: int, filters: dict, include_cold: bool, mode: str) -> list:
+        # Fusion needs deeper lists than the final top_k
+        depth = top_k if mode != "hybrid" else max(4 * top_k, 20)
+        rankings = []
+        if mode != "lexical":
+            embedding = self._generate_embedding(query)
+            results = self.vector_db.search(embedding, depth, filters=filters)
+            if include_cold and len(self.cold_tier):
+                results = sorted(results + self.cold_tier.search(embedding, depth, filters),
+                                 key=lambda item: item["similarity"], reverse=True)[:depth]
+            rankings.append(results)
+        if mode != "dense":
+            rankings.append(self.vector_db.search_lexical(query, depth, filters=filters))
+
+        return rankings[0] if len(rankings) == 1 else self._fuse(rankings, top_k)
+
+    def retrieve_batch(self, queries: list, top_k: int = 5, filters: dict = None,
+                       include_scores: bool = False) -> list:
+        """
+        Retrieve relevant memories for several queries in one matrix search;
+        with `include_scores` results keep their {"similarity", "metadata"} entries
+        """
+        embeddings = self.embedder.embed(queries)
+        results = self.vector_db.search_batch(embeddings, top_k, filters=filters)
+        for result in results:
+            self._touch(result)
+        if include_scores:
+            return results
+        return [[item['metadata'] for item in result] for result in results]
+
+    def _generate_embedding(self, text: str) -> np.ndarray:
+        return self.embedder.embed_one(text)
+
+    def graph_query(self, query: str = None, entities: list = None, method: str = "pagerank",
+                    top_k: int = 10, hops: int = 2) -> list:
+        """
+        Related entities from the knowledge graph, seeded by `entities` or by the
+        entities of `query`. `method` is "pagerank" (personalized PageRank),
+        "expand" (k-hop neighbourhood) or "neighbors" (heaviest direct neighbours).
+        Returns {"entity", "score"} entries, best first.
+        """
+        seeds = entities if entities is not None else self._extract_entities(query or "")
+        if method == "pagerank":
+            scores = self.knowledge_graph.personalized_pagerank(seeds, top_n=top_k)
+        elif method == "expand":
+            # Closer entities score higher; seeds themselves are left out
+            distances = self.knowledge_graph.expand(seeds, hops=hops, max_nodes=top_k + len(seeds))
+            scores = {entity: 1.0 / hop for entity, hop in distances.items() if hop > 0}
+        elif method == "neighbors":
+            scores = {}
+            for seed in seeds:
+                for entity, weight in self.knowledge_graph.neighbors(seed).items():
+                    if entity not in seeds:
+                        scores[entity] = scores.get(entity, 0.0) + weight
+        else:
+            raise ValueError(f"Unknown graph query method: {method}")
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [{"entity": entity, "score": score} for entity, score in ranked]
+
+    @staticmethod
+    def _fuse(rankings: list, top_k: int, k: int = 60) -> list:
+        """Reciprocal-rank fusion: an item scores the sum of 1 / (k + rank) over the rankings"""
+        fused = {}
+        for ranking in rankings:
+            for rank, item in enumerate(ranking, 1):
+                key = item["metadata"].get("key") or id(item["metadata"])
+                entry = fused.setdefault(key, {"similarity": 0.0, "metadata": item["metadata"]})
+                entry["similarity"] += 1.0 / (k + rank)
+        return sorted(fused.values(), key=lambda item: item["similarity"], reverse=True)[:top_k]
+
+    def _touch(self, results: list):
+        """Record a retrieval hit for each returned memory"""
+        now = time.time()
+        for item in results:
+            stats = self._access.get(item["metadata"].get("key"))
+            if stats is not None:
+                stats[0] = now
+                stats[1] += 1
+
+    def _enforce_capacity(self):
+        """Demote the least important memories to the cold tier once over `max_items` (under the write lock)"""
+        if not self.max_items or len(self.vector_db) <= self.max_items:
+            return
+        if not self._access_seeded:
+            # Track exactly the live keys: rows deleted or replaced since the snapshot
+            # would otherwise be picked for eviction in place of real memories
+            live = set(self.vector_db.keys())
+            access = {}
+            for record in reversed(self.vector_db.metadata):  # newest row of each key first
+                key = record.get("key")
+                if key in live and key not in access:
+                    access[key] = self._access.get(key) or [record.get("timestamp", 0), 0]
+            self._access = access
+            self._access_seeded = True
+
+        # Evict down to 90% of the cap so compaction runs once per batch, not per store
+        evict_count = len(self.vector_db) - self.max_items + max(1, self.max_items // 10)
+        keys = list(self._access)
+        stats = np.array([self._access[key] for key in keys], dtype=np.float64)
+        importance = (1 + stats[:, 1]) * 0.5 ** ((time.time() - stats[:, 0]) / self.half_life)
+        self.demote([keys[i] for i in np.argsort(importance)[:evict_count]])
+
+    def _restore(self, snapshot: dict):
+        """Adopt what `snapshot` holds beyond the persistent vector store itself"""
+        if not snapshot:
+            return
+        if "vector_db" in snapshot:
+            self.vector_db.load_state(*snapshot["vector_db"])
+        if "entities" in snapshot:
+            self.entity_extractor.load_state(*snapshot["entities"])
+        if "access" in snapshot:
+            # Keys stored or deleted since the snapshot are reconciled with the live
+            # rows on the first eviction
+            info, arrays = snapshot["access"]
+            self._access = dict(zip(info["keys"], arrays["stats"].tolist()))
+
+    def _snapshot_periodically(self, interval: float):
+        while not self._stop_snapshots.wait(interval):
+            if self.generation == self._snapshot_generation:
+                continue
+            try:
+                self.snapshot()
+            except Exception as e:
+                self.logger.error(f"Snapshot failed: {e}")
+
+    def _notify(self, operation: str, keys: list):
+        if self.on_change is not None:
+            self.on_change(operation, keys)
+
+    @staticmethod
+    def _output_text(output: any) -> str:
+        if isinstance(output, dict):
+            return "\n".join([f"{k}: {v}" for k, v in output.items()])
+        return str(output)
+
+    def _interaction_entities(self, user_input: str, output_str: str) -> list:
+        # Entities of input and output in text order: the graph links entities that appear close together
+        return self.entity_extractor.extract_batch([f"{user_input}\n{output_str}"])[0]
 
     def _extract_entities(self, text: str) -> list:
-        # Simple entity extraction - split on whitespace
-        return [word for word in text.split() if len(word) > 4]
+        # Query-side extraction leaves the corpus frequencies alone
+        return self.entity_extractor.extract(text)
@@ -1,5 +1,6 @@
 import logging
 from core.llm_engine import LLMEngine
+from core.llm_scheduler import PRIORITY_BACKGROUND
 
 class ModelPool:
     def __init__(self, memory, tools):
@@ -34,7 +35,7 @@ Generate a plan to create the requested code solution.
 <|assistant|>
 Plan:"""
         
-        plan = self.llm_engine.generate(prompt)
+        plan = self.llm_engine.run(prompt, cache=True, priority=PRIORITY_BACKGROUND)
         return {
             "task": "coding",
             "steps": [
@@ -54,7 +55,7 @@ Generate a plan to research this topic.
 <|assistant|>
 Plan:"""
         
-        plan = self.llm_engine.generate(prompt)
+        plan = self.llm_engine.run(prompt, cache=True, priority=PRIORITY_BACKGROUND)
         return {
             "task": "research",
             "steps": [
@@ -74,7 +75,7 @@ Generate a plan to automate this task.
 <|assistant|>
 Plan:"""
         
-        plan = self.llm_engine.generate(prompt)
+        plan = self.llm_engine.run(prompt, cache=True, priority=PRIORITY_BACKGROUND)
         return {
             "task": "automation",
             "steps": [
@@ -0,0 +1,113 @@
+"""
+Cache of generated LLM responses for LLMEngine.
+Entries are keyed by the model, the sampling parameters and the canonicalized
+full prompt, and expire `ttl` seconds after they were generated. An in-memory
+LRU sits in front of an optional SQLite table that survives restarts.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Prompt lines that change from call to call without changing what is asked
+_VOLATILE_LINE = re.compile(r"^Current time:.*$", re.MULTILINE)
+
+
+class ResponseCache:
+    """LRU of `capacity` responses and, with `cache_path`, a SQLite table of all unexpired ones"""
+
+    def __init__(self, capacity: int = 512, cache_path: str = None, ttl: float = 24 * 3600):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.logger = logging.getLogger("ResponseCache")
+        if cache_path:
+            os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(cache_path, check_same_thread=False, timeout=5)
+            self._db.execute("CREATE TABLE IF NOT EXISTS responses "
+                             "(key TEXT PRIMARY KEY, response TEXT, created REAL)")
+            self._db.execute("DELETE FROM responses WHERE created < ?", (time.time() - ttl,))
+            self._db.commit()
+
+    def __len__(self):
+        return len(self._lru)
+
+    @staticmethod
+    def canonicalize(prompt: str) -> str:
+        """Prompt without its timestamp line and trailing whitespace"""
+        prompt = _VOLATILE_LINE.sub("", prompt)
+        return "\n".join(line.rstrip() for line in prompt.strip().splitlines())
+
+    @classmethod
+    def make_key(cls, model: str, prompt: str, max_tokens: int, temperature: float = None) -> str:
+        payload = json.dumps([model, cls.canonicalize(prompt), max_tokens, temperature])
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """Cached response for `key`, or None if absent or expired"""
+        now = time.time()
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None and now - entry[0] < self.ttl:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self._lru.pop(key, None)
+            if self._db is not None:
+                try:
+                    row = self._db.execute("SELECT response, created FROM responses WHERE key = ?",
+                                           (key,)).fetchone()
+                except sqlite3.Error as e:
+                    self.logger.warning(f"Response cache read failed: {e}")
+                    row = None
+                if row is not None and now - row[1] < self.ttl:
+                    self._remember(key, row[1], row[0])
+                    self.hits += 1
+                    return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, response: str):
+        created = time.time()
+        with self._lock:
+            self._remember(key, created, response)
+            if self._db is not None:
+                try:
+                    self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?)",
+                                     (key, response, created))
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    self.logger.warning(f"Response cache write failed: {e}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._lru),
+            "persistent": self._db is not None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+    def close(self):
+        if self._db is not None:
+            with self._lock:
+                self._db.close()
+                self._db = None
+
+    def _remember(self, key: str, created: float, response: str):
+        if self.capacity <= 0:
+            return
+        self._lru[key] = (created, response)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.capacity:
+            self._lru.popitem(last=False)
@@ -0,0 +1,98 @@
+"""
+Semantic cache of answers for LLMEngine.
+Where ResponseCache needs the exact same prompt, this one embeds just the
+user's turn and reuses an earlier answer when a previous turn with the same
+intent and model is similar enough. Context and history are not compared, so
+it is enabled per intent (SEMANTIC_CACHE_INTENTS) for the kinds of questions
+whose answers do not depend on them.
+"""
+import logging
+import threading
+import time
+import numpy as np
+
+
+class SemanticCache:
+    """
+    Fixed-size index of (user turn embedding, answer) pairs searched by cosine
+    similarity. Once `capacity` entries are held, the least recently used one
+    is replaced.
+    """
+
+    def __init__(self, embedder, threshold: float = 0.92, capacity: int = 2000,
+                 intents: dict = None, ttl: float = 24 * 3600):
+        self.embedder = embedder
+        self.threshold = threshold
+        self.capacity = capacity
+        self.intents = intents or {}
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._vectors = np.zeros((capacity, embedder.dim), dtype=np.float32)
+        self._groups = np.full(capacity, -1, dtype=np.int32)
+        self._created = np.zeros(capacity)
+        self._used = np.zeros(capacity)
+        self._answers = [None] * capacity
+        self._size = 0
+        self._group_ids = {}
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger("SemanticCache")
+
+    def __len__(self):
+        return self._size
+
+    def enabled_for(self, intent: str) -> bool:
+        return bool(self.intents.get(intent, False))
+
+    def lookup(self, text: str, intent: str, scope: str = ""):
+        """Answer to the most similar earlier turn with this intent and scope, or None"""
+        query = self.embedder.embed_one(text)
+        with self._lock:
+            slot, score = self._nearest(query, self._group_ids.get((intent, scope)))
+            if slot is None or score < self.threshold:
+                self.misses += 1
+                return None
+            self._used[slot] = time.time()
+            self.hits += 1
+            self.logger.debug(f"Semantic hit ({score:.3f}) for: {text[:50]}")
+            return self._answers[slot]
+
+    def store(self, text: str, intent: str, answer: str, scope: str = ""):
+        vector = self.embedder.embed_one(text)
+        now = time.time()
+        with self._lock:
+            group = self._group_ids.setdefault((intent, scope), len(self._group_ids))
+            slot, score = self._nearest(vector, group)
+            if slot is None or score < self.threshold:
+                # A near-duplicate's slot is refreshed; otherwise take a free or the least recently used one
+                slot = self._size if self._size < self.capacity else int(np.argmin(self._used))
+                self._size = max(self._size, slot + 1)
+            self._vectors[slot] = vector
+            self._groups[slot] = group
+            self._created[slot] = now
+            self._used[slot] = now
+            self._answers[slot] = answer
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": self._size,
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+    def _nearest(self, vector: np.ndarray, group: int):
+        """(slot, similarity) of the closest unexpired entry in `group`, or (None, None)"""
+        n = self._size
+        if group is None or n == 0:
+            return None, None
+        scores = self._vectors[:n] @ vector
+        valid = (self._groups[:n] == group) & (self._created[:n] > time.time() - self.ttl)
+        if not valid.any():
+            return None, None
+        scores[~valid] = -np.inf
+        slot = int(np.argmax(scores))
+        return slot, float(scores[slot])
@@ -72,6 +72,25 @@ class DistributedAgent:
         except Exception as e:
             self.logger.error(f"Request processing error: {e}")
             return f"Error: {str(e)}"
+
+    def process_request_stream(self, user_input: str, context: Optional[List] = None,
+                               history: Optional[List] = None):
+        """
+        Process user request through the orchestrator's /task/stream, yielding
+        the response in chunks as the LLM node generates them.
+        """
+        self.logger.info(f"Streaming request: {user_input[:50]}...")
+        try:
+            chunks = self.orchestrator_client.stream_events("/task/stream", {
+                "user_input": user_input,
+                "context": context or [],
+                "history": history or []
+            }, timeout=300)
+            for chunk in chunks:
+                yield chunk
+        except Exception as e:
+            self.logger.error(f"Request streaming error: {e}")
+            yield f"Error processing request: {str(e)}"
     
     def handle_file_command(self, user_input: str) -> str:
         """Handle file commands (for backward compatibility)"""
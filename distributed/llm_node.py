@@ -6,8 +6,10 @@ import logging
 from typing import Optional, List, Dict
 from distributed.network import NodeServer, NodeClient
 from distributed.protocol import NodeType, ReasoningRequest, HardwareCapabilities
-from flask import request, jsonify
+from flask import Response, request, jsonify, stream_with_context
 from core.llm_engine import LLMEngine
+from core.llm_scheduler import PRIORITY_INTERACTIVE
+from utils.sse import format_event
 
 
 class LLMNode(NodeServer):
@@ -23,39 +25,47 @@ class LLMNode(NodeServer):
         self.model_name = model_name
         self.specializations = specializations or ["general"]
         
-        # LLM engine (stateless - no memory or tools)
-        self.llm_engine = LLMEngine(memory=None, tools={})
-        # Don't start background processing for distributed node
-        # (requests come via HTTP, not queue)
+        # LLM engine (stateless - no memory or tools); its worker pool caps how
+        # many HTTP requests generate against the backend at once
+        self.llm_engine = LLMEngine(memory=None, tools={}, model_name=model_name)
+        self.llm_engine.start()
         
         self.logger = logging.getLogger(f"LLMNode({model_name})")
         self._setup_llm_routes()
     
+    def shutdown(self):
+        """Stop the engine's workers and close its backend and response cache"""
+        self.llm_engine.stop()
+        self.logger.info("LLM node shut down")
+    
     def _setup_llm_routes(self):
         """Setup LLM node routes"""
         self.app.route("/reason", methods=["POST"])(self.reason)
+        self.app.route("/reason/stream", methods=["POST"])(self.reason_stream)
+        self.app.route("/reason/stats", methods=["GET"])(self.get_stats)
     
     def reason(self):
         """Handle reasoning request"""
         data = request.json
         try:
-            req = ReasoningRequest(
-                prompt=data["prompt"],
-                context=data.get("context", []),
-                max_tokens=data.get("max_tokens", 1024),
-                model_preference=data.get("model_preference"),
-                temperature=data.get("temperature", 0.7)
-            )
-            
-            # Build prompt with context
-            full_prompt = self._build_prompt(req.prompt, req.context)
+            req = self._parse_request(data)
+            intent = req.intent or "general"
             
-            # Generate response
-            response = self.llm_engine.generate(
-                full_prompt,
-                context=req.context,
-                max_tokens=req.max_tokens
-            )
+            # Paraphrases of earlier requests are answered from the semantic cache
+            response = self.llm_engine.cached_answer(req.prompt, intent)
+            if response is None:
+                # Build prompt with context
+                full_prompt = self._build_prompt(req.prompt, req.context)
+                
+                # Generate response
+                response = self.llm_engine.run(
+                    full_prompt,
+                    context=req.context,
+                    max_tokens=req.max_tokens,
+                    temperature=req.temperature,
+                    priority=PRIORITY_INTERACTIVE
+                )
+                self.llm_engine.remember_answer(req.prompt, intent, response)
             
             self.logger.info(f"Generated response for prompt: {req.prompt[:50]}...")
             
@@ -67,6 +77,66 @@ class LLMNode(NodeServer):
         except Exception as e:
             self.logger.error(f"Reasoning error: {e}")
             return jsonify({"error": str(e)}), 500
+
+    def reason_stream(self):
+        """
+        Handle reasoning request as server-sent events: one event per chunk of
+        generated text, then a "done" event (or an "error" event).
+        """
+        data = request.json
+        try:
+            req = self._parse_request(data)
+        except Exception as e:
+            return jsonify({"error": str(e)}), 400
+
+        def events():
+            intent = req.intent or "general"
+            try:
+                cached = self.llm_engine.cached_answer(req.prompt, intent)
+                chunks = [cached] if cached is not None else self.llm_engine.generate_stream(
+                    self._build_prompt(req.prompt, req.context),
+                    context=req.context,
+                    max_tokens=req.max_tokens,
+                    temperature=req.temperature,
+                    fallback=False,  # a failure ends the stream with an "error" event, uncached
+                    priority=PRIORITY_INTERACTIVE
+                )
+                parts = []
+                for chunk in chunks:
+                    parts.append(chunk)
+                    yield format_event({"text": chunk})
+                if cached is None:
+                    self.llm_engine.remember_answer(req.prompt, intent, "".join(parts))
+                self.logger.info(f"Streamed response for prompt: {req.prompt[:50]}...")
+                yield format_event({"model": self.model_name,
+                                    "specializations": self.specializations}, event="done")
+            except Exception as e:
+                self.logger.error(f"Reasoning stream error: {e}")
+                yield format_event({"error": str(e)}, event="error")
+
+        return Response(stream_with_context(events()), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    def get_stats(self):
+        """Cache hits and misses, and scheduler queue metrics if the engine is started"""
+        semantic_cache = self.llm_engine.semantic_cache
+        return jsonify({
+            "model": self.model_name,
+            "response_cache": self.llm_engine.cache.stats(),
+            "semantic_cache": semantic_cache.stats() if semantic_cache else None,
+            "scheduler": self.llm_engine.scheduler.stats() if self.llm_engine.scheduler else None
+        })
+
+    @staticmethod
+    def _parse_request(data) -> ReasoningRequest:
+        return ReasoningRequest(
+            prompt=data["prompt"],
+            context=data.get("context", []),
+            max_tokens=data.get("max_tokens", 1024),
+            model_preference=data.get("model_preference"),
+            temperature=data.get("temperature", 0.7),
+            intent=data.get("intent")
+        )
     
     def _build_prompt(self, prompt: str, context: List[Dict]) -> str:
         """Build prompt with context"""
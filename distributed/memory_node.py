@@ -2,102 +2,342 @@
 Memory Node - Persistent Cognition
 Stores and retrieves memory. Read-only for LLMs, write-controlled by orchestrator.
 """
+import json
 import logging
+import time
 from typing import List, Dict, Any, Optional
 from distributed.network import NodeServer
 from distributed.protocol import NodeType, MemoryRequest, HardwareCapabilities
 from flask import request, jsonify
 from core.memory import VectorMemory
+from core.ingestion import IngestionQueue
+from distributed.replication import ReplicationLog, ReplicaFollower
+from utils.metrics import LatencyMetrics
+from config import MAX_MEMORY_ITEMS, REPLICA_MAX_LAG_SECONDS
+
+# Operations addressing stored items by key; they first wait for queued stores to commit
+KEYED_OPERATIONS = ("update", "keys", "export", "import", "delete")
+# Operations a read-only replica refuses; they must go to the primary
+WRITE_OPERATIONS = ("store", "update", "import", "delete")
+
+
+class MemoryOperationError(Exception):
+    """Invalid memory request; reported to the client with `status`"""
+    
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
 
 
 class MemoryNode(NodeServer):
     """
     Specialized node for persistent memory storage and retrieval.
     Uses tiered memory model: vector DB, knowledge graph, episodic logs.
+    With `primary` (the address of another memory node) it runs as a read-only
+    replica that follows the primary's write log.
     """
     
-    def __init__(self, port: int = 8003, host: str = "0.0.0.0"):
+    def __init__(self, port: int = 8003, host: str = "0.0.0.0",
+                 storage_path: Optional[str] = None, primary: Optional[str] = None):
         super().__init__(NodeType.MEMORY_NODE, port, host)
         
-        # Initialize memory systems
-        self.memory = VectorMemory()
+        # Initialize memory systems (memory-mapped from storage_path if given).
+        # A replica mirrors the primary's demotions instead of evicting on its own.
+        self.memory = VectorMemory(storage_path=storage_path, max_items=None if primary else MAX_MEMORY_ITEMS)
+        self.ingestion = IngestionQueue(self.memory)
+        self.metrics = LatencyMetrics()
+        self.replication_log = None
+        self.follower = None
+        if primary:
+            self.follower = ReplicaFollower(self.memory, primary)
+            self.follower.start()
+        else:
+            self.replication_log = ReplicationLog()
+            self.memory.on_change = self.replication_log.append
         
         self.logger = logging.getLogger("MemoryNode")
         self._setup_memory_routes()
     
+    def shutdown(self):
+        """Stop following the primary, commit queued stores, then close memory (writing its final snapshot)"""
+        if self.follower is not None:
+            self.follower.stop()
+        self.ingestion.close()
+        self.memory.close()
+        self.logger.info("Memory node shut down")
+
     def _setup_memory_routes(self):
         """Setup memory node routes"""
         self.app.route("/memory", methods=["POST"])(self.memory_operation)
+        self.app.route("/memory/batch", methods=["POST"])(self.memory_batch)
         self.app.route("/memory/stats", methods=["GET"])(self.get_stats)
+        self.app.route("/replication/snapshot", methods=["GET"])(self.replication_snapshot)
+        self.app.route("/replication/log", methods=["GET"])(self.replication_entries)
+        self._handlers = {
+            "store": self._store,
+            "retrieve": self._retrieve,
+            "retrieve_batch": self._retrieve_batch,
+            "query": self._query,
+            "graph_query": self._graph_query,
+            "update": self._update,
+            "keys": self._keys,
+            "export": self._export,
+            "import": self._import,
+            "delete": self._delete,
+            "flush": self._flush,
+        }
     
     def memory_operation(self):
         """Handle memory operation request"""
-        data = request.json
         try:
-            req = MemoryRequest(
-                operation=data["operation"],
-                key=data.get("key"),
-                value=data.get("value"),
-                query=data.get("query"),
-                top_k=data.get("top_k", 5)
-            )
-            
-            result = None
-            
-            if req.operation == "store":
-                # Store interaction
-                if isinstance(req.value, dict):
-                    user_input = req.value.get("input", "")
-                    output = req.value.get("output", "")
-                else:
-                    user_input = str(req.value)
-                    output = ""
-                
-                self.memory.store_interaction(user_input, output)
-                result = {"status": "stored", "key": req.key}
-            
-            elif req.operation == "retrieve":
-                # Retrieve relevant memories
-                if not req.query:
-                    return jsonify({"error": "Query required for retrieve operation"}), 400
-                
-                memories = self.memory.retrieve_relevant(req.query, top_k=req.top_k)
-                result = memories
-            
-            elif req.operation == "query":
-                # Semantic query
-                if not req.query:
-                    return jsonify({"error": "Query required for query operation"}), 400
-                
-                memories = self.memory.retrieve_relevant(req.query, top_k=req.top_k)
-                result = memories
-            
-            elif req.operation == "update":
-                # Update existing memory (if key-based storage implemented)
-                # For now, this is a placeholder
-                result = {"status": "updated", "key": req.key}
-            
-            else:
-                return jsonify({"error": f"Unknown operation: {req.operation}"}), 400
-            
-            self.logger.info(f"Memory operation '{req.operation}' completed")
-            
+            req = self._parse_request(request.json)
+            result = self._execute(req)
             return jsonify({
                 "result": result,
                 "operation": req.operation
             })
+        except MemoryOperationError as e:
+            return jsonify({"error": str(e)}), e.status
         except Exception as e:
             self.logger.error(f"Memory operation error: {e}")
             return jsonify({"error": str(e)}), 500
     
+    def memory_batch(self):
+        """
+        Handle {"requests": [MemoryRequest dicts]} in one round trip.
+        Operations run in order; runs of consecutive stores (even a run of one) become
+        one synchronous insert, so later operations in the batch see them, and runs of
+        consecutive retrieves with the same options one matrix search.
+        Returns {"results": [...]} with a {"result", "operation"} or {"error", "status", "operation"}
+        entry per request, so one failing operation does not fail the batch.
+        """
+        try:
+            reqs = [self._parse_request(data) for data in request.json.get("requests", [])]
+        except Exception as e:
+            return jsonify({"error": f"Malformed batch: {e}"}), 400
+        
+        if any(req.operation in KEYED_OPERATIONS for req in reqs):
+            self.ingestion.flush()
+        results = []
+        i = 0
+        while i < len(reqs):
+            # Extend the run of requests that can execute as one group
+            j = i + 1
+            while j < len(reqs) and self._group_key(reqs[j]) is not None and \
+                    self._group_key(reqs[j]) == self._group_key(reqs[i]):
+                j += 1
+            group = reqs[i:j]
+            try:
+                self._check_role(group[0])
+                if len(group) == 1 and group[0].operation != "store":
+                    outputs = [self._execute(group[0], flush=False)]
+                else:
+                    start = time.perf_counter()
+                    if group[0].operation == "store":
+                        outputs = self._store_group(group)
+                    else:
+                        outputs = self._retrieve_group(group)
+                    # Grouped requests share the cost of their one insert or search
+                    share = (time.perf_counter() - start) / len(group)
+                    for _ in group:
+                        self.metrics.observe(group[0].operation, share)
+                results.extend({"result": output, "operation": req.operation}
+                               for req, output in zip(group, outputs))
+            except MemoryOperationError as e:
+                results.extend({"error": str(e), "status": e.status, "operation": req.operation}
+                               for req in group)
+            except Exception as e:
+                self.logger.error(f"Memory batch error in '{group[0].operation}': {e}")
+                results.extend({"error": str(e), "status": 500, "operation": req.operation}
+                               for req in group)
+            i = j
+        
+        self.logger.info(f"Memory batch of {len(reqs)} operations completed")
+        return jsonify({"results": results})
+    
+    @staticmethod
+    def _parse_request(data: Dict[str, Any]) -> MemoryRequest:
+        return MemoryRequest(
+            operation=data["operation"],
+            key=data.get("key"),
+            value=data.get("value"),
+            query=data.get("query"),
+            top_k=data.get("top_k", 5),
+            queries=data.get("queries"),
+            filters=data.get("filters"),
+            include_scores=data.get("include_scores", False),
+            include_cold=data.get("include_cold", False),
+            mode=data.get("mode", "dense")
+        )
+    
+    def _execute(self, req: MemoryRequest, flush: bool = True) -> Any:
+        handler = self._handlers.get(req.operation)
+        if handler is None:
+            raise MemoryOperationError(f"Unknown operation: {req.operation}")
+        self._check_role(req)
+        if flush and req.operation in KEYED_OPERATIONS:
+            # Key-addressed operations must see every store acknowledged before them
+            self.ingestion.flush()
+        with self.metrics.timer(req.operation):
+            result = handler(req)
+        self.logger.info(f"Memory operation '{req.operation}' completed")
+        return result
+    
+    def _check_role(self, req: MemoryRequest):
+        if self.follower is None:
+            return
+        if req.operation in WRITE_OPERATIONS:
+            raise MemoryOperationError(f"Read-only replica of {self.follower.primary_address}", 403)
+        lag = self.follower.lag_seconds
+        if lag > REPLICA_MAX_LAG_SECONDS:
+            # Too stale to serve; the orchestrator falls back to the primary
+            raise MemoryOperationError(f"Replica is {lag:.1f}s behind its primary", 503)
+    
+    @staticmethod
+    def _group_key(req: MemoryRequest):
+        """Requests with equal non-None keys can execute together"""
+        if req.operation == "store":
+            return ("store",)
+        if req.operation == "retrieve" and req.query and req.mode == "dense" and not req.include_cold:
+            return ("retrieve", req.top_k, json.dumps(req.filters, sort_keys=True, default=str),
+                    req.include_scores)
+        return None
+    
+    def _store_group(self, group: List[MemoryRequest]) -> List[Any]:
+        interactions = []
+        for req in group:
+            interaction = self._interaction(req)
+            interaction["key"] = req.key
+            interactions.append(interaction)
+        keys = self.memory.store_batch(interactions)
+        return [{"status": "stored", "key": key} for key in keys]
+    
+    def _retrieve_group(self, group: List[MemoryRequest]) -> List[Any]:
+        first = group[0]
+        return self.memory.retrieve_batch([req.query for req in group], top_k=first.top_k,
+                                          filters=first.filters, include_scores=first.include_scores)
+    
+    @staticmethod
+    def _interaction(req: MemoryRequest) -> Dict[str, Any]:
+        if isinstance(req.value, dict):
+            return {"user_input": req.value.get("input", ""), "output": req.value.get("output", ""),
+                    "metadata": req.value.get("metadata")}
+        return {"user_input": str(req.value), "output": "", "metadata": None}
+    
+    def _store(self, req: MemoryRequest) -> Any:
+        # Acknowledged once queued; embedding and commit happen in the background
+        interaction = self._interaction(req)
+        key = self.ingestion.submit(interaction["user_input"], interaction["output"],
+                                    metadata=interaction["metadata"], key=req.key)
+        return {"status": "queued", "key": key}
+    
+    def _retrieve(self, req: MemoryRequest) -> Any:
+        if not req.query:
+            raise MemoryOperationError("Query required for retrieve operation")
+        if req.include_scores:
+            return self.memory.retrieve_scored(req.query, top_k=req.top_k, filters=req.filters,
+                                               include_cold=req.include_cold, mode=req.mode)
+        return self.memory.retrieve_relevant(req.query, top_k=req.top_k, filters=req.filters,
+                                             include_cold=req.include_cold, mode=req.mode)
+    
+    def _retrieve_batch(self, req: MemoryRequest) -> Any:
+        # Retrieve memories for many queries in one matrix search
+        if not req.queries:
+            raise MemoryOperationError("Queries required for retrieve_batch operation")
+        return self.memory.retrieve_batch(req.queries, top_k=req.top_k, filters=req.filters,
+                                          include_scores=req.include_scores)
+    
+    def _query(self, req: MemoryRequest) -> Any:
+        # Semantic query
+        if not req.query:
+            raise MemoryOperationError("Query required for query operation")
+        return self.memory.retrieve_relevant(req.query, top_k=req.top_k, filters=req.filters,
+                                             mode=req.mode)
+    
+    def _graph_query(self, req: MemoryRequest) -> Any:
+        # Related entities from the knowledge graph, seeded by value.entities or the query
+        value = req.value if isinstance(req.value, dict) else {}
+        if not req.query and not value.get("entities"):
+            raise MemoryOperationError("Query or value.entities required for graph_query")
+        return self.memory.graph_query(query=req.query, entities=value.get("entities"),
+                                       method=value.get("method", "pagerank"),
+                                       top_k=req.top_k, hops=value.get("hops", 2))
+    
+    def _update(self, req: MemoryRequest) -> Any:
+        # Replace input, output and/or metadata of the memory stored under key
+        if not req.key:
+            raise MemoryOperationError("Key required for update operation")
+        value = req.value if isinstance(req.value, dict) else {}
+        updated = self.memory.update(req.key, user_input=value.get("input"),
+                                     output=value.get("output"), metadata=value.get("metadata"))
+        if not updated:
+            raise MemoryOperationError(f"No memory stored under key: {req.key}", 404)
+        return {"status": "updated", "key": req.key}
+    
+    def _keys(self, req: MemoryRequest) -> Any:
+        # List stored keys (used by the orchestrator to rebalance shards)
+        return self.memory.keys()
+    
+    def _export(self, req: MemoryRequest) -> Any:
+        # Hand out stored items, with embeddings, for transfer to another shard
+        return self.memory.export_items(req.value.get("keys", []))
+    
+    def _import(self, req: MemoryRequest) -> Any:
+        # Take over items exported by another shard
+        items = req.value.get("items", [])
+        self.memory.import_items(items)
+        return {"status": "imported", "count": len(items)}
+    
+    def _delete(self, req: MemoryRequest) -> Any:
+        keys = req.value.get("keys", []) if isinstance(req.value, dict) else [req.key]
+        return {"status": "deleted", "count": self.memory.delete(keys)}
+    
+    def _flush(self, req: MemoryRequest) -> Any:
+        # Barrier: wait until every queued store is committed
+        self.ingestion.flush()
+        return {"status": "flushed"}
+    
+    def replication_snapshot(self):
+        """Keys of all hot memories, plus the log epoch and sequence they are known to include"""
+        if self.replication_log is None:
+            return jsonify({"error": "Replicas do not serve replication"}), 400
+        sequence = self.replication_log.sequence
+        return jsonify({"epoch": self.replication_log.epoch, "sequence": sequence, "keys": self.memory.keys()})
+    
+    def replication_entries(self):
+        """
+        Write-log entries after ?since= (at most ?limit=) of log ?epoch=, with the current
+        version of upserted items attached; 410 if the replica must reload a snapshot
+        """
+        if self.replication_log is None:
+            return jsonify({"error": "Replicas do not serve replication"}), 400
+        since = request.args.get("since", 0, type=int)
+        epoch = self.replication_log.epoch
+        if request.args.get("epoch") != epoch:
+            return jsonify({"error": "Log epoch changed; the primary restarted"}), 410
+        entries = self.replication_log.since(since, request.args.get("limit", 1000, type=int))
+        sequence = self.replication_log.sequence
+        if entries is None:
+            return jsonify({"error": f"Log entries after {since} are no longer retained"}), 410
+        response = []
+        for entry_sequence, operation, keys in entries:
+            entry = {"sequence": entry_sequence, "operation": operation, "keys": keys}
+            if operation == "upsert":
+                entry["items"] = self.memory.export_items(keys)
+            response.append(entry)
+        return jsonify({"epoch": epoch, "sequence": sequence, "entries": response})
+    
     def get_stats(self):
         """Get memory node statistics"""
-        # TODO: Implement actual stats from vector DB and knowledge graph
-        return jsonify({
-            "memory_items": 0,  # Placeholder
-            "vector_db_size": 0,
-            "knowledge_graph_nodes": 0
-        })
+        stats = self.memory.stats()
+        stats["ingestion_pending"] = self.ingestion.pending
+        stats["latency"] = self.metrics.snapshot()
+        if self.follower is not None:
+            stats["replication"] = self.follower.status()
+        else:
+            stats["replication"] = {"role": "primary", "epoch": self.replication_log.epoch,
+                                    "sequence": self.replication_log.sequence}
+        return jsonify(stats)
     
     def get_capabilities(self):
         """Get memory node capabilities"""
@@ -5,9 +5,10 @@ Provides REST API for inter-node communication.
 import logging
 import requests
 import json
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from flask import Flask, request, jsonify
 from threading import Thread
+from utils.sse import iter_events
 from distributed.protocol import (
     NodeRegistration, TaskRequest, TaskResponse, 
     ReasoningRequest, ToolExecutionRequest, MemoryRequest,
@@ -85,6 +86,32 @@ class NodeClient:
         except Exception as e:
             self.logger.error(f"Reasoning request failed: {e}")
             return f"Error: {str(e)}"
+
+    def reason_stream(self, req: ReasoningRequest):
+        """Request reasoning from LLM node, yielding the response in chunks as they arrive"""
+        try:
+            for chunk in self.stream_events("/reason/stream", req.to_dict(), timeout=300):
+                yield chunk
+        except Exception as e:
+            self.logger.error(f"Reasoning stream failed: {e}")
+            yield f"Error: {str(e)}"
+
+    def stream_events(self, path: str, payload: Dict[str, Any], timeout: float = 300):
+        """
+        POST to an SSE endpoint and yield the text of each chunk event. Returns
+        the payload of the final "done" event; raises on an "error" event.
+        """
+        with requests.post(f"{self.base_url}{path}", json=payload,
+                           timeout=timeout, stream=True) as response:
+            if response.status_code != 200:
+                raise Exception(f"{path} returned {response.status_code}")
+            for event, data in iter_events(response.iter_lines()):
+                if event == "error":
+                    raise Exception(data.get("error", "Unknown error"))
+                if event == "done":
+                    return data
+                yield data.get("text", "")
+        return {}
     
     def execute_tool(self, req: ToolExecutionRequest) -> Any:
         """Request tool execution from tool node"""
@@ -119,6 +146,49 @@ class NodeClient:
         except Exception as e:
             self.logger.error(f"Memory operation failed: {e}")
             raise
+    
+    def memory_batch(self, reqs: List[MemoryRequest]) -> List[Dict[str, Any]]:
+        """
+        Send several memory operations in one round trip. Returns one entry per
+        request: {"result": ...} on success, {"error": ..., "status": ...} on failure.
+        """
+        try:
+            response = requests.post(
+                f"{self.base_url}/memory/batch",
+                json={"requests": [req.to_dict() for req in reqs]},
+                timeout=60
+            )
+            data = response.json()
+            if response.status_code == 200:
+                return data.get("results", [])
+            else:
+                raise Exception(data.get("error", "Unknown error"))
+        except Exception as e:
+            self.logger.error(f"Memory batch failed: {e}")
+            raise
+    
+    def replication_snapshot(self) -> Dict[str, Any]:
+        """Primary memory node's current keys and the log sequence they include"""
+        response = requests.get(f"{self.base_url}/replication/snapshot", timeout=60)
+        response.raise_for_status()
+        return response.json()
+    
+    def replication_log(self, since: int, limit: int = 1000,
+                        epoch: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Primary memory node's write log after sequence `since` of log `epoch`, as
+        {"epoch", "sequence", "entries"}; None if the primary no longer holds all of
+        those entries or has restarted since
+        """
+        response = requests.get(
+            f"{self.base_url}/replication/log",
+            params={"since": since, "limit": limit, "epoch": epoch},
+            timeout=30
+        )
+        if response.status_code == 410:
+            return None
+        response.raise_for_status()
+        return response.json()
 
 
 class NodeServer:
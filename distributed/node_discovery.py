@@ -36,7 +36,8 @@ class NodeDiscovery:
         Returns:
             True if registration successful
         """
-        node_id = str(uuid.uuid4())
+        # Stable across restarts, so re-registering replaces the node's old entry
+        node_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"{node_type.value}://{address}"))
         
         # Get hardware capabilities
         capabilities = self._detect_capabilities()
@@ -3,17 +3,24 @@ Orchestrator Node (Coordinator) - Central Brain
 Responsible for task decomposition, routing, and scheduling.
 Does NOT perform inference or store large memory blobs.
 """
+import itertools
 import logging
+import time
 import uuid
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock, Thread
+from config import NODE_HEALTH_INTERVAL, NODE_HEALTH_FAILURES
 from distributed.network import NodeServer, NodeClient
+from distributed.sharding import HashRing
 from distributed.protocol import (
     NodeType, NodeRegistration, TaskRequest, TaskResponse,
     ReasoningRequest, ToolExecutionRequest, MemoryRequest,
     TaskStatus, HardwareCapabilities
 )
-from flask import request, jsonify
+from flask import Response, request, jsonify, stream_with_context
+from utils.sse import format_event
 
 
 class OrchestratorNode(NodeServer):
@@ -28,12 +35,25 @@ class OrchestratorNode(NodeServer):
         self.node_clients: Dict[str, NodeClient] = {}
         self.active_tasks: Dict[str, TaskRequest] = {}
         self.task_results: Dict[str, TaskResponse] = {}
+        # Memory is sharded by key over all memory nodes; the ring holds their addresses,
+        # which stay the same when a node restarts and registers under a new id
+        self.memory_ring = HashRing()
+        # Ring address -> node_id currently registered there
+        self.memory_primaries: Dict[str, str] = {}
+        # Primary address -> node_ids of the read replicas following it
+        self.memory_replicas: Dict[str, List[str]] = defaultdict(list)
+        self._replica_turn = itertools.count()
+        self._memory_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="memory-fanout")
+        self._nodes_lock = Lock()
+        self._health_failures: Dict[str, int] = defaultdict(int)
         self.logger = logging.getLogger("OrchestratorNode")
         self._setup_orchestrator_routes()
+        Thread(target=self._monitor_nodes, name="NodeHealth", daemon=True).start()
     
     def _setup_orchestrator_routes(self):
         """Setup orchestrator-specific routes"""
         self.app.route("/task", methods=["POST"])(self.handle_task)
+        self.app.route("/task/stream", methods=["POST"])(self.handle_task_stream)
         self.app.route("/nodes", methods=["GET"])(self.list_nodes)
         self.app.route("/task/<task_id>", methods=["GET"])(self.get_task_status)
     
@@ -50,9 +70,29 @@ class OrchestratorNode(NodeServer):
                 metadata=data.get("metadata", {})
             )
             
-            self.registered_nodes[registration.node_id] = registration
-            self.node_clients[registration.node_id] = NodeClient(registration.address)
-            self.logger.info(f"Registered {registration.node_type.value} node: {registration.node_id} at {registration.address}")
+            address = registration.address
+            joined_ring = False
+            with self._nodes_lock:
+                # A node restarting at the same address replaces its old registration
+                for node_id, reg in list(self.registered_nodes.items()):
+                    if reg.address == address and node_id != registration.node_id:
+                        self._forget_node(node_id)
+                self.registered_nodes[registration.node_id] = registration
+                self.node_clients[registration.node_id] = NodeClient(address)
+                self._health_failures.pop(registration.node_id, None)
+                
+                if registration.node_type == NodeType.MEMORY_NODE and registration.metadata.get("role") == "replica":
+                    # Replicas serve reads for their primary's shard and never own keys
+                    self.memory_replicas[registration.metadata["primary"]].append(registration.node_id)
+                elif registration.node_type == NodeType.MEMORY_NODE:
+                    self.memory_primaries[address] = registration.node_id
+                    if address not in self.memory_ring.nodes:
+                        self.memory_ring.add_node(address)
+                        joined_ring = len(self.memory_ring.nodes) > 1
+            self.logger.info(f"Registered {registration.node_type.value} node: {registration.node_id} at {address}")
+            
+            if joined_ring:
+                Thread(target=self._rebalance_memory, args=(address,), daemon=True).start()
             
             return jsonify({"status": "registered", "node_id": registration.node_id})
         except Exception as e:
@@ -66,21 +106,7 @@ class OrchestratorNode(NodeServer):
     
     def handle_task(self):
         """Handle incoming task request from UI or other nodes"""
-        data = request.json
-        
-        # Support both direct requests and TaskRequest format
-        if "payload" in data:
-            # TaskRequest format
-            payload = data.get("payload", {})
-            user_input = payload.get("user_input", "")
-            context = payload.get("context", [])
-        else:
-            # Direct format (for backward compatibility)
-            user_input = data.get("user_input", "")
-            context = data.get("context", [])
-        
-        # Generate task ID
-        task_id = data.get("task_id") or str(uuid.uuid4())
+        task_id, user_input, context = self._parse_task(request.json)
         
         # Decompose task
         plan = self.decompose_task(user_input, context)
@@ -100,6 +126,59 @@ class OrchestratorNode(NodeServer):
             "status": "completed",
             "result": result
         })
+
+    def handle_task_stream(self):
+        """
+        Like /task, but as server-sent events: the reasoning step's text is passed
+        through chunk by chunk as the LLM node produces it, and a final "done"
+        event carries the same body /task returns.
+        """
+        task_id, user_input, context = self._parse_task(request.json)
+
+        def events():
+            try:
+                plan = self.decompose_task(user_input, context)
+                chunks = self._run_plan(plan, task_id, stream=True)
+                while True:
+                    try:
+                        yield format_event({"text": next(chunks)})
+                    except StopIteration as finished:
+                        result = finished.value
+                        break
+                self.task_results[task_id] = TaskResponse(
+                    task_id=task_id,
+                    status=TaskStatus.COMPLETED,
+                    result=result
+                )
+                yield format_event({"task_id": task_id, "status": "completed", "result": result},
+                                   event="done")
+            except Exception as e:
+                self.logger.error(f"Streaming task {task_id} failed: {e}")
+                self.task_results[task_id] = TaskResponse(
+                    task_id=task_id, status=TaskStatus.FAILED, error=str(e)
+                )
+                yield format_event({"task_id": task_id, "error": str(e)}, event="error")
+
+        return Response(stream_with_context(events()), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    @staticmethod
+    def _parse_task(data) -> Tuple[str, str, List[Dict]]:
+        """(task_id, user_input, context) from a task request body"""
+        # Support both direct requests and TaskRequest format
+        if "payload" in data:
+            # TaskRequest format
+            payload = data.get("payload", {})
+            user_input = payload.get("user_input", "")
+            context = payload.get("context", [])
+        else:
+            # Direct format (for backward compatibility)
+            user_input = data.get("user_input", "")
+            context = data.get("context", [])
+        
+        # Generate task ID
+        task_id = data.get("task_id") or str(uuid.uuid4())
+        return task_id, user_input, context
     
     def decompose_task(self, user_input: str, context: List[Dict]) -> Dict[str, Any]:
         """
@@ -131,7 +210,8 @@ class OrchestratorNode(NodeServer):
             "node_type": NodeType.LLM_NODE,
             "payload": {
                 "prompt": user_input,
-                "context": context
+                "context": context,
+                "intent": intent
             },
             "depends_on": ["memory_retrieve"] if not context else []
         })
@@ -151,7 +231,10 @@ class OrchestratorNode(NodeServer):
             "step_id": "memory_store",
             "type": "memory_write",
             "node_type": NodeType.MEMORY_NODE,
-            "payload": {"input": user_input},
+            "payload": {
+                "input": user_input,
+                "metadata": {"task_type": intent, "source": "orchestrator"}
+            },
             "depends_on": ["reasoning"]
         })
         
@@ -198,6 +281,19 @@ class OrchestratorNode(NodeServer):
         Execute the decomposed plan by routing tasks to appropriate nodes.
         Handles dependency resolution and parallelization.
         """
+        steps = self._run_plan(plan, task_id, stream=False)
+        while True:
+            try:
+                next(steps)
+            except StopIteration as finished:
+                return finished.value
+
+    def _run_plan(self, plan: Dict[str, Any], task_id: str, stream: bool):
+        """
+        Generator behind execute_plan and /task/stream. With stream=True the
+        reasoning step's text is yielded in chunks as it arrives; either way the
+        generator returns the plan's result.
+        """
         steps = plan["steps"]
         step_results = {}
         
@@ -221,7 +317,10 @@ class OrchestratorNode(NodeServer):
             
             # Execute ready steps (can be parallelized)
             for step in ready_steps:
-                result = self._execute_step(step, step_results)
+                if stream and step["type"] == "reasoning":
+                    result = yield from self._stream_reasoning(step)
+                else:
+                    result = self._execute_step(step, step_results)
                 step_results[step["step_id"]] = result
                 completed_steps.add(step["step_id"])
         
@@ -242,6 +341,22 @@ class OrchestratorNode(NodeServer):
         node_type = step["node_type"]
         payload = step["payload"]
         
+        # Memory is sharded: reads fan out to every shard, writes go to the key's owner
+        if step["type"] == "memory_read":
+            return self._retrieve_sharded(MemoryRequest(
+                operation="retrieve",
+                query=payload.get("query"),
+                top_k=payload.get("top_k", 5),
+                filters=payload.get("filters"),
+                mode=payload.get("mode", "dense")
+            ))
+        elif step["type"] == "memory_write":
+            return self._store_sharded(MemoryRequest(
+                operation="store",
+                key=payload.get("key"),
+                value=payload
+            ))
+        
         # Select best node for this step
         node_id = self._select_node(node_type, step.get("specialization"))
         
@@ -264,23 +379,19 @@ class OrchestratorNode(NodeServer):
             )
             return client.execute_tool(tool_req)
         
-        elif step["type"] == "memory_read":
-            req = MemoryRequest(
-                operation="retrieve",
-                query=payload.get("query"),
-                top_k=payload.get("top_k", 5)
-            )
-            return client.memory_operation(req)
-        
-        elif step["type"] == "memory_write":
-            req = MemoryRequest(
-                operation="store",
-                value=payload
-            )
-            return client.memory_operation(req)
-        
         else:
             raise Exception(f"Unknown step type: {step['type']}")
+
+    def _stream_reasoning(self, step: Dict[str, Any]):
+        """Reasoning step over the LLM node's stream; yields chunks, returns the full text"""
+        node_id = self._select_node(step["node_type"], step.get("specialization"))
+        if not node_id:
+            raise Exception(f"No available {step['node_type'].value} node")
+        parts = []
+        for chunk in self.node_clients[node_id].reason_stream(ReasoningRequest(**step["payload"])):
+            parts.append(chunk)
+            yield chunk
+        return "".join(parts)
     
     def _select_node(self, node_type: NodeType, specialization: Optional[str] = None) -> Optional[str]:
         """
@@ -291,7 +402,7 @@ class OrchestratorNode(NodeServer):
         - Availability
         """
         candidates = [
-            (node_id, reg) for node_id, reg in self.registered_nodes.items()
+            (node_id, reg) for node_id, reg in list(self.registered_nodes.items())
             if reg.node_type == node_type and reg.capabilities.available
         ]
         
@@ -309,6 +420,132 @@ class OrchestratorNode(NodeServer):
         best_node = min(candidates, key=lambda x: x[1].capabilities.current_load)
         return best_node[0]
     
+    def _memory_shards(self) -> List[Tuple[str, NodeClient]]:
+        """(node_id, client) for every available memory node on the ring"""
+        shards = []
+        for address in list(self.memory_ring.nodes):
+            node_id = self.memory_primaries.get(address)
+            reg = self.registered_nodes.get(node_id)
+            client = self.node_clients.get(node_id)
+            if reg is not None and client is not None and reg.capabilities.available:
+                shards.append((node_id, client))
+        return shards
+    
+    def _retrieve_sharded(self, req: MemoryRequest) -> List[Any]:
+        """Query all shards (each on its primary or a replica) in parallel and merge their top-k by similarity"""
+        shards = self._memory_shards()
+        if not shards:
+            raise Exception(f"No available {NodeType.MEMORY_NODE.value} node")
+        
+        req.include_scores = True
+        futures = {
+            node_id: self._memory_executor.submit(self._read_shard, node_id, client, req)
+            for node_id, client in shards
+        }
+        merged = []
+        for node_id, future in futures.items():
+            try:
+                merged.extend(future.result())
+            except Exception as e:
+                self.logger.warning(f"Memory shard {node_id} failed, merging without it: {e}")
+        
+        merged.sort(key=lambda item: item["similarity"], reverse=True)
+        return [item["metadata"] for item in merged[:req.top_k]]
+    
+    def _read_shard(self, node_id: str, client: NodeClient, req: MemoryRequest) -> Any:
+        """Run a read on the shard's primary or one of its replicas, in rotation"""
+        replicas = [
+            replica_id for replica_id in self.memory_replicas.get(self.registered_nodes[node_id].address, [])
+            if replica_id in self.registered_nodes and self.registered_nodes[replica_id].capabilities.available
+        ]
+        turn = next(self._replica_turn) % (len(replicas) + 1)
+        if turn == len(replicas):
+            return client.memory_operation(req)
+        try:
+            return self.node_clients[replicas[turn]].memory_operation(req)
+        except Exception as e:
+            # Replicas refuse reads while lagging; the primary is always current
+            self.logger.warning(f"Memory replica {replicas[turn]} failed, reading from primary: {e}")
+            return client.memory_operation(req)
+    
+    def _store_sharded(self, req: MemoryRequest) -> Any:
+        """Store on the shard that owns the request key (generating one if needed)"""
+        req.key = req.key or uuid.uuid4().hex
+        client = self.node_clients.get(self.memory_primaries.get(self.memory_ring.owner(req.key)))
+        if client is None:
+            raise Exception(f"No available {NodeType.MEMORY_NODE.value} node")
+        return client.memory_operation(req)
+    
+    def _rebalance_memory(self, new_address: str, batch_size: int = 500):
+        """Move the keys a newly joined memory node now owns from the other shards"""
+        new_client = NodeClient(new_address)
+        # Nodes register before their server is up
+        for _ in range(30):
+            if new_client.health_check():
+                break
+            time.sleep(1)
+        
+        for address in list(self.memory_ring.nodes):
+            # Never move keys from a node onto itself: the delete would drop both copies
+            if address == new_address:
+                continue
+            node_id = self.memory_primaries.get(address)
+            client = self.node_clients.get(node_id)
+            if client is None:
+                continue
+            try:
+                keys = client.memory_operation(MemoryRequest(operation="keys"))
+                moving = [key for key in keys if self.memory_ring.owner(key) == new_address]
+                for start in range(0, len(moving), batch_size):
+                    batch = moving[start:start + batch_size]
+                    # Copy first, then delete, so a failure never loses items
+                    items = client.memory_operation(MemoryRequest(operation="export", value={"keys": batch}))
+                    new_client.memory_operation(MemoryRequest(operation="import", value={"items": items}))
+                    client.memory_operation(MemoryRequest(operation="delete", value={"keys": batch}))
+                self.logger.info(f"Rebalanced {len(moving)} memories from {address} to {new_address}")
+            except Exception as e:
+                self.logger.error(f"Memory rebalance from {address} failed: {e}")
+
+    def _forget_node(self, node_id: str, leave_ring: bool = False):
+        """
+        Drop a registration. With `leave_ring`, a memory primary also leaves the
+        ring, so its keys are owned by the remaining shards. Callers hold _nodes_lock.
+        """
+        reg = self.registered_nodes.pop(node_id, None)
+        self.node_clients.pop(node_id, None)
+        self._health_failures.pop(node_id, None)
+        if reg is None or reg.node_type != NodeType.MEMORY_NODE:
+            return
+        if reg.metadata.get("role") == "replica":
+            replicas = self.memory_replicas.get(reg.metadata.get("primary"), [])
+            if node_id in replicas:
+                replicas.remove(node_id)
+        elif self.memory_primaries.get(reg.address) == node_id and leave_ring:
+            del self.memory_primaries[reg.address]
+            self.memory_ring.remove_node(reg.address)
+
+    def _monitor_nodes(self):
+        """
+        Health-check every registered node. A node failing a check is marked
+        unavailable; after NODE_HEALTH_FAILURES failures in a row it is dropped.
+        """
+        while True:
+            time.sleep(NODE_HEALTH_INTERVAL)
+            for node_id, client in list(self.node_clients.items()):
+                healthy = client.health_check()
+                with self._nodes_lock:
+                    reg = self.registered_nodes.get(node_id)
+                    if reg is None:
+                        continue
+                    reg.capabilities.available = healthy
+                    if healthy:
+                        self._health_failures.pop(node_id, None)
+                        continue
+                    self._health_failures[node_id] += 1
+                    if self._health_failures[node_id] >= NODE_HEALTH_FAILURES:
+                        self.logger.warning(f"Dropping unresponsive {reg.node_type.value} node {node_id} at {reg.address}")
+                        self._forget_node(node_id, leave_ring=True)
+    
     def get_task_status(self, task_id: str):
         """Get status of a task"""
         if task_id in self.task_results:
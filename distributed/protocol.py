@@ -114,6 +114,7 @@ class ReasoningRequest:
     max_tokens: int = 1024
     model_preference: Optional[str] = None
     temperature: float = 0.7
+    intent: Optional[str] = None
     
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -121,7 +122,8 @@ class ReasoningRequest:
             "context": self.context or [],
             "max_tokens": self.max_tokens,
             "model_preference": self.model_preference,
-            "temperature": self.temperature
+            "temperature": self.temperature,
+            "intent": self.intent
         }
 
 
@@ -147,11 +149,17 @@ class ToolExecutionRequest:
 @dataclass
 class MemoryRequest:
     """Request for memory operations"""
-    operation: str  # "store", "retrieve", "query", "update"
+    operation: str  # "store", "retrieve", "retrieve_batch", "query", "update",
+                    # "keys", "export", "import", "delete", "flush", "graph_query"
     key: Optional[str] = None
     value: Optional[Any] = None
     query: Optional[str] = None
     top_k: int = 5
+    queries: Optional[List[str]] = None  # For "retrieve_batch"
+    filters: Optional[Dict[str, Any]] = None  # Metadata predicates, e.g. {"session": "abc"}
+    include_scores: bool = False  # Return {"similarity", "metadata"} entries (for shard merging)
+    include_cold: bool = False  # Also search memories demoted to the cold tier
+    mode: str = "dense"  # Retrieval mode: "dense", "lexical" (BM25) or "hybrid"
     
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -159,6 +167,11 @@ class MemoryRequest:
             "key": self.key,
             "value": self.value,
             "query": self.query,
-            "top_k": self.top_k
+            "top_k": self.top_k,
+            "queries": self.queries,
+            "filters": self.filters,
+            "include_scores": self.include_scores,
+            "include_cold": self.include_cold,
+            "mode": self.mode
         }
 
@@ -0,0 +1,187 @@
+"""
+Primary/replica replication for memory nodes.
+The primary records every memory write (keys only) in a bounded, sequence-numbered
+log. A replica copies a snapshot of the primary's keys, then keeps pulling the
+log from the last sequence it applied. Log entries carry keys, not data: stored
+items are fetched when the entry is served, so a replica always receives the
+current version, and replaying an entry twice leaves the same state.
+The log lives in memory, so sequences restart with the primary; each run has its
+own epoch, and a replica that sees a new epoch reloads a snapshot.
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Dict, List, Optional
+from distributed.network import NodeClient
+from distributed.protocol import MemoryRequest
+from config import REPLICATION_LOG_SIZE, REPLICA_POLL_INTERVAL
+
+
+class ReplicationLog:
+    """Last `capacity` memory writes as (sequence, operation, keys) entries"""
+
+    def __init__(self, capacity: int = REPLICATION_LOG_SIZE):
+        self.epoch = uuid.uuid4().hex  # identifies this run of the primary's sequence
+        self.sequence = 0
+        self._entries = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def append(self, operation: str, keys: List[str]) -> int:
+        with self._lock:
+            self.sequence += 1
+            self._entries.append((self.sequence, operation, list(keys)))
+            return self.sequence
+
+    def since(self, sequence: int, limit: int = 1000) -> Optional[list]:
+        """
+        Up to `limit` entries after `sequence`, or None if some were already dropped
+        (or `sequence` is one this log never reached)
+        """
+        with self._lock:
+            if sequence > self.sequence:
+                return None
+            if not self._entries:
+                return [] if sequence >= self.sequence else None
+            first = self._entries[0][0]
+            if sequence < first - 1:
+                return None
+            start = max(0, sequence - first + 1)
+            return [self._entries[i] for i in range(start, min(len(self._entries), start + limit))]
+
+
+class ReplicaFollower:
+    """
+    Keeps a replica's VectorMemory in sync with the primary at `primary_address`:
+    bootstraps from a snapshot, then applies the primary's log every `poll_interval`
+    seconds, re-snapshotting if it fell behind the retained log.
+    """
+
+    def __init__(self, memory, primary_address: str, poll_interval: float = REPLICA_POLL_INTERVAL,
+                 batch_size: int = 500):
+        self.memory = memory
+        self.primary_address = primary_address
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.applied_sequence = None  # None until the first snapshot is loaded
+        self.primary_sequence = None
+        self.epoch = None  # epoch of the primary's log that applied_sequence counts in
+        self._bootstrapping = False
+        self._caught_up_at = None  # last sync that applied everything the primary had
+        self._sync_failed = False
+        self._client = NodeClient(primary_address)
+        self._running = False
+        self._thread = None
+        self.logger = logging.getLogger("ReplicaFollower")
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="ReplicaFollower", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+
+    @property
+    def lag_seconds(self) -> float:
+        """
+        Seconds since a sync last confirmed the replica held everything the primary had;
+        inf before the snapshot, while a snapshot is reloading (local memory is partial)
+        or while the last sync is failing (the primary may be taking writes the
+        replica cannot see).
+        """
+        if self._caught_up_at is None or self._sync_failed or self._bootstrapping:
+            return float("inf")
+        return time.time() - self._caught_up_at
+
+    def status(self) -> Dict[str, Any]:
+        lag = self.lag_seconds
+        return {
+            "role": "replica",
+            "primary": self.primary_address,
+            "epoch": self.epoch,
+            "applied_sequence": self.applied_sequence,
+            "primary_sequence": self.primary_sequence,
+            "lag_operations": (self.primary_sequence - self.applied_sequence
+                               if self.applied_sequence is not None else None),
+            "lag_seconds": lag if lag != float("inf") else None
+        }
+
+    def sync(self) -> int:
+        """Bring the replica up to date with the primary once; returns entries applied"""
+        try:
+            applied = self._sync()
+        except Exception:
+            self._sync_failed = True
+            raise
+        self._sync_failed = False
+        return applied
+
+    def _sync(self) -> int:
+        if self.applied_sequence is None:
+            self._bootstrap()
+            return 0
+        applied = 0
+        while True:
+            log = self._client.replication_log(self.applied_sequence, self.batch_size, self.epoch)
+            if log is None or log.get("epoch") != self.epoch:
+                self.logger.warning("Fell behind the primary's log or the primary restarted; reloading a snapshot")
+                self._bootstrap()
+                return applied
+            for entry in log["entries"]:
+                self._apply(entry)
+                self.applied_sequence = entry["sequence"]
+            applied += len(log["entries"])
+            self.primary_sequence = log["sequence"]
+            if self.applied_sequence >= self.primary_sequence:
+                self._caught_up_at = time.time()
+                return applied
+
+    def _run(self):
+        while self._running:
+            try:
+                self.sync()
+            except Exception as e:
+                self.logger.error(f"Replication from {self.primary_address} failed: {e}")
+            time.sleep(self.poll_interval)
+
+    def _bootstrap(self):
+        """Replace local memory with the primary's current items"""
+        snapshot = self._client.replication_snapshot()
+        # Reads fall back to the primary until the replica holds the whole snapshot
+        self._bootstrapping = True
+        try:
+            local_keys = self.memory.keys()
+            if local_keys:
+                self.memory.delete(local_keys)
+            keys = snapshot["keys"]
+            for start in range(0, len(keys), self.batch_size):
+                items = self._client.memory_operation(MemoryRequest(
+                    operation="export", value={"keys": keys[start:start + self.batch_size]}
+                ))
+                self.memory.import_items(items)
+            # Writes after the snapshot's sequence may already be in it; replaying them is harmless
+            self.applied_sequence = self.primary_sequence = snapshot["sequence"]
+            self.epoch = snapshot.get("epoch")
+            self._caught_up_at = time.time()
+        finally:
+            self._bootstrapping = False
+        self.logger.info(f"Loaded snapshot of {len(keys)} memories at sequence {snapshot['sequence']}")
+
+    def _apply(self, entry: Dict[str, Any]):
+        operation = entry["operation"]
+        if operation == "upsert":
+            items = entry.get("items", [])
+            if items:
+                # Replaces any copy, including one the replica had demoted to its cold tier
+                self.memory.delete([item["key"] for item in items])
+                self.memory.import_items(items)
+        elif operation == "delete":
+            self.memory.delete(entry["keys"])
+        elif operation == "demote":
+            self.memory.demote(entry["keys"])
+        else:
+            self.logger.warning(f"Skipping unknown replication operation: {operation}")
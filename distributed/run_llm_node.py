@@ -1,7 +1,9 @@
 """
 Entry point for running an LLM Node
 """
+import atexit
 import logging
+import signal
 import sys
 from distributed.llm_node import LLMNode
 from distributed.node_discovery import NodeDiscovery
@@ -38,6 +40,9 @@ def main():
     
     # Start LLM node
     llm_node = LLMNode(port=port, model_name=model, specializations=specializations)
+    # Stop the engine on exit (including SIGTERM) so its response cache is closed cleanly
+    atexit.register(llm_node.shutdown)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     
     # Register with orchestrator
     discovery = NodeDiscovery(orchestrator_addr)
@@ -1,10 +1,13 @@
 """
 Entry point for running a Memory Node
 """
+import atexit
 import logging
+import signal
 import sys
 from distributed.memory_node import MemoryNode
 from distributed.node_discovery import NodeDiscovery
+from config import MEMORY_STORAGE_PATH
 
 def configure_logging():
     logging.basicConfig(
@@ -22,6 +25,9 @@ def main():
     # Parse arguments
     port = int(sys.argv[1]) if len(sys.argv) > 1 else 8003
     orchestrator_addr = sys.argv[2] if len(sys.argv) > 2 else "localhost:8000"
+    storage_path = sys.argv[3] if len(sys.argv) > 3 else MEMORY_STORAGE_PATH
+    # Address of a primary memory node (as it registered) to run as its read replica
+    primary = sys.argv[4] if len(sys.argv) > 4 else None
     
     print(f"""
     ╔═══════════════════════════════════════╗
@@ -30,17 +36,23 @@ def main():
     ╚═══════════════════════════════════════╝
     
     Port: {port}
+    Storage: {storage_path}
+    Role: {f"replica of {primary}" if primary else "primary"}
     """)
     
     # Start memory node
-    memory_node = MemoryNode(port=port)
+    memory_node = MemoryNode(port=port, storage_path=storage_path, primary=primary)
+    # Close memory on exit (including SIGTERM) so its final snapshot is written
+    atexit.register(memory_node.shutdown)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     
     # Register with orchestrator
     discovery = NodeDiscovery(orchestrator_addr)
     local_ip = NodeDiscovery.get_local_ip()
     discovery.register_node(
         node_type=memory_node.node_type,
-        address=f"{local_ip}:{port}"
+        address=f"{local_ip}:{port}",
+        metadata={"role": "replica", "primary": primary} if primary else {"role": "primary"}
     )
     
     # Start server
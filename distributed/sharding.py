@@ -0,0 +1,46 @@
+"""
+Consistent hashing for sharding memory across memory nodes.
+Adding a node moves only the keys that now hash to it (about 1/n of them).
+"""
+import bisect
+import hashlib
+from typing import Dict, List, Optional
+
+
+class HashRing:
+    """Consistent hash ring with virtual nodes for an even key spread"""
+
+    def __init__(self, replicas: int = 64):
+        self.replicas = replicas
+        self._points: List[int] = []
+        self._owners: Dict[int, str] = {}
+        self.nodes: List[str] = []
+
+    def add_node(self, node_id: str):
+        if node_id in self.nodes:
+            return
+        self.nodes.append(node_id)
+        for i in range(self.replicas):
+            point = self._hash(f"{node_id}#{i}")
+            bisect.insort(self._points, point)
+            self._owners[point] = node_id
+
+    def remove_node(self, node_id: str):
+        if node_id not in self.nodes:
+            return
+        self.nodes.remove(node_id)
+        for i in range(self.replicas):
+            point = self._hash(f"{node_id}#{i}")
+            self._points.remove(point)
+            del self._owners[point]
+
+    def owner(self, key: str) -> Optional[str]:
+        """Node responsible for `key`: the first ring point clockwise of its hash"""
+        if not self._points:
+            return None
+        i = bisect.bisect(self._points, self._hash(key)) % len(self._points)
+        return self._owners[self._points[i]]
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
@@ -35,8 +35,14 @@ class CommandLineInterface:
                     print("Chat history cleared")
                     continue
                 
-                response = agent.process_request(user_input, history=self.chat_history)
-                print(f"\nKamil: {response}\n")
+                # Print the response as it is generated
+                print("\nKamil: ", end="", flush=True)
+                parts = []
+                for chunk in agent.process_request_stream(user_input, history=self.chat_history):
+                    parts.append(chunk)
+                    print(chunk, end="", flush=True)
+                print("\n")
+                response = "".join(parts)
                 
                 # Store interaction
                 self.chat_history.append((user_input, response))
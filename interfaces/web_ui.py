@@ -2,8 +2,9 @@ import threading
 import logging
 import os
 import json
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, Response, render_template, request, jsonify, session, stream_with_context
 from core.agent import SAFETY_KEYWORDS
+from utils.sse import format_event
 import uuid
 
 # Get the current directory of this file
@@ -53,18 +54,42 @@ def chat():
         
         # Get agent from application context
         agent = app.config['AGENT']
+        if request.json.get('stream'):
+            return stream_chat(agent, session_id, user_input, history)
         response = agent.process_request(user_input, history=history)
         
         # Store interaction
-        chat_sessions[session_id].append((user_input, response))
-        if len(chat_sessions[session_id]) > 20:  # Limit history
-            chat_sessions[session_id] = chat_sessions[session_id][-10:]
+        store_interaction(session_id, user_input, response)
         
         return jsonify({'response': response})
     except Exception as e:
         logger.exception("Error processing request")
         return jsonify({'response': f"Error: {str(e)}"}), 500
 
+def stream_chat(agent, session_id, user_input, history):
+    """Server-sent events with the response text as it is generated, then a "done" event"""
+    def events():
+        parts = []
+        try:
+            for chunk in agent.process_request_stream(user_input, history=history):
+                parts.append(chunk)
+                yield format_event({'text': chunk})
+            yield format_event({}, event='done')
+        except Exception as e:
+            logger.exception("Error streaming response")
+            yield format_event({'error': str(e)}, event='error')
+        finally:
+            if parts:
+                store_interaction(session_id, user_input, "".join(parts))
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def store_interaction(session_id, user_input, response):
+    chat_sessions[session_id].append((user_input, response))
+    if len(chat_sessions[session_id]) > 20:  # Limit history
+        chat_sessions[session_id] = chat_sessions[session_id][-10:]
+
 @app.route('/file_operation', methods=['POST'])
 def file_operation():
     try:
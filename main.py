@@ -47,6 +47,13 @@ def main():
         print("Monolithic mode - all components in single process")
         agent = KamilAgent()
     
+    try:
+        run_interface(agent)
+    finally:
+        if hasattr(agent, "shutdown"):
+            agent.shutdown()
+
+def run_interface(agent):
     interface_type = input("Choose interface (voice/cli/web): ").strip().lower()
     
     if interface_type == "voice":
@@ -0,0 +1,136 @@
+"""
+Approximate nearest-neighbour indexes for VectorDatabase.
+An index only proposes candidate rows; VectorDatabase scores them exactly.
+"""
+import logging
+import numpy as np
+from memory_store.snapshot import pack, unpack
+
+
+class IVFIndex:
+    """
+    Inverted-file index over unit vectors.
+    A spherical k-means coarse quantizer splits the rows into `n_lists` lists;
+    a query scans only the `nprobe` lists whose centroids are closest.
+    """
+
+    name = "ivf"
+
+    def __init__(self, n_lists: int = 256, nprobe: int = 8, train_size: int = None,
+                 kmeans_iters: int = 10, seed: int = 0):
+        self.n_lists = n_lists
+        self.nprobe = nprobe
+        # Below this many rows an exact scan is cheap enough; train once we reach it
+        self.train_size = train_size or 39 * n_lists
+        self.kmeans_iters = kmeans_iters
+        self.centroids = None
+        self._lists = []
+        self._list_sizes = None
+        self._rng = np.random.default_rng(seed)
+        self.logger = logging.getLogger("IVFIndex")
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def train(self, vectors: np.ndarray):
+        """Fit the coarse quantizer on `vectors` and assign every row to a list"""
+        n = vectors.shape[0]
+        n_lists = min(self.n_lists, n)
+        sample_size = min(n, 64 * n_lists)
+        sample = vectors[self._rng.choice(n, sample_size, replace=False)]
+
+        centroids = sample[self._rng.choice(sample_size, n_lists, replace=False)].copy()
+        for _ in range(self.kmeans_iters):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            norms = np.linalg.norm(sums, axis=1)
+            empty = norms == 0
+            if np.any(empty):
+                # Reseed empty lists from random sample rows
+                sums[empty] = sample[self._rng.choice(sample_size, int(empty.sum()))]
+                norms[empty] = np.linalg.norm(sums[empty], axis=1)
+            centroids = sums / np.maximum(norms, 1e-12)[:, None]
+
+        self.centroids = centroids.astype(np.float32)
+        self._lists = [np.empty(16, dtype=np.int64) for _ in range(n_lists)]
+        self._list_sizes = np.zeros(n_lists, dtype=np.int64)
+        self.add(np.arange(n), vectors)
+        self.logger.info(f"Trained IVF index with {n_lists} lists on {sample_size} of {n} vectors")
+
+    def add(self, rows: np.ndarray, vectors: np.ndarray, chunk_size: int = 65536):
+        """Assign new rows (already unit length) to their nearest lists"""
+        rows = np.atleast_1d(np.asarray(rows, dtype=np.int64))
+        vectors = np.atleast_2d(vectors)
+        for start in range(0, rows.shape[0], chunk_size):
+            chunk_rows = rows[start:start + chunk_size]
+            assignment = np.argmax(vectors[start:start + chunk_size] @ self.centroids.T, axis=1)
+            if chunk_rows.shape[0] == 1:
+                self._append(int(assignment[0]), chunk_rows)
+                continue
+            order = np.argsort(assignment, kind="stable")
+            lists, starts = np.unique(assignment[order], return_index=True)
+            for list_id, members in zip(lists, np.split(chunk_rows[order], starts[1:])):
+                self._append(int(list_id), members)
+
+    def candidates(self, query: np.ndarray, nprobe: int = None) -> np.ndarray:
+        """Row ids stored in the `nprobe` lists nearest to a unit-length query"""
+        nprobe = min(nprobe or self.nprobe, self.centroids.shape[0])
+        scores = self.centroids @ query
+        if nprobe < scores.shape[0]:
+            probe = np.argpartition(scores, scores.shape[0] - nprobe)[-nprobe:]
+        else:
+            probe = np.arange(scores.shape[0])
+        return np.concatenate([self._lists[i][:self._list_sizes[i]] for i in probe])
+
+    def state(self) -> tuple:
+        """(info, arrays) for a snapshot of a trained index"""
+        rows, offsets = pack([self._lists[i][:self._list_sizes[i]] for i in range(len(self._lists))], np.int64)
+        return {"name": self.name}, {"centroids": self.centroids, "rows": rows, "offsets": offsets}
+
+    def load_state(self, info: dict, arrays: dict) -> bool:
+        if info.get("name") != self.name:
+            return False
+        self.centroids = arrays["centroids"]
+        # Lists are slices of the mapped snapshot until they grow; empty ones get room up front
+        self._lists = [rows if rows.shape[0] else np.empty(16, dtype=np.int64)
+                       for rows in unpack(arrays["rows"], arrays["offsets"])]
+        self._list_sizes = np.diff(arrays["offsets"])
+        return True
+
+    def remap(self, mapping: np.ndarray):
+        """Renumber rows after compaction; rows mapped to -1 are dropped"""
+        for list_id in range(len(self._lists)):
+            rows = mapping[self._lists[list_id][:self._list_sizes[list_id]]]
+            rows = rows[rows >= 0]
+            self._lists[list_id] = np.concatenate([rows, np.empty(max(16, rows.shape[0]), dtype=np.int64)])
+            self._list_sizes[list_id] = rows.shape[0]
+
+    def _append(self, list_id: int, rows: np.ndarray):
+        size = self._list_sizes[list_id]
+        needed = size + rows.shape[0]
+        members = self._lists[list_id]
+        if needed > members.shape[0]:
+            capacity = members.shape[0]
+            while capacity < needed:
+                capacity *= 2
+            grown = np.empty(capacity, dtype=np.int64)
+            grown[:size] = members[:size]
+            self._lists[list_id] = members = grown
+        members[size:needed] = rows
+        self._list_sizes[list_id] = needed
+
+
+INDEX_TYPES = {
+    IVFIndex.name: IVFIndex,
+}
+
+
+def create_index(index_type: str, **params):
+    """Build an ANN index by name; "flat" means exact search (no index)"""
+    if index_type in (None, "flat"):
+        return None
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type: {index_type}")
+    return INDEX_TYPES[index_type](**params)
@@ -0,0 +1,176 @@
+"""
+Cold tier for memories evicted from the hot VectorDatabase.
+Each eviction batch becomes one compressed chunk file (float16 vectors plus
+gzipped JSON metadata); searching streams over the chunks on demand.
+Chunks are never rewritten: deleting an item appends a (chunk, key) tombstone
+to deleted.log, and tombstoned items are skipped from then on.
+"""
+import gzip
+import json
+import logging
+import os
+import threading
+import numpy as np
+
+
+class ColdTier:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger("ColdTier")
+        os.makedirs(path, exist_ok=True)
+        # Chunk files are named chunk-<sequence>-<item count>.npz
+        self._chunks = sorted(f for f in os.listdir(path) if f.endswith(".npz"))
+        self._deleted = self._load_tombstones()  # chunk -> keys deleted from it
+        self.count = (sum(int(chunk[:-len(".npz")].rsplit("-", 1)[1]) for chunk in self._chunks)
+                      - sum(len(keys) for keys in self._deleted.values()))
+        self._key_chunks = None  # key -> chunks holding it, built on the first keyed lookup
+        self.logger.info(f"Cold tier at {path} holds {self.count} items")
+
+    def __len__(self):
+        return self.count
+
+    def append(self, items: list):
+        """Write a batch of {"vector", "metadata"} items as one compressed chunk"""
+        if not items:
+            return
+        vectors = np.asarray([item["vector"] for item in items], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = (vectors / np.where(norms > 0, norms, 1.0)).astype(np.float16)
+        records = "\n".join(json.dumps(item["metadata"], default=str) for item in items)
+        metadata = np.frombuffer(gzip.compress(records.encode("utf-8")), dtype=np.uint8)
+
+        with self._lock:
+            name = f"chunk-{len(self._chunks):06d}-{len(items)}.npz"
+            tmp = os.path.join(self.path, name + ".tmp")
+            with open(tmp, "wb") as f:
+                np.savez_compressed(f, vectors=vectors, metadata=metadata)
+            os.replace(tmp, os.path.join(self.path, name))
+            self._chunks.append(name)
+            self.count += len(items)
+            if self._key_chunks is not None:
+                for item in items:
+                    self._key_chunks.setdefault(item["metadata"].get("key"), []).append(name)
+        self.logger.info(f"Demoted {len(items)} items to cold tier")
+
+    def search(self, query_vector, top_k: int = 5, filters: dict = None) -> list:
+        """Exact cosine search over every chunk; returns {"similarity", "metadata"} entries"""
+        query = np.asarray(query_vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(query)
+        if not self._chunks or norm == 0:
+            return []
+        query = query / norm
+
+        best = []
+        for chunk in list(self._chunks):
+            with np.load(os.path.join(self.path, chunk)) as data:
+                scores = data["vectors"].astype(np.float32) @ query
+                records = self._records(data)
+            deleted = self._deleted.get(chunk, ())
+            taken = 0
+            for i in np.argsort(scores)[::-1]:
+                metadata = json.loads(records[i])
+                if deleted and metadata.get("key") in deleted:
+                    continue
+                if filters and not self._matches(metadata, filters):
+                    continue
+                best.append({"similarity": float(scores[i]), "metadata": metadata})
+                taken += 1
+                if taken >= top_k:
+                    break
+            best = sorted(best, key=lambda item: item["similarity"], reverse=True)[:top_k]
+        return best
+
+    def get(self, keys: list) -> list:
+        """Live items for `keys` as {"key", "vector", "metadata"} dicts (vectors unit length)"""
+        wanted = set(keys)
+        items = []
+        with self._lock:
+            for chunk in self._chunks_holding(wanted):
+                deleted = self._deleted.get(chunk, ())
+                with np.load(os.path.join(self.path, chunk)) as data:
+                    vectors = data["vectors"]
+                    for i, line in enumerate(self._records(data)):
+                        metadata = json.loads(line)
+                        key = metadata.get("key")
+                        if key in wanted and key not in deleted:
+                            items.append({"key": key, "vector": vectors[i].astype(np.float32).tolist(),
+                                          "metadata": metadata})
+        return items
+
+    def delete(self, keys: list) -> int:
+        """Tombstone the items stored under `keys`; returns how many were live"""
+        wanted = set(keys)
+        tombstones = []
+        with self._lock:
+            for chunk in self._chunks_holding(wanted):
+                deleted = self._deleted.setdefault(chunk, set())
+                with np.load(os.path.join(self.path, chunk)) as data:
+                    for line in self._records(data):
+                        key = json.loads(line).get("key")
+                        if key in wanted and key not in deleted:
+                            deleted.add(key)
+                            tombstones.append([chunk, key])
+            if tombstones:
+                with open(os.path.join(self.path, "deleted.log"), "a") as f:
+                    f.write("".join(json.dumps(tombstone) + "\n" for tombstone in tombstones))
+                    f.flush()
+                    os.fsync(f.fileno())
+                self.count -= len(tombstones)
+        if tombstones:
+            self.logger.info(f"Deleted {len(tombstones)} items from cold tier")
+        return len(tombstones)
+
+    def _chunks_holding(self, keys: set) -> list:
+        """Chunks that hold any of `keys` (caller holds the lock)"""
+        if not self._chunks:
+            return []
+        if self._key_chunks is None:
+            self._key_chunks = {}
+            for chunk in self._chunks:
+                with np.load(os.path.join(self.path, chunk)) as data:
+                    for line in self._records(data):
+                        self._key_chunks.setdefault(json.loads(line).get("key"), []).append(chunk)
+        chunks = {chunk for key in keys for chunk in self._key_chunks.get(key, ())}
+        return [chunk for chunk in self._chunks if chunk in chunks]
+
+    def _load_tombstones(self) -> dict:
+        deleted = {}
+        log_path = os.path.join(self.path, "deleted.log")
+        if not os.path.exists(log_path):
+            return deleted
+        valid_bytes = 0
+        with open(log_path, "rb") as f:
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError
+                    chunk, key = json.loads(line)
+                except ValueError:
+                    break  # torn final write
+                deleted.setdefault(chunk, set()).add(key)
+                valid_bytes += len(line)
+        if valid_bytes < os.path.getsize(log_path):
+            with open(log_path, "r+b") as f:
+                f.truncate(valid_bytes)
+        return deleted
+
+    @staticmethod
+    def _records(data) -> list:
+        return gzip.decompress(data["metadata"].tobytes()).decode("utf-8").split("\n")
+
+    @staticmethod
+    def _matches(metadata: dict, filters: dict) -> bool:
+        """Evaluate MetadataIndex-style filters directly against one record"""
+        for field, predicate in filters.items():
+            value = metadata.get(field)
+            if field == "timestamp":
+                start, end = predicate
+                if value is None or (start is not None and value < start) or (end is not None and value > end):
+                    return False
+            elif isinstance(predicate, (list, tuple, set)):
+                if value not in predicate:
+                    return False
+            elif value != predicate:
+                return False
+        return True
@@ -0,0 +1,185 @@
+"""
+Text embedding backends for VectorMemory.
+"hashing" works fully offline: words, word bigrams and character trigrams
+are feature-hashed into a fixed-size vector with sublinear term weights.
+"sentence-transformer" runs EMBEDDING_MODEL on CPU when the package is
+installed. Either way CachedEmbedder embeds each distinct text once, keeping
+recent vectors in an LRU and all of them in an on-disk cache.
+"""
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import zlib
+from collections import Counter, OrderedDict
+import numpy as np
+
+# Letters and digits of any script (\w without the underscore, so ASCII text tokenizes as before)
+_TOKEN = re.compile(r"[^\W_]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by do does for from had has have he her his how i if in is it its "
+    "me my no not of on or our she so that the their them then there they this to was we were "
+    "what when where which who why will with you your".split()
+)
+
+
+class HashingEmbedder:
+    """Feature-hashing bag of words, bigrams and character trigrams (no model, no state)"""
+
+    name = "hashing"
+    version = 2  # bumped when the features change, so cached vectors are recomputed
+
+    def __init__(self, dim: int = 512, char_ngrams: int = 3):
+        self.dim = dim
+        self.char_ngrams = char_ngrams
+
+    def embed(self, texts: list) -> np.ndarray:
+        """Unit-length embeddings, one row per text (all-zero for texts without tokens)"""
+        rows, cols, values = [], [], []
+        for i, text in enumerate(texts):
+            for feature, count in self._features(text).items():
+                h = zlib.crc32(feature.encode("utf-8"))
+                rows.append(i)
+                cols.append((h >> 1) % self.dim)
+                # The low bit picks a sign so colliding features tend to cancel out
+                values.append((1.0 + np.log(count)) * (1.0 if h & 1 else -1.0))
+
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        np.add.at(vectors, (np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)),
+                  np.asarray(values, dtype=np.float32))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1.0)
+
+    def _features(self, text: str) -> Counter:
+        words = [w for w in _TOKEN.findall(text.lower()) if w not in _STOPWORDS]
+        features = Counter(words)
+        features.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+        n = self.char_ngrams
+        for word in words:
+            if len(word) > n:
+                padded = f"<{word}>"
+                features.update("#" + padded[j:j + n] for j in range(len(padded) - n + 1))
+        return features
+
+
+class SentenceTransformerEmbedder:
+    """Local sentence-transformers model on CPU (requires the sentence-transformers package)"""
+
+    name = "sentence-transformer"
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", batch_size: int = 32):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.batch_size = batch_size
+
+    def embed(self, texts: list) -> np.ndarray:
+        return self.model.encode(list(texts), batch_size=self.batch_size, convert_to_numpy=True,
+                                 normalize_embeddings=True).astype(np.float32)
+
+
+EMBEDDER_TYPES = {
+    HashingEmbedder.name: HashingEmbedder,
+    SentenceTransformerEmbedder.name: SentenceTransformerEmbedder,
+}
+
+
+def create_embedder(backend: str, **params):
+    """Build an embedding backend by name, falling back to "hashing" if a model cannot load"""
+    if backend not in EMBEDDER_TYPES:
+        raise ValueError(f"Unknown embedding backend: {backend}")
+    try:
+        return EMBEDDER_TYPES[backend](**params)
+    except ImportError as e:
+        logging.getLogger("Embeddings").warning(f"Embedding backend '{backend}' unavailable ({e}), "
+                                                f"using feature hashing")
+        return HashingEmbedder()
+
+
+class CachedEmbedder:
+    """
+    Wraps a backend with an in-memory LRU of `cache_size` vectors and, with
+    `cache_path`, a SQLite table of every vector computed so far. Entries are
+    keyed by a hash of the backend, its dimension and the text, so switching
+    backends never returns stale vectors.
+    """
+
+    def __init__(self, backend, cache_size: int = 10000, cache_path: str = None):
+        self.backend = backend
+        self.dim = backend.dim
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if cache_path:
+            self._db = sqlite3.connect(cache_path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB)")
+            self._db.commit()
+        self.logger = logging.getLogger("Embeddings")
+
+    def embed_one(self, text: str) -> np.ndarray:
+        return self.embed([text])[0]
+
+    def embed(self, texts: list) -> np.ndarray:
+        """Embeddings for `texts`; only texts not seen before reach the backend, in one batch"""
+        keys = [self._key(text) for text in texts]
+        vectors = np.empty((len(texts), self.dim), dtype=np.float32)
+        missing = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._lru.get(key)
+                if vector is not None:
+                    self._lru.move_to_end(key)
+                    vectors[i] = vector
+                else:
+                    missing.setdefault(key, []).append(i)
+            self.hits += len(texts) - sum(len(positions) for positions in missing.values())
+
+            if missing and self._db is not None:
+                for key, vector in self._load(list(missing)).items():
+                    vectors[missing[key]] = vector
+                    self.hits += len(missing.pop(key))
+                    self._remember(key, vector)
+
+        if missing:
+            new_keys = list(missing)
+            computed = self.backend.embed([texts[missing[key][0]] for key in new_keys])
+            with self._lock:
+                self.misses += len(new_keys)
+                for key, vector in zip(new_keys, computed):
+                    vectors[missing[key]] = vector
+                    self._remember(key, vector)
+                if self._db is not None:
+                    self._db.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?)",
+                                         [(key, vector.astype(np.float32).tobytes())
+                                          for key, vector in zip(new_keys, computed)])
+                    self._db.commit()
+        return vectors
+
+    def close(self):
+        if self._db is not None:
+            with self._lock:
+                self._db.close()
+                self._db = None
+
+    def _load(self, keys: list, chunk_size: int = 500) -> dict:
+        found = {}
+        for start in range(0, len(keys), chunk_size):
+            chunk = keys[start:start + chunk_size]
+            query = f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})"
+            for key, blob in self._db.execute(query, chunk):
+                found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._lru[key] = vector
+        if len(self._lru) > self.cache_size:
+            self._lru.popitem(last=False)
+
+    def _key(self, text: str) -> str:
+        version = getattr(self.backend, "version", 1)
+        prefix = self.backend.name if version == 1 else f"{self.backend.name}.v{version}"
+        return hashlib.sha1(f"{prefix}:{self.dim}:{text}".encode("utf-8")).hexdigest()
@@ -0,0 +1,126 @@
+"""
+Entity extraction for the knowledge graph.
+Pulls identifiers, content words, capitalized phrases ("Knowledge Graph") and
+repeated bigrams out of interaction text, normalized to lower case, with
+stopwords, numbers and corpus-wide common terms filtered out.
+"""
+import re
+from collections import Counter
+import numpy as np
+
+# Words in any script plus identifiers such as snake_case, dotted paths (os.path.join, main.py)
+# and hyphenated terms
+_TOKEN = re.compile(r"[^\W\d]\w*(?:[.\-]\w+)*")
+_SENTENCE_BREAK = re.compile(r"[.!?:;\n]\s")
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being
+below between both but by can could did do does doing done down during each either else even ever
+every few for from further get gets got had has have having he her here hers herself him himself his
+how however i if in into is it its itself just let like made make many may me might more most much
+must my myself need no nor not now of off often on once one only or other others our ours ourselves
+out over own please same shall she should so some such than that the their theirs them themselves
+then there these they this those though through to too under until up upon us use used using very
+via want was we well were what when where whether which while who whom whose why will with within
+without would yes yet you your yours yourself yourselves
+""".split())
+
+
+class EntityExtractor:
+    """
+    Extracts at most `max_entities` entities per text, in order of first
+    appearance. Tokens shorter than `min_length` are dropped, and once
+    `min_documents` texts have been seen, so are terms occurring in more
+    than `max_document_ratio` of them.
+    """
+
+    def __init__(self, min_length: int = 3, max_entities: int = 48,
+                 max_document_ratio: float = 0.3, min_documents: int = 200,
+                 stopwords=STOPWORDS):
+        self.min_length = min_length
+        self.max_entities = max_entities
+        self.max_document_ratio = max_document_ratio
+        self.min_documents = min_documents
+        self.stopwords = stopwords
+        self.documents = 0
+        self._document_frequency = Counter()
+
+    def state(self) -> tuple:
+        """(info, arrays) for a snapshot of the corpus frequencies"""
+        terms = list(self._document_frequency)
+        counts = np.fromiter((self._document_frequency[t] for t in terms), dtype=np.int64, count=len(terms))
+        return {"documents": self.documents, "terms": terms}, {"counts": counts}
+
+    def load_state(self, info: dict, arrays: dict) -> bool:
+        self.documents = info["documents"]
+        self._document_frequency = Counter(dict(zip(info["terms"], arrays["counts"].tolist())))
+        return True
+
+    def extract(self, text: str) -> list:
+        """Entities of one text, without updating corpus frequencies (e.g. for queries)"""
+        return self.extract_batch([text], update_frequencies=False)[0]
+
+    def extract_batch(self, texts: list, update_frequencies: bool = True) -> list:
+        """Entity lists for `texts`; by default the texts also count towards corpus frequencies"""
+        candidates = [self._candidates(text) for text in texts]
+        if update_frequencies:
+            for terms, _ in candidates:
+                self._document_frequency.update(set(terms))
+            self.documents += len(texts)
+        limit = self.max_document_ratio * self.documents if self.documents >= self.min_documents else None
+        return [self._select(terms, phrases, limit) for terms, phrases in candidates]
+
+    def _candidates(self, text: str):
+        """
+        Candidate terms of `text` in order (words, bigrams and capitalized phrases,
+        repeats included), plus the set of capitalized phrases
+        """
+        stopwords, min_length = self.stopwords, self.min_length
+        terms, phrases = [], set()
+        for sentence in _SENTENCE_BREAK.split(text):
+            phrase = []
+            previous = None
+            for token in _TOKEN.findall(sentence):
+                lower = token.lower()
+                if lower in stopwords or len(lower) < min_length:
+                    # A skipped token ends any phrase or bigram in progress
+                    if phrase:
+                        self._close_phrase(phrase, terms, phrases)
+                    previous = None
+                    continue
+                terms.append(lower)
+                if previous is not None:
+                    terms.append(f"{previous} {lower}")
+                previous = lower
+                if token[0].isupper() and not token.isupper():
+                    phrase.append(lower)
+                elif phrase:
+                    self._close_phrase(phrase, terms, phrases)
+            if phrase:
+                self._close_phrase(phrase, terms, phrases)
+        return terms, phrases
+
+    @staticmethod
+    def _close_phrase(phrase: list, terms: list, phrases: set):
+        # Runs of capitalized words name things ("Knowledge Graph", "New York City")
+        if len(phrase) > 1:
+            name = " ".join(phrase)
+            phrases.add(name)
+            if len(phrase) > 2:
+                terms.append(name)  # two-word phrases are already there as bigrams
+        phrase.clear()
+
+    def _select(self, terms: list, phrases: set, limit) -> list:
+        counts = Counter(terms)
+        keep = []
+        for term, count in counts.items():
+            if count < 2 and " " in term and term not in phrases:
+                continue  # an ordinary bigram is only an entity when it repeats
+            if limit is not None and self._document_frequency[term] > limit:
+                continue
+            keep.append(term)
+        if len(keep) > self.max_entities:
+            # Prefer frequent terms, then earlier ones; Counter preserves first-seen order
+            ranked = sorted(range(len(keep)), key=lambda i: -counts[keep[i]])[:self.max_entities]
+            keep = [keep[i] for i in sorted(ranked)]
+        return keep
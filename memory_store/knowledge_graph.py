@@ -1,27 +1,269 @@
+import json
 import logging
+import os
+import threading
+import numpy as np
 
 class KnowledgeGraph:
-    def __init__(self):
-        self.graph = {}
+    """
+    Weighted entity co-occurrence graph.
+    Entities are interned to integer ids. Each interaction links an entity to the
+    next `window` entities after it (not to every other entity), adding 1 to the
+    edge weight. Edges accumulate in a delta buffer that is merged (once it holds
+    `merge_every` edges, or as many as the graph) into a CSR adjacency
+    (indptr/indices/weights arrays), keeping only the `max_degree` heaviest
+    edges of each entity.
+    Queries (neighbors, expand, personalized_pagerank) run as array operations
+    over the merged adjacency.
+    Given `state` (a snapshot from state()), the adjacency is mapped from it and
+    only the entity log written after the snapshot is replayed.
+    """
+
+    def __init__(self, storage_path: str = None, window: int = 5, max_degree: int = 64,
+                 merge_every: int = 65536, state: tuple = None):
+        self.window = window
+        self.max_degree = max_degree
+        self.merge_every = merge_every
+        self.entities = []  # id -> entity
+        self._ids = {}      # entity -> id
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.indices = np.empty(0, dtype=np.int32)
+        self.weights = np.empty(0, dtype=np.float32)
+        self._edge_src = np.empty(0, dtype=np.int32)  # source id of each CSR edge
+        self._delta_src = np.empty(1024, dtype=np.int32)
+        self._delta_dst = np.empty(1024, dtype=np.int32)
+        self._delta_size = 0
+        self._lock = threading.RLock()
         self.logger = logging.getLogger("KnowledgeGraph")
+        self._log = None
+        log_offset = 0
+        if state is not None:
+            log_offset = self._load_state(*state)
+        if storage_path:
+            self._open_log(storage_path, log_offset)
         self.logger.info("Knowledge graph initialized")
 
+    def __len__(self):
+        return len(self.entities)
+
+    @property
+    def edge_count(self) -> int:
+        """Distinct directed edges (the delta buffer is merged first, since it repeats pairs)"""
+        return int(self._adjacency()[1].shape[0])
+
     def add_entities(self, entities: list):
+        """Record co-occurrences among `entities`, given in the order they appeared"""
         if not entities:
             return
-            
-        self.logger.info(f"Adding {len(entities)} entities to graph")
-        
-        # Create connections between all entities in the list
-        for i, entity in enumerate(entities):
-            # Add the entity if not present
-            if entity not in self.graph:
-                self.graph[entity] = set()
-            
-            # Connect to all other entities
-            for other in entities[i+1:]:
-                self.graph[entity].add(other)
-                # Ensure the other entity exists in the graph
-                if other not in self.graph:
-                    self.graph[other] = set()
-                self.graph[other].add(entity)
+
+        self.logger.debug(f"Adding {len(entities)} entities to graph")
+        with self._lock:
+            if self._log is not None:
+                self._log.write(json.dumps(entities) + "\n")
+                self._log.flush()
+            self._connect(entities)
+
+    def neighbors(self, entity: str, top_n: int = None) -> dict:
+        """Neighbour -> co-occurrence weight, heaviest first"""
+        node = self._ids.get(entity)
+        if node is None:
+            return {}
+        indptr, indices, weights, _ = self._adjacency()
+        start, end = indptr[node], indptr[node + 1]
+        order = np.argsort(weights[start:end])[::-1][:top_n]
+        return {self.entities[indices[start + i]]: float(weights[start + i]) for i in order}
+
+    def expand(self, seeds: list, hops: int = 2, max_nodes: int = None) -> dict:
+        """
+        Entities within `hops` edges of any known seed -> hop distance (seeds are 0),
+        nearest first; stops growing once `max_nodes` entities are reached.
+        """
+        indptr, indices, _, _ = self._adjacency()
+        frontier = np.unique(self._lookup(seeds))
+        distance = np.full(len(self.entities), -1, dtype=np.int32)
+        distance[frontier] = 0
+        reached = frontier.shape[0]
+        for hop in range(1, hops + 1):
+            if not frontier.shape[0] or (max_nodes and reached >= max_nodes):
+                break
+            # Gather the CSR rows of the whole frontier at once
+            starts, ends = indptr[frontier], indptr[frontier + 1]
+            lengths = ends - starts
+            offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+            frontier = np.unique(indices[offsets])
+            frontier = frontier[distance[frontier] < 0]
+            if max_nodes:
+                frontier = frontier[:max_nodes - reached]
+            distance[frontier] = hop
+            reached += frontier.shape[0]
+        nodes = np.flatnonzero(distance >= 0)
+        nodes = nodes[np.argsort(distance[nodes], kind="stable")]
+        return {self.entities[node]: int(distance[node]) for node in nodes}
+
+    def personalized_pagerank(self, seeds: list, top_n: int = 10, alpha: float = 0.85,
+                              iterations: int = 30, tol: float = 1e-6) -> dict:
+        """
+        Entities most related to `seeds` by random walks with restart (probability
+        1 - `alpha`) to the seeds, as entity -> score, best first. Seeds themselves
+        are excluded from the result.
+        """
+        indptr, indices, weights, edge_src = self._adjacency()
+        seed_ids = np.unique(self._lookup(seeds))
+        n = len(self.entities)
+        if not seed_ids.shape[0] or not n:
+            return {}
+
+        restart = np.zeros(n, dtype=np.float64)
+        restart[seed_ids] = 1.0 / seed_ids.shape[0]
+        out_weight = np.bincount(edge_src, weights=weights, minlength=n)
+        transition = weights / out_weight[edge_src]
+        dangling = out_weight == 0
+
+        rank = restart.copy()
+        for _ in range(iterations):
+            # Sparse transpose mat-vec: each edge carries its source's rank to its target
+            spread = np.bincount(indices, weights=transition * rank[edge_src], minlength=n)
+            new_rank = alpha * (spread + rank[dangling].sum() * restart) + (1 - alpha) * restart
+            converged = np.abs(new_rank - rank).sum() < tol
+            rank = new_rank
+            if converged:
+                break
+
+        rank[seed_ids] = 0.0
+        top = np.argsort(rank)[::-1][:top_n]
+        return {self.entities[node]: float(rank[node]) for node in top if rank[node] > 0}
+
+    def state(self) -> tuple:
+        """(info, arrays) for a snapshot: the merged adjacency and how much of the entity log it covers"""
+        with self._lock:
+            self._merge()
+            info = {"entities": list(self.entities), "window": self.window, "max_degree": self.max_degree,
+                    "log_offset": self._log.tell() if self._log is not None else None}
+            arrays = {"indptr": self.indptr, "indices": self.indices, "weights": self.weights,
+                      "edge_src": self._edge_src}
+            return info, arrays
+
+    def merge(self):
+        """Fold the delta buffer into the CSR adjacency, summing weights and capping degree"""
+        with self._lock:
+            self._merge()
+
+    def _adjacency(self):
+        """Merged (indptr, indices, weights, edge sources), consistent with each other"""
+        with self._lock:
+            self._merge()
+            missing = len(self.entities) + 1 - self.indptr.shape[0]
+            if missing > 0:
+                # Entities interned since the last merge without any edges get empty rows
+                self.indptr = np.concatenate([self.indptr, np.full(missing, self.indptr[-1], dtype=np.int64)])
+            return self.indptr, self.indices, self.weights, self._edge_src
+
+    def _lookup(self, entities: list) -> np.ndarray:
+        return np.array([self._ids[e] for e in entities if e in self._ids], dtype=np.int64)
+
+    def _merge(self):
+        if not self._delta_size:
+            return
+        n = len(self.entities)
+        src = np.concatenate([self._edge_src.astype(np.int64), self._delta_src[:self._delta_size]])
+        dst = np.concatenate([self.indices.astype(np.int64), self._delta_dst[:self._delta_size]])
+        weights = np.concatenate([self.weights, np.ones(self._delta_size, dtype=np.float32)])
+
+        edges, inverse = np.unique(src * n + dst, return_inverse=True)
+        weights = np.bincount(inverse, weights=weights).astype(np.float32)
+        src, dst = edges // n, edges % n
+
+        # Heaviest edges first within each source; drop those past max_degree
+        order = np.lexsort((-weights, src))
+        src, dst, weights = src[order], dst[order], weights[order]
+        rank = np.arange(src.shape[0]) - np.searchsorted(src, src, side="left")
+        keep = rank < self.max_degree
+        src, dst, weights = src[keep], dst[keep], weights[keep]
+
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=self.indptr[1:])
+        self.indices = dst.astype(np.int32)
+        self.weights = weights
+        self._edge_src = src.astype(np.int32)
+        self._delta_size = 0
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def _connect(self, entities: list):
+        ids = np.array([self._intern(entity) for entity in entities], dtype=np.int32)
+        # Pair each entity with the next `window` entities, in both directions
+        src, dst = [], []
+        for offset in range(1, min(self.window, ids.shape[0] - 1) + 1):
+            src.append(ids[:-offset])
+            dst.append(ids[offset:])
+        if not src:
+            return
+        src, dst = np.concatenate(src), np.concatenate(dst)
+        distinct = src != dst
+        src, dst = src[distinct], dst[distinct]
+        self._append_delta(np.concatenate([src, dst]), np.concatenate([dst, src]))
+        # Merging costs O(edges), so let the delta grow with the graph to amortize it
+        if self._delta_size >= max(self.merge_every, self.indices.shape[0]):
+            self._merge()
+
+    def _intern(self, entity: str) -> int:
+        node = self._ids.get(entity)
+        if node is None:
+            node = self._ids[entity] = len(self.entities)
+            self.entities.append(entity)
+        return node
+
+    def _append_delta(self, src: np.ndarray, dst: np.ndarray):
+        needed = self._delta_size + src.shape[0]
+        if needed > self._delta_src.shape[0]:
+            capacity = self._delta_src.shape[0]
+            while capacity < needed:
+                capacity *= 2
+            for name in ("_delta_src", "_delta_dst"):
+                grown = np.empty(capacity, dtype=np.int32)
+                grown[:self._delta_size] = getattr(self, name)[:self._delta_size]
+                setattr(self, name, grown)
+        self._delta_src[self._delta_size:needed] = src
+        self._delta_dst[self._delta_size:needed] = dst
+        self._delta_size = needed
+
+    def _load_state(self, info: dict, arrays: dict) -> int:
+        """Adopt a snapshot's adjacency (mapped, never written in place); returns its log offset"""
+        if info["window"] != self.window or info["max_degree"] != self.max_degree:
+            return 0
+        self.entities = list(info["entities"])
+        self._ids = {entity: node for node, entity in enumerate(self.entities)}
+        self.indptr, self.indices = arrays["indptr"], arrays["indices"]
+        self.weights, self._edge_src = arrays["weights"], arrays["edge_src"]
+        return info["log_offset"] or 0
+
+    def _open_log(self, storage_path: str, offset: int = 0):
+        """Replay the append-only entity log from byte `offset`, then keep it open for writes"""
+        os.makedirs(storage_path, exist_ok=True)
+        log_path = os.path.join(storage_path, "entities.log")
+        if offset and (not os.path.exists(log_path) or os.path.getsize(log_path) < offset):
+            # The snapshot is ahead of the log it was taken from; rebuild from the log alone
+            self.logger.warning("Entity log is shorter than the graph snapshot; replaying it in full")
+            self.entities, self._ids = [], {}
+            self.indptr = np.zeros(1, dtype=np.int64)
+            self.indices = self._edge_src = np.empty(0, dtype=np.int32)
+            self.weights = np.empty(0, dtype=np.float32)
+            offset = 0
+        valid_bytes = offset
+        if os.path.exists(log_path):
+            with open(log_path, "rb") as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # torn final write
+                    try:
+                        self._connect(json.loads(line))
+                    except ValueError:
+                        break  # torn final write
+                    valid_bytes += len(line)
+            self.logger.info(f"Loaded {len(self.entities)} entities from {log_path}")
+        self._log = open(log_path, "a")
+        self._log.truncate(valid_bytes)
@@ -0,0 +1,145 @@
+"""
+BM25 inverted index over VectorDatabase rows, for terms users repeat
+verbatim (identifiers, filenames, error strings) where dense similarity is weak.
+Postings grow incrementally as rows are added; scoring touches only the
+postings of the query terms.
+"""
+import re
+from collections import Counter
+import numpy as np
+from memory_store.snapshot import pack, unpack
+
+# Identifiers and words, plus dotted names such as "main.py" or "os.path.join" kept whole
+_TOKEN = re.compile(r"\w+(?:\.\w+)+|\w+")
+
+
+def tokenize(text: str) -> list:
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        tokens.append(token)
+        if "." in token:
+            tokens.extend(part for part in token.split(".") if part)
+    return tokens
+
+
+class _Postings:
+    """Growable parallel arrays of rows (increasing) and term frequencies"""
+
+    def __init__(self, capacity: int = 4):
+        self.rows = np.empty(capacity, dtype=np.int64)
+        self.tfs = np.empty(capacity, dtype=np.float32)
+        self.size = 0
+
+    def append(self, row: int, tf: int):
+        if self.size == self.rows.shape[0]:
+            self.rows = np.concatenate([self.rows, np.empty_like(self.rows)])
+            self.tfs = np.concatenate([self.tfs, np.empty_like(self.tfs)])
+        self.rows[self.size] = row
+        self.tfs[self.size] = tf
+        self.size += 1
+
+
+class LexicalIndex:
+    """Okapi BM25 with parameters `k1` (term saturation) and `b` (length normalization)"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings = {}
+        self._doc_len = np.zeros(1024, dtype=np.float32)
+        self._size = 0
+        self._total_len = 0.0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, row: int, text: str):
+        """Index `text` as row `row` (rows are added in increasing order)"""
+        tokens = tokenize(text)
+        if row >= self._doc_len.shape[0]:
+            grown = np.zeros(max(row + 1, self._doc_len.shape[0] * 2), dtype=np.float32)
+            grown[:self._size] = self._doc_len[:self._size]
+            self._doc_len = grown
+        for term, tf in Counter(tokens).items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = _Postings()
+            postings.append(row, tf)
+        self._doc_len[row] = len(tokens)
+        self._total_len += len(tokens)
+        self._size = row + 1
+
+    def rebuild(self, texts):
+        """Index every text of `texts` (a sequence indexed by row)"""
+        self._postings = {}
+        self._size = 0
+        self._total_len = 0.0
+        for row, text in enumerate(texts):
+            self.add(row, text)
+
+    def remap(self, mapping: np.ndarray):
+        """Renumber rows after compaction; rows mapped to -1 are dropped"""
+        remapped = {}
+        for term, postings in self._postings.items():
+            rows = mapping[postings.rows[:postings.size]]
+            live = rows >= 0
+            if live.any():
+                kept = _Postings(max(4, int(live.sum())))
+                kept.size = int(live.sum())
+                kept.rows[:kept.size] = rows[live]
+                kept.tfs[:kept.size] = postings.tfs[:postings.size][live]
+                remapped[term] = kept
+        self._postings = remapped
+
+        live = mapping >= 0
+        doc_len = np.zeros(max(1024, int(live.sum())), dtype=np.float32)
+        doc_len[mapping[live]] = self._doc_len[:mapping.shape[0]][live]
+        self._doc_len = doc_len
+        self._size = int(live.sum())
+        self._total_len = float(doc_len.sum())
+
+    def state(self) -> tuple:
+        """(info, arrays) for a snapshot; all postings are packed into two arrays"""
+        terms = list(self._postings)
+        rows, offsets = pack([self._postings[t].rows[:self._postings[t].size] for t in terms], np.int64)
+        tfs, _ = pack([self._postings[t].tfs[:self._postings[t].size] for t in terms], np.float32)
+        info = {"terms": terms, "size": self._size, "total_len": self._total_len}
+        return info, {"rows": rows, "tfs": tfs, "offsets": offsets,
+                      "doc_len": self._doc_len[:self._size].copy()}
+
+    def load_state(self, info: dict, arrays: dict) -> bool:
+        postings = {}
+        offsets = arrays["offsets"]
+        rows, tfs = unpack(arrays["rows"], offsets), unpack(arrays["tfs"], offsets)
+        for term, term_rows, term_tfs in zip(info["terms"], rows, tfs):
+            # Slices of the mapped snapshot; _Postings copies out on its first append
+            term_postings = _Postings.__new__(_Postings)
+            term_postings.rows, term_postings.tfs, term_postings.size = term_rows, term_tfs, term_rows.shape[0]
+            postings[term] = term_postings
+        self._postings = postings
+        self._doc_len = np.zeros(max(1024, 2 * info["size"]), dtype=np.float32)
+        self._doc_len[:info["size"]] = arrays["doc_len"]
+        self._size = info["size"]
+        self._total_len = info["total_len"]
+        return True
+
+    def scores(self, query: str):
+        """(rows, BM25 scores) of every row containing at least one query term"""
+        if not self._size:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        avg_len = self._total_len / self._size or 1.0
+        all_rows, all_scores = [], []
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            rows = postings.rows[:postings.size]
+            tfs = postings.tfs[:postings.size]
+            idf = np.log1p((self._size - postings.size + 0.5) / (postings.size + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self._doc_len[rows] / avg_len)
+            all_rows.append(rows)
+            all_scores.append(idf * tfs * (self.k1 + 1) / (tfs + norm))
+        if not all_rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        rows, inverse = np.unique(np.concatenate(all_rows), return_inverse=True)
+        return rows, np.bincount(inverse, weights=np.concatenate(all_scores)).astype(np.float32)
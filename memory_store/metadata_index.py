@@ -0,0 +1,180 @@
+"""
+Secondary indexes over VectorDatabase metadata, used to restrict a search
+to matching rows before any vector math happens.
+"""
+import numpy as np
+from memory_store.snapshot import pack, unpack
+
+
+class RowList:
+    """Growable array of row ids (appended in increasing order, so always sorted)"""
+
+    def __init__(self, capacity: int = 8):
+        self._rows = np.empty(capacity, dtype=np.int64)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, row: int):
+        if self._size == self._rows.shape[0]:
+            grown = np.empty(self._size * 2, dtype=np.int64)
+            grown[:self._size] = self._rows
+            self._rows = grown
+        self._rows[self._size] = row
+        self._size += 1
+
+    @property
+    def rows(self) -> np.ndarray:
+        return self._rows[:self._size]
+
+    @classmethod
+    def from_rows(cls, rows: np.ndarray) -> "RowList":
+        row_list = cls(max(8, rows.shape[0]))
+        row_list._rows[:rows.shape[0]] = rows
+        row_list._size = rows.shape[0]
+        return row_list
+
+
+class MetadataIndex:
+    """
+    Inverted indexes (field -> value -> rows) over `fields`, plus a sorted
+    timestamp index over `timestamp_field` for range filters.
+
+    Filters are a dict of field -> predicate:
+        "session": "abc"                  equality
+        "task_type": ["coding", "chat"]   any of
+        "timestamp": (start, end)         inclusive range, either end may be None
+    All predicates must hold.
+    """
+
+    def __init__(self, fields=("key", "session", "task_type", "source"), timestamp_field: str = "timestamp"):
+        self.fields = tuple(fields)
+        self.timestamp_field = timestamp_field
+        self._postings = {field: {} for field in self.fields}
+        self._ts = np.empty(64, dtype=np.float64)
+        self._ts_rows = np.empty(64, dtype=np.int64)
+        self._ts_size = 0
+        self._ts_sorted = True
+
+    def add(self, row: int, metadata):
+        if not isinstance(metadata, dict):
+            return
+        for field in self.fields:
+            value = metadata.get(field)
+            if value is None:
+                continue
+            postings = self._postings[field].get(value)
+            if postings is None:
+                postings = self._postings[field][value] = RowList()
+            postings.append(row)
+
+        timestamp = metadata.get(self.timestamp_field)
+        if timestamp is not None:
+            self._add_timestamp(row, float(timestamp))
+
+    def rebuild(self, metadata):
+        """Index every record of `metadata` (a sequence indexed by row)"""
+        self._postings = {field: {} for field in self.fields}
+        self._ts_size = 0
+        self._ts_sorted = True
+        for row, record in enumerate(metadata):
+            self.add(row, record)
+
+    def state(self) -> tuple:
+        """(info, arrays) for a snapshot; postings of each field are packed into one array"""
+        info = {"fields": list(self.fields), "timestamp_field": self.timestamp_field,
+                "ts_sorted": self._ts_sorted, "values": {}}
+        arrays = {"ts": self._ts[:self._ts_size].copy(), "ts_rows": self._ts_rows[:self._ts_size].copy()}
+        for i, field in enumerate(self.fields):
+            postings = self._postings[field]
+            info["values"][field] = list(postings.keys())
+            arrays[f"rows{i}"], arrays[f"offsets{i}"] = pack(
+                [row_list.rows for row_list in postings.values()], np.int64
+            )
+        return info, arrays
+
+    def load_state(self, info: dict, arrays: dict) -> bool:
+        """Restore from state(); False (leaving the index unchanged) if it was built differently"""
+        if info["fields"] != list(self.fields) or info["timestamp_field"] != self.timestamp_field:
+            return False
+        postings = {}
+        for i, field in enumerate(self.fields):
+            # Slices of the mapped snapshot; a RowList copies out on its first append
+            lists = unpack(arrays[f"rows{i}"], arrays[f"offsets{i}"])
+            postings[field] = {}
+            for value, rows in zip(info["values"][field], lists):
+                row_list = RowList.__new__(RowList)
+                row_list._rows, row_list._size = rows, rows.shape[0]
+                postings[field][value] = row_list
+        self._postings = postings
+        # Timestamps are sorted in place, so they are copied out of the snapshot
+        self._ts = np.concatenate([arrays["ts"], np.empty(64, dtype=np.float64)])
+        self._ts_rows = np.concatenate([arrays["ts_rows"], np.empty(64, dtype=np.int64)])
+        self._ts_size = arrays["ts"].shape[0]
+        self._ts_sorted = info["ts_sorted"]
+        return True
+
+    def values(self, field: str, live: np.ndarray = None) -> list:
+        """Distinct indexed values of `field`, optionally only those with a row set in `live`"""
+        if live is None:
+            return list(self._postings[field].keys())
+        return [value for value, row_list in self._postings[field].items() if live[row_list.rows].any()]
+
+    def remap(self, mapping: np.ndarray):
+        """Renumber rows after compaction; rows mapped to -1 are dropped"""
+        for field, postings in self._postings.items():
+            remapped = {}
+            for value, row_list in postings.items():
+                rows = mapping[row_list.rows]
+                rows = rows[rows >= 0]
+                if rows.shape[0]:
+                    remapped[value] = RowList.from_rows(rows)
+            self._postings[field] = remapped
+
+        rows = mapping[self._ts_rows[:self._ts_size]]
+        live = rows >= 0
+        count = int(live.sum())
+        self._ts[:count] = self._ts[:self._ts_size][live]
+        self._ts_rows[:count] = rows[live]
+        self._ts_size = count
+
+    def select(self, filters: dict) -> np.ndarray:
+        """Sorted row ids matching every predicate in `filters`"""
+        selected = None
+        for field, predicate in filters.items():
+            if field == self.timestamp_field:
+                rows = self._time_range(*predicate)
+            elif field in self._postings:
+                values = predicate if isinstance(predicate, (list, tuple, set)) else [predicate]
+                postings = [self._postings[field][v].rows for v in values if v in self._postings[field]]
+                rows = np.unique(np.concatenate(postings)) if len(postings) > 1 else \
+                    (postings[0] if postings else np.empty(0, dtype=np.int64))
+            else:
+                raise ValueError(f"Metadata field '{field}' is not indexed")
+            selected = rows if selected is None else np.intersect1d(selected, rows, assume_unique=True)
+            if not selected.shape[0]:
+                break
+        return selected if selected is not None else np.empty(0, dtype=np.int64)
+
+    def _add_timestamp(self, row: int, timestamp: float):
+        if self._ts_size == self._ts.shape[0]:
+            self._ts = np.concatenate([self._ts, np.empty_like(self._ts)])
+            self._ts_rows = np.concatenate([self._ts_rows, np.empty_like(self._ts_rows)])
+        if self._ts_size and timestamp < self._ts[self._ts_size - 1]:
+            self._ts_sorted = False
+        self._ts[self._ts_size] = timestamp
+        self._ts_rows[self._ts_size] = row
+        self._ts_size += 1
+
+    def _time_range(self, start=None, end=None) -> np.ndarray:
+        if not self._ts_sorted:
+            # Out-of-order inserts are rare; sort once on the next range query
+            order = np.argsort(self._ts[:self._ts_size], kind="stable")
+            self._ts[:self._ts_size] = self._ts[order]
+            self._ts_rows[:self._ts_size] = self._ts_rows[order]
+            self._ts_sorted = True
+        ts = self._ts[:self._ts_size]
+        lo = 0 if start is None else np.searchsorted(ts, start, side="left")
+        hi = self._ts_size if end is None else np.searchsorted(ts, end, side="right")
+        return np.sort(self._ts_rows[lo:hi])
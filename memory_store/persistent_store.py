@@ -0,0 +1,343 @@
+"""
+On-disk storage for VectorDatabase.
+Vectors are kept in an append-only memory-mapped float32 segment, metadata in
+a record file addressed through a fixed-width offset index, and every append
+goes through a write-ahead log first so a crash never loses acknowledged rows.
+Deletes are logged there too, in order with the appends, so a replay never
+revives a row that was tombstoned before the crash.
+Opening a store maps the files instead of reading them, so it is O(1) in size.
+Deleted rows are flagged in a tombstone segment until compaction writes a new
+generation of the segment files and switches to it by rewriting the manifest,
+so a crash mid-compaction leaves the old generation intact.
+"""
+import json
+import logging
+import os
+import struct
+import threading
+import zlib
+import numpy as np
+
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.f32"
+NORMS_FILE = "norms.f32"
+RECORDS_FILE = "records.bin"
+INDEX_FILE = "records.idx"
+DELETED_FILE = "deleted.u8"
+WAL_FILE = "wal.log"
+SEGMENT_FILES = (VECTORS_FILE, NORMS_FILE, RECORDS_FILE, INDEX_FILE, DELETED_FILE)
+
+# WAL entry header: row, payload length, metadata length, crc32 of payload
+WAL_HEADER = struct.Struct("<QIII")
+# Metadata length marking a tombstone entry, whose payload is the deleted rows as uint64
+WAL_TOMBSTONE = 0xFFFFFFFF
+
+
+class RecordFile:
+    """Metadata records as JSON blobs, read lazily by row through an offset index"""
+
+    def __init__(self, store):
+        self._store = store
+
+    def __len__(self):
+        return self._store.count
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(len(self)))]
+        row = int(row)
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("record index out of range")
+        offset, length = self._store.index[row]
+        return json.loads(os.pread(self._store.records_fd, int(length), int(offset)))
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+
+class PersistentVectorStore:
+    """
+    Directory layout:
+        manifest.json  dimension, number of checkpointed rows, file generation
+        vectors.f32    unit-length rows, grown by doubling
+        norms.f32      original L2 norm per row
+        records.bin    JSON metadata records, back to back
+        records.idx    (offset, length) uint64 pair per row
+        deleted.u8     tombstone flag per row
+        wal.log        rows appended and tombstoned since the last checkpoint
+    Segment files of generation N > 0 are named e.g. vectors.N.f32.
+    """
+
+    def __init__(self, path: str, checkpoint_every: int = 1024, fsync: bool = True,
+                 initial_capacity: int = 1024):
+        self.path = path
+        self.checkpoint_every = checkpoint_every
+        self.fsync = fsync
+        self.initial_capacity = initial_capacity
+        self.dim = None
+        self.count = 0
+        self.generation = 0
+        self.capacity = 0
+        self.vectors = None
+        self.norms = None
+        self.index = None
+        self.deleted = None
+        self.records = RecordFile(self)
+        self.records_fd = None
+        self._records_file = None
+        self._wal = None
+        self._pending = 0
+        self._lock = threading.RLock()
+        self.logger = logging.getLogger("PersistentVectorStore")
+
+        os.makedirs(path, exist_ok=True)
+        manifest = self._file(MANIFEST_FILE)
+        if os.path.exists(manifest):
+            with open(manifest) as f:
+                state = json.load(f)
+            self.generation = state.get("generation", 0)
+            self._open(state["dim"], state["count"])
+            self._remove_stale_generations()
+            self.logger.info(f"Opened vector store at {path} with {self.count} rows")
+
+    @property
+    def initialized(self) -> bool:
+        return self.dim is not None
+
+    def create(self, dim: int):
+        """Initialize an empty store for vectors of dimension `dim`"""
+        with self._lock:
+            self._open(dim, 0)
+            self._write_manifest()
+
+    def append(self, unit_vector: np.ndarray, norm: float, metadata) -> int:
+        """Durably append one row; returns its row number"""
+        return self.append_batch(unit_vector[None], [norm], [metadata])
+
+    def append_batch(self, unit_vectors: np.ndarray, norms, metadatas) -> int:
+        """Durably append rows with a single WAL sync; returns the first row number"""
+        entries = []
+        for vector, norm, metadata in zip(unit_vectors, norms, metadatas):
+            meta_bytes = json.dumps(metadata, default=str).encode("utf-8")
+            payload = vector.astype(np.float32).tobytes() + struct.pack("<f", norm) + meta_bytes
+            entries.append((payload, meta_bytes))
+        with self._lock:
+            first = self.count
+            for i, (payload, meta_bytes) in enumerate(entries):
+                self._wal.write(WAL_HEADER.pack(first + i, len(payload), len(meta_bytes), zlib.crc32(payload)))
+                self._wal.write(payload)
+            self._wal.flush()
+            if self.fsync:
+                os.fsync(self._wal.fileno())
+            for i, (vector, norm, (_, meta_bytes)) in enumerate(zip(unit_vectors, norms, entries)):
+                self._apply(first + i, vector, norm, meta_bytes)
+            self._pending += len(entries)
+            if self._pending >= self.checkpoint_every:
+                self.checkpoint()
+        return first
+
+    def delete(self, rows: np.ndarray):
+        """Durably tombstone `rows`; they stay on disk until the next compaction"""
+        payload = np.asarray(rows, dtype=np.uint64).tobytes()
+        with self._lock:
+            self._wal.write(WAL_HEADER.pack(self.count, len(payload), WAL_TOMBSTONE, zlib.crc32(payload)))
+            self._wal.write(payload)
+            self._wal.flush()
+            if self.fsync:
+                os.fsync(self._wal.fileno())
+            self.deleted[rows] = True
+
+    def reserve(self, needed: int):
+        """Grow the mapped files (amortized doubling) to hold `needed` rows"""
+        if needed <= self.capacity:
+            return
+        capacity = max(self.capacity, self.initial_capacity)
+        while capacity < needed:
+            capacity *= 2
+        self._map(capacity)
+
+    def checkpoint(self):
+        """Flush mapped segments and records, record the row count, truncate the WAL"""
+        with self._lock:
+            if self.vectors is None:
+                return
+            self.vectors.flush()
+            self.norms.flush()
+            self.index.flush()
+            self.deleted.flush()
+            self._records_file.flush()
+            if self.fsync:
+                os.fsync(self._records_file.fileno())
+            self._write_manifest()
+            self._wal.seek(0)
+            self._wal.truncate()
+            self._wal.flush()
+            if self.fsync:
+                os.fsync(self._wal.fileno())
+            self._pending = 0
+
+    def close(self):
+        with self._lock:
+            if self.vectors is None:
+                return
+            self.checkpoint()
+            self._close_files()
+
+    def compact(self, keep_rows: np.ndarray):
+        """Rewrite the store keeping only `keep_rows` (in that order) as a new generation"""
+        with self._lock:
+            self.switch_generation(self.write_generation(keep_rows), keep_rows.shape[0])
+
+    def write_generation(self, keep_rows: np.ndarray, block_rows: int = 65536) -> int:
+        """
+        Write `keep_rows` as the next generation of segment files without switching
+        to it; the current mappings stay readable meanwhile. Callers must not
+        append until switch_generation().
+        """
+        with self._lock:
+            self.checkpoint()
+            generation = self.generation + 1
+            count = int(keep_rows.shape[0])
+            capacity = max(self.initial_capacity, count)
+            vectors = np.memmap(self._file(VECTORS_FILE, generation), dtype=np.float32, mode="w+",
+                                shape=(capacity, self.dim))
+            norms = np.memmap(self._file(NORMS_FILE, generation), dtype=np.float32, mode="w+",
+                              shape=(capacity,))
+            index = np.memmap(self._file(INDEX_FILE, generation), dtype=np.uint64, mode="w+",
+                              shape=(capacity, 2))
+            for start in range(0, count, block_rows):
+                rows = keep_rows[start:start + block_rows]
+                vectors[start:start + rows.shape[0]] = self.vectors[rows]
+                norms[start:start + rows.shape[0]] = self.norms[rows]
+
+            offset = 0
+            with open(self._file(RECORDS_FILE, generation), "wb") as records:
+                for new_row, row in enumerate(keep_rows):
+                    old_offset, length = self.index[row]
+                    records.write(os.pread(self.records_fd, int(length), int(old_offset)))
+                    index[new_row] = (offset, length)
+                    offset += int(length)
+                records.flush()
+                if self.fsync:
+                    os.fsync(records.fileno())
+            for segment in (vectors, norms, index):
+                segment.flush()
+            del vectors, norms, index
+            return generation
+
+    def switch_generation(self, generation: int, count: int):
+        """Make a generation written by write_generation() the current one"""
+        with self._lock:
+            # Switching the manifest is the commit point
+            self._close_files()
+            self.generation = generation
+            self.count = count
+            self._write_manifest()
+            self._remove_stale_generations()
+            self._open(self.dim, count)
+            self.logger.info(f"Compacted vector store to {count} rows (generation {generation})")
+
+    def _close_files(self):
+        self._wal.close()
+        self._records_file.close()
+        self.vectors = self.norms = self.index = self.deleted = None
+
+    def _open(self, dim: int, count: int):
+        self.dim = dim
+        self.count = count
+        rows_on_disk = os.path.getsize(self._file(VECTORS_FILE)) // (dim * 4) \
+            if os.path.exists(self._file(VECTORS_FILE)) else 0
+        self._map(max(rows_on_disk, count, self.initial_capacity))
+
+        self._records_file = open(self._file(RECORDS_FILE), "a+b")
+        self.records_fd = self._records_file.fileno()
+        # Drop record bytes written after the last checkpoint; the WAL replays them
+        end = int(self.index[count - 1].sum()) if count else 0
+        self._records_file.truncate(end)
+        self._records_file.seek(end)
+
+        self._wal = open(self._file(WAL_FILE), "a+b")
+        self._replay_wal()
+
+    def _map(self, capacity: int):
+        """(Re)map the fixed-width files at `capacity` rows, extending them if needed"""
+        for name, row_bytes in ((VECTORS_FILE, self.dim * 4), (NORMS_FILE, 4), (INDEX_FILE, 16),
+                                (DELETED_FILE, 1)):
+            with open(self._file(name), "a+b") as f:
+                if os.path.getsize(self._file(name)) < capacity * row_bytes:
+                    f.truncate(capacity * row_bytes)
+        self.vectors = np.memmap(self._file(VECTORS_FILE), dtype=np.float32, mode="r+",
+                                 shape=(capacity, self.dim))
+        self.norms = np.memmap(self._file(NORMS_FILE), dtype=np.float32, mode="r+",
+                               shape=(capacity,))
+        self.index = np.memmap(self._file(INDEX_FILE), dtype=np.uint64, mode="r+",
+                               shape=(capacity, 2))
+        self.deleted = np.memmap(self._file(DELETED_FILE), dtype=np.bool_, mode="r+",
+                                 shape=(capacity,))
+        self.capacity = capacity
+
+    def _apply(self, row: int, unit_vector: np.ndarray, norm: float, meta_bytes: bytes):
+        self.reserve(row + 1)
+        self.vectors[row] = unit_vector
+        self.norms[row] = norm
+        offset = self._records_file.tell()
+        self._records_file.write(meta_bytes)
+        self._records_file.flush()
+        self.index[row] = (offset, len(meta_bytes))
+        self.deleted[row] = False
+        self.count = row + 1
+
+    def _replay_wal(self):
+        """Re-apply WAL entries past the checkpoint; stop at the first torn entry"""
+        self._wal.seek(0)
+        data = self._wal.read()
+        pos, replayed = 0, 0
+        vec_bytes = self.dim * 4
+        while pos + WAL_HEADER.size <= len(data):
+            row, length, meta_len, crc = WAL_HEADER.unpack_from(data, pos)
+            payload = data[pos + WAL_HEADER.size:pos + WAL_HEADER.size + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            pos += WAL_HEADER.size + length
+            if meta_len == WAL_TOMBSTONE:
+                rows = np.frombuffer(payload, dtype=np.uint64).astype(np.int64)
+                self.deleted[rows[rows < self.count]] = True
+                continue
+            if row < self.count:
+                continue
+            if row != self.count:
+                break
+            vector = np.frombuffer(payload[:vec_bytes], dtype=np.float32)
+            norm = struct.unpack_from("<f", payload, vec_bytes)[0]
+            self._apply(row, vector, norm, payload[length - meta_len:])
+            replayed += 1
+        if replayed:
+            self.logger.info(f"Replayed {replayed} rows from write-ahead log")
+        # Fold replayed rows into the segments and discard any torn tail
+        self.checkpoint()
+
+    def _write_manifest(self):
+        tmp = self._file(MANIFEST_FILE + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump({"dim": self.dim, "count": self.count, "generation": self.generation}, f)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp, self._file(MANIFEST_FILE))
+
+    def _remove_stale_generations(self):
+        current = {self._file(name) for name in SEGMENT_FILES}
+        for entry in os.listdir(self.path):
+            path = os.path.join(self.path, entry)
+            if entry.split(".", 1)[0] in ("vectors", "norms", "records", "deleted") and path not in current:
+                os.remove(path)
+
+    def _file(self, name: str, generation: int = None) -> str:
+        generation = self.generation if generation is None else generation
+        if generation and name in SEGMENT_FILES:
+            root, ext = os.path.splitext(name)
+            name = f"{root}.{generation}{ext}"
+        return os.path.join(self.path, name)
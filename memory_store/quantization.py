@@ -0,0 +1,227 @@
+"""
+Compressed codes for VectorDatabase rows.
+A quantizer keeps a compact code per row in RAM and produces approximate
+inner-product scores; VectorDatabase re-ranks the best candidates exactly
+against the full-precision vectors, which stay on disk.
+"""
+import logging
+import numpy as np
+
+
+class _CodeArray:
+    """Growable (rows, width) code matrix"""
+
+    def __init__(self, width: int, dtype):
+        self.codes = np.empty((1024, width), dtype=dtype)
+        self.size = 0
+
+    def append(self, codes: np.ndarray):
+        needed = self.size + codes.shape[0]
+        if needed > self.codes.shape[0]:
+            # A snapshot of an empty store wraps a zero-row array
+            capacity = max(self.codes.shape[0], 1024)
+            while capacity < needed:
+                capacity *= 2
+            grown = np.empty((capacity, self.codes.shape[1]), dtype=self.codes.dtype)
+            grown[:self.size] = self.codes[:self.size]
+            self.codes = grown
+        self.codes[self.size:needed] = codes
+        self.size = needed
+
+    @classmethod
+    def wrap(cls, codes: np.ndarray) -> "_CodeArray":
+        """Code array over existing `codes` (e.g. a mapped snapshot); copied on the first append"""
+        array = cls.__new__(cls)
+        array.codes, array.size = codes, codes.shape[0]
+        return array
+
+    def view(self, rows=None) -> np.ndarray:
+        return self.codes[:self.size] if rows is None else self.codes[rows]
+
+    def compact(self, keep_rows: np.ndarray):
+        kept = self.codes[keep_rows[keep_rows < self.size]]
+        self.codes = np.concatenate([kept, np.empty((max(1024, kept.shape[0]), self.codes.shape[1]),
+                                                    dtype=self.codes.dtype)])
+        self.size = kept.shape[0]
+
+
+class Int8Quantizer:
+    """Scalar quantization: int8 code per component with one float32 scale per row (~4x smaller)"""
+
+    name = "int8"
+    train_size = 0
+
+    def __init__(self, block_rows: int = 65536):
+        self.block_rows = block_rows
+        self._codes = None
+        self._scales = None
+
+    @property
+    def trained(self) -> bool:
+        return True
+
+    @property
+    def size(self) -> int:
+        return self._codes.size if self._codes is not None else 0
+
+    @property
+    def nbytes(self) -> int:
+        return self.size * (self._codes.codes.shape[1] + 4) if self._codes is not None else 0
+
+    def train(self, vectors: np.ndarray):
+        pass
+
+    def state(self) -> tuple:
+        """(info, arrays) for a snapshot"""
+        if self._codes is None:
+            return {"name": self.name}, {}
+        return {"name": self.name}, {"codes": self._codes.view(), "scales": self._scales.view()}
+
+    def load_state(self, info: dict, arrays: dict) -> bool:
+        if info.get("name") != self.name:
+            return False
+        if "codes" in arrays:
+            self._codes, self._scales = _CodeArray.wrap(arrays["codes"]), _CodeArray.wrap(arrays["scales"])
+        return True
+
+    def compact(self, keep_rows: np.ndarray):
+        """Keep only the codes of `keep_rows`, renumbered in order"""
+        if self._codes is not None:
+            self._codes.compact(keep_rows)
+            self._scales.compact(keep_rows)
+
+    def add(self, vectors: np.ndarray):
+        vectors = np.atleast_2d(vectors)
+        if self._codes is None:
+            self._codes = _CodeArray(vectors.shape[1], np.int8)
+            self._scales = _CodeArray(1, np.float32)
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        safe = np.where(scales > 0, scales, 1.0)
+        self._codes.append(np.round(vectors / safe[:, None]).astype(np.int8))
+        self._scales.append(scales[:, None].astype(np.float32))
+
+    def scores(self, query: np.ndarray, rows: np.ndarray = None) -> np.ndarray:
+        """Approximate inner products of `query` with the coded rows"""
+        codes = self._codes.view(rows)
+        scales = self._scales.view(rows)[:, 0]
+        out = np.empty(codes.shape[0], dtype=np.float32)
+        # Decode in blocks so the float32 temporary stays bounded
+        for start in range(0, codes.shape[0], self.block_rows):
+            stop = start + self.block_rows
+            out[start:stop] = codes[start:stop].astype(np.float32) @ query
+        return out * scales
+
+
+class ProductQuantizer:
+    """
+    Product quantization: each row is split into `m` sub-vectors, each replaced
+    by the id of its nearest of 256 sub-centroids (one byte per sub-vector).
+    Queries use asymmetric distance computation: a per-query (m, 256) table
+    of sub-vector inner products, summed over each row's codes.
+    """
+
+    name = "pq"
+
+    def __init__(self, m: int = 16, train_size: int = 10000, kmeans_iters: int = 15, seed: int = 0):
+        self.m = m
+        self.train_size = train_size
+        self.kmeans_iters = kmeans_iters
+        self.codebooks = None  # (m, 256, dim // m)
+        self._codes = None
+        self._rng = np.random.default_rng(seed)
+        self.logger = logging.getLogger("ProductQuantizer")
+
+    @property
+    def trained(self) -> bool:
+        return self.codebooks is not None
+
+    @property
+    def size(self) -> int:
+        return self._codes.size if self._codes is not None else 0
+
+    @property
+    def nbytes(self) -> int:
+        return self.size * self.m
+
+    def train(self, vectors: np.ndarray):
+        n, dim = vectors.shape
+        if dim % self.m:
+            raise ValueError(f"Dimension {dim} is not divisible into {self.m} sub-vectors")
+        sample = vectors[self._rng.choice(n, min(n, self.train_size), replace=False)]
+        sample = sample.reshape(sample.shape[0], self.m, dim // self.m)
+        k = min(256, sample.shape[0])
+
+        codebooks = np.zeros((self.m, 256, dim // self.m), dtype=np.float32)
+        for j in range(self.m):
+            sub = sample[:, j, :]
+            centroids = sub[self._rng.choice(sub.shape[0], k, replace=False)].copy()
+            for _ in range(self.kmeans_iters):
+                assignment = self._nearest(sub, centroids)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assignment, sub)
+                counts = np.bincount(assignment, minlength=k)
+                filled = counts > 0
+                centroids[filled] = sums[filled] / counts[filled, None]
+            codebooks[j, :k] = centroids
+        self.codebooks = codebooks
+        self._codes = None
+        self.logger.info(f"Trained product quantizer (m={self.m}) on {sample.shape[0]} vectors")
+
+    def state(self) -> tuple:
+        """(info, arrays) for a snapshot"""
+        arrays = {}
+        if self.codebooks is not None:
+            arrays["codebooks"] = self.codebooks
+        if self._codes is not None:
+            arrays["codes"] = self._codes.view()
+        return {"name": self.name, "m": self.m}, arrays
+
+    def load_state(self, info: dict, arrays: dict) -> bool:
+        if info.get("name") != self.name or info.get("m") != self.m:
+            return False
+        self.codebooks = arrays.get("codebooks")
+        self._codes = _CodeArray.wrap(arrays["codes"]) if "codes" in arrays else None
+        return True
+
+    def compact(self, keep_rows: np.ndarray):
+        """Keep only the codes of `keep_rows`, renumbered in order"""
+        if self._codes is not None:
+            self._codes.compact(keep_rows)
+
+    def add(self, vectors: np.ndarray):
+        vectors = np.atleast_2d(vectors)
+        if self._codes is None:
+            self._codes = _CodeArray(self.m, np.uint8)
+        for start in range(0, vectors.shape[0], 65536):
+            sub = vectors[start:start + 65536].reshape(-1, self.m, vectors.shape[1] // self.m)
+            codes = np.stack([self._nearest(sub[:, j, :], self.codebooks[j]) for j in range(self.m)], axis=1)
+            self._codes.append(codes.astype(np.uint8))
+
+    def scores(self, query: np.ndarray, rows: np.ndarray = None) -> np.ndarray:
+        """Approximate inner products of `query` with the coded rows (ADC)"""
+        table = np.einsum("jkd,jd->jk", self.codebooks, query.reshape(self.m, -1))
+        codes = self._codes.view(rows)
+        out = np.zeros(codes.shape[0], dtype=np.float32)
+        for j in range(self.m):
+            out += table[j][codes[:, j]]
+        return out
+
+    @staticmethod
+    def _nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        # argmin ||v - c||^2 == argmax (v.c - ||c||^2 / 2)
+        return np.argmax(vectors @ centroids.T - 0.5 * np.sum(centroids ** 2, axis=1), axis=1)
+
+
+QUANTIZER_TYPES = {
+    Int8Quantizer.name: Int8Quantizer,
+    ProductQuantizer.name: ProductQuantizer,
+}
+
+
+def create_quantizer(quantization: str, **params):
+    """Build a quantizer by name; "none" keeps full-precision vectors in RAM"""
+    if quantization in (None, "none"):
+        return None
+    if quantization not in QUANTIZER_TYPES:
+        raise ValueError(f"Unknown quantization: {quantization}")
+    return QUANTIZER_TYPES[quantization](**params)
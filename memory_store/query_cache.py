@@ -0,0 +1,60 @@
+"""
+Retrieval result cache for VectorMemory.
+Entries are stamped with the memory's write generation; any write bumps the
+generation, so a stale entry is detected on lookup without tracking which
+results a write could have changed.
+"""
+import json
+import threading
+from collections import OrderedDict
+
+
+class QueryCache:
+    """LRU of retrieval results keyed by normalized query and search options"""
+
+    def __init__(self, capacity: int = 1024):
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def make_key(query: str, top_k: int, filters: dict = None, **options) -> str:
+        """Case- and whitespace-insensitive key; filters and options are serialized canonically"""
+        normalized = " ".join(query.lower().split())
+        return json.dumps([normalized, top_k, filters, options], sort_keys=True, default=str)
+
+    def get(self, key: str, generation: int):
+        """Cached results for `key` if stored at `generation`, else None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != generation:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(entry[1])
+
+    def put(self, key: str, generation: int, results: list):
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (generation, list(results))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
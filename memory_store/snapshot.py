@@ -0,0 +1,99 @@
+"""
+Point-in-time snapshots of the in-memory memory structures (metadata, lexical
+and ANN indexes, quantized codes, knowledge graph, statistics), so a restarted
+process maps them back in instead of rebuilding them from the raw data.
+A snapshot is a directory holding one .npy file per array, opened with mmap,
+and one JSON document per section. It is written under a temporary name and
+published by atomically replacing the CURRENT pointer, so a crash mid-write
+leaves the previous snapshot in place.
+"""
+import json
+import logging
+import os
+import shutil
+import time
+import numpy as np
+
+CURRENT_FILE = "CURRENT"
+SNAPSHOT_PREFIX = "snapshot-"
+
+logger = logging.getLogger("Snapshot")
+
+
+def save_snapshot(path: str, sections: dict) -> str:
+    """
+    Write `sections` (name -> (info dict, {array name: ndarray})) as a new snapshot
+    under `path`, make it the current one and remove older ones; returns its directory
+    """
+    os.makedirs(path, exist_ok=True)
+    name = f"{SNAPSHOT_PREFIX}{time.time_ns()}"
+    staging = os.path.join(path, name + ".tmp")
+    os.makedirs(staging)
+    for section, (info, arrays) in sections.items():
+        for array_name, array in arrays.items():
+            np.save(os.path.join(staging, f"{section}.{array_name}.npy"), np.ascontiguousarray(array))
+        with open(os.path.join(staging, f"{section}.json"), "w") as f:
+            json.dump({"info": info, "arrays": sorted(arrays)}, f)
+    for file_name in os.listdir(staging):
+        _fsync(os.path.join(staging, file_name))
+    os.rename(staging, os.path.join(path, name))
+
+    # Replacing the pointer is the commit point
+    pointer = os.path.join(path, CURRENT_FILE)
+    with open(pointer + ".tmp", "w") as f:
+        f.write(name)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer + ".tmp", pointer)
+    for entry in os.listdir(path):
+        if entry.startswith(SNAPSHOT_PREFIX) and entry != name:
+            shutil.rmtree(os.path.join(path, entry), ignore_errors=True)
+    return os.path.join(path, name)
+
+
+def load_snapshot(path: str) -> dict:
+    """Current snapshot under `path` as name -> (info, {array name: read-only memmap}); {} if none"""
+    pointer = os.path.join(path, CURRENT_FILE)
+    if not os.path.exists(pointer):
+        return {}
+    with open(pointer) as f:
+        directory = os.path.join(path, f.read().strip())
+    sections = {}
+    try:
+        for file_name in os.listdir(directory):
+            if not file_name.endswith(".json"):
+                continue
+            section = file_name[:-len(".json")]
+            with open(os.path.join(directory, file_name)) as f:
+                document = json.load(f)
+            arrays = {
+                array_name: np.load(os.path.join(directory, f"{section}.{array_name}.npy"), mmap_mode="r")
+                for array_name in document["arrays"]
+            }
+            sections[section] = (document["info"], arrays)
+    except (OSError, ValueError) as e:
+        logger.error(f"Ignoring unreadable snapshot {directory}: {e}")
+        return {}
+    logger.info(f"Loaded snapshot {directory}")
+    return sections
+
+
+def pack(arrays: list, dtype) -> tuple:
+    """Concatenate variable-length `arrays` into (values, offsets) for storage"""
+    offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+    np.cumsum([array.shape[0] for array in arrays], out=offsets[1:])
+    values = np.concatenate(arrays).astype(dtype, copy=False) if arrays else np.empty(0, dtype=dtype)
+    return values, offsets
+
+
+def unpack(values: np.ndarray, offsets: np.ndarray) -> list:
+    """Inverse of pack(): views into `values`, one per stored array"""
+    return [values[offsets[i]:offsets[i + 1]] for i in range(offsets.shape[0] - 1)]
+
+
+def _fsync(file_path: str):
+    fd = os.open(file_path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
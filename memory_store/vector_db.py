@@ -1,45 +1,630 @@
 import numpy as np
+import copy
 import logging
+import shutil
+import tempfile
+import threading
+import weakref
+from contextlib import contextmanager
+from memory_store.ann_index import create_index
+from memory_store.quantization import create_quantizer
+from memory_store.persistent_store import PersistentVectorStore
+from memory_store.metadata_index import MetadataIndex
+from memory_store.lexical_index import LexicalIndex
+
+
+class _ReadWriteLock:
+    """Many concurrent readers or one writer; waiting writers block new readers"""
 
-class VectorDatabase:
     def __init__(self):
-        self.vectors = []
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+class VectorDatabase:
+    """
+    Cosine-similarity vector store.
+    Vectors live in one contiguous float32 matrix that grows by doubling;
+    rows are normalized at insert so a query is a single matrix-vector product.
+    An optional ANN index ("ivf") narrows the scan to a candidate subset.
+    With `storage_path` the matrix and metadata are memory-mapped from disk
+    (see PersistentVectorStore) and survive restarts.
+    Searches accept metadata `filters` (see MetadataIndex) and then scan only
+    the matching rows.
+    With `text_fields` the text of those metadata fields is also indexed for
+    BM25 keyword search (see search_lexical and LexicalIndex).
+    With `quantization` ("int8" or "pq") only compact codes are kept in RAM;
+    full-precision rows stay memory-mapped on disk (a temporary spill store
+    when no `storage_path` is given) and are read only to re-rank the best
+    `rerank` * top_k approximate candidates.
+    Removed and updated rows are tombstoned and masked out of searches; once
+    the dead fraction reaches `compaction_threshold` a background thread
+    rewrites the storage without them while searches keep running.
+    """
+
+    def __init__(self, dim: int = None, initial_capacity: int = 1024,
+                 index: str = "flat", index_params: dict = None,
+                 storage_path: str = None,
+                 indexed_fields=("key", "session", "task_type", "source"),
+                 timestamp_field: str = "timestamp",
+                 quantization: str = "none", quantization_params: dict = None,
+                 rerank: int = 10, compaction_threshold: float = 0.2,
+                 background_compaction: bool = True, text_fields=None):
+        self.dim = dim
         self.metadata = []
+        self._initial_capacity = max(1, initial_capacity)
+        self._capacity = 0
+        self._size = 0
+        self._matrix = None  # (capacity, dim) unit-length rows
+        self._norms = None   # original L2 norm of each row
+        self._deleted = None  # tombstone flag of each row
+        self._dead_count = 0
+        self.index = create_index(index, **(index_params or {}))
+        self.metadata_index = MetadataIndex(indexed_fields, timestamp_field)
+        self.text_fields = tuple(text_fields or ())
+        self.lexical_index = LexicalIndex() if self.text_fields else None
+        self.quantizer = create_quantizer(quantization, **(quantization_params or {}))
+        self.rerank = rerank
+        self.compaction_threshold = compaction_threshold
+        self.background_compaction = background_compaction
         self.logger = logging.getLogger("VectorDB")
+        # Writers serialize on _write_lock; _rw only excludes searches while shared state changes
+        self._write_lock = threading.RLock()
+        self._rw = _ReadWriteLock()
+        # Searches holding only the read lock build lazy structures under this one
+        self._build_lock = threading.Lock()
+        self._compactor = None
+
+        self._store = None
+        fsync = True
+        if self.quantizer is not None and not storage_path:
+            # Full-precision rows spill to a scratch store instead of RAM
+            storage_path = tempfile.mkdtemp(prefix="kamil_vectors_")
+            weakref.finalize(self, shutil.rmtree, storage_path, True)
+            fsync = False
+        if storage_path:
+            self._store = PersistentVectorStore(storage_path, fsync=fsync,
+                                                initial_capacity=self._initial_capacity)
+            if self._store.initialized:
+                self.dim = self._store.dim
+                self._sync_from_store()
+                self._dead_count = int(np.count_nonzero(self._deleted[:self._size]))
+            elif dim is not None:
+                self._store.create(dim)
+                self._sync_from_store()
+        elif dim is not None:
+            self._reserve(self._initial_capacity)
+        # Reopened stores index their metadata on the first filtered or lexical search
+        self._metadata_indexed = self._size == 0
         self.logger.info("Vector database initialized")
 
+    def __len__(self):
+        """Number of live (not deleted) rows"""
+        return self._size - self._dead_count
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """Normalized vectors of all stored rows (a view, not a copy)"""
+        if self._matrix is None:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        return self._matrix[:self._size]
+
+    @property
+    def norms(self) -> np.ndarray:
+        """Original L2 norms of all stored rows"""
+        if self._norms is None:
+            return np.empty(0, dtype=np.float32)
+        return self._norms[:self._size]
+
+    def stats(self) -> dict:
+        """Row counts, memory footprint and index configuration"""
+        return {
+            "rows": self._size,
+            "live_rows": len(self),
+            "deleted_rows": self._dead_count,
+            "dim": self.dim,
+            "capacity": self._capacity,
+            "matrix_bytes": int(self._matrix.nbytes) if self._matrix is not None else 0,
+            "persistent": self._store is not None,
+            "index": self.index.name if self.index is not None else "flat",
+            "index_trained": self.index.trained if self.index is not None else None,
+            "quantization": self.quantizer.name if self.quantizer is not None else "none",
+            "quantized_bytes": self.quantizer.nbytes if self.quantizer is not None else 0
+        }
+
+    def state(self) -> tuple:
+        """
+        (info, arrays) for a snapshot of the structures built over the stored rows
+        (metadata, lexical and ANN indexes, quantized codes), taken between writes
+        """
+        with self._write_lock:
+            # Index metadata now so the restored process does not have to
+            with self._rw.read():
+                self._ensure_metadata_indexed()
+            info = {"rows": self._size,
+                    "store_generation": self._store.generation if self._store is not None else None}
+            parts = {}
+            if self._metadata_indexed:
+                parts["metadata"] = self.metadata_index.state()
+                if self.lexical_index is not None:
+                    parts["lexical"] = self.lexical_index.state()
+            if self.index is not None and self.index.trained:
+                parts["index"] = self.index.state()
+            if self.quantizer is not None:
+                parts["quantizer"] = self.quantizer.state()
+        arrays = {}
+        for part, (part_info, part_arrays) in parts.items():
+            info[part] = part_info
+            arrays.update({f"{part}.{name}": array for name, array in part_arrays.items()})
+        return info, arrays
+
+    def load_state(self, info: dict, arrays: dict) -> bool:
+        """
+        Restore a state() snapshot of this database's store, then index the rows
+        appended after it was taken. Returns False, leaving everything to be rebuilt
+        as usual, if the store has been compacted since.
+        """
+        store_generation = self._store.generation if self._store is not None else None
+        if info["store_generation"] != store_generation or info["rows"] > self._size:
+            return False
+
+        def part(name):
+            prefix = f"{name}."
+            return info[name], {key[len(prefix):]: array for key, array in arrays.items() if key.startswith(prefix)}
+
+        with self._write_lock, self._rw.write():
+            start = info["rows"]
+            if "metadata" in info and self.metadata_index.load_state(*part("metadata")) and \
+                    (self.lexical_index is None or ("lexical" in info and self.lexical_index.load_state(*part("lexical")))):
+                for row in range(start, self._size):
+                    self.metadata_index.add(row, self.metadata[row])
+                    if self.lexical_index is not None:
+                        self.lexical_index.add(row, self._text(self.metadata[row]))
+                self._metadata_indexed = True
+            if "index" in info and self.index is not None and self.index.load_state(*part("index")):
+                if start < self._size:
+                    self.index.add(np.arange(start, self._size), self._matrix[start:self._size])
+            if "quantizer" in info and self.quantizer is not None and self.quantizer.load_state(*part("quantizer")):
+                self._sync_quantizer()
+        self.logger.info(f"Restored indexes over {start} rows from snapshot, {self._size - start} rows after it")
+        return True
+
     def add(self, vector, metadata):
-        self.vectors.append(vector)
-        self.metadata.append(metadata)
-        self.logger.info("Added vector to database")
+        with self._write_lock, self._rw.write():
+            self._add_batch([np.asarray(vector, dtype=np.float32).ravel()], [metadata])
+
+    def add_batch(self, vectors, metadatas):
+        """Add many rows at once (one lock acquisition, one WAL sync when persistent)"""
+        with self._write_lock, self._rw.write():
+            self._add_batch(vectors, metadatas)
+
+    def _add_batch(self, vectors, metadatas):
+        vecs = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        count = vecs.shape[0]
+        if not count:
+            return
+        if self.dim is None:
+            self.dim = vecs.shape[1]
+            if self._store is not None:
+                self._store.create(self.dim)
+        elif vecs.shape[1] != self.dim:
+            raise ValueError(f"Expected vector of dimension {self.dim}, got {vecs.shape[1]}")
+
+        norms = np.linalg.norm(vecs, axis=1)
+        # All-zero vectors stay zero rows: they score 0 against every query
+        vecs = vecs / np.where(norms > 0, norms, 1.0)[:, None]
+
+        if self._store is not None:
+            first = self._store.append_batch(vecs, norms, metadatas)
+            self._sync_from_store()
+        else:
+            self._reserve(self._size + count)
+            first = self._size
+            self._matrix[first:first + count] = vecs
+            self._norms[first:first + count] = norms
+            self._deleted[first:first + count] = False
+            self.metadata.extend(metadatas)
+            self._size += count
+        rows = np.arange(first, first + count)
+
+        if self._metadata_indexed:
+            for row, metadata in zip(rows, metadatas):
+                self.metadata_index.add(int(row), metadata)
+                if self.lexical_index is not None:
+                    self.lexical_index.add(int(row), self._text(metadata))
+        self._sync_quantizer()
+        if self.index is not None:
+            if self.index.trained:
+                self.index.add(rows, self._matrix[first:first + count])
+            elif self._size >= self.index.train_size:
+                self.index.train(self.vectors)
+        self.logger.debug(f"Added {count} vectors to database")
+
+    def flush(self):
+        """Checkpoint the on-disk store (no-op for in-memory databases)"""
+        if self._store is not None:
+            self._store.checkpoint()
+
+    def close(self):
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+        if self._store is not None:
+            self._store.close()
+
+    def keys(self) -> list:
+        """Keys of all live rows that were added with a metadata "key\""""
+        with self._rw.read():
+            self._ensure_metadata_indexed()
+            live = ~self._deleted[:self._size] if self._dead_count else None
+            return self.metadata_index.values("key", live)
 
-    def search(self, query_vector, top_k=5):
-        if not self.vectors:
+    def get(self, keys) -> list:
+        """Stored items for `keys` as {"key", "vector", "metadata"} dicts"""
+        with self._rw.read():
+            rows = self._filter_rows({"key": list(keys)})
+            return [{
+                "key": self.metadata[row].get("key"),
+                "vector": (self._matrix[row] * self._norms[row]).tolist(),
+                "metadata": self.metadata[row]
+            } for row in rows]
+
+    def update(self, key, vector, metadata) -> bool:
+        """Replace the row stored under `key`; returns False if there is none"""
+        with self._write_lock:
+            rows = self._filter_rows({"key": [key]})
+            if not rows.shape[0]:
+                return False
+            with self._rw.write():
+                self._tombstone(rows)
+                self._add_batch([np.asarray(vector, dtype=np.float32).ravel()], [metadata])
+            self._maybe_compact()
+            return True
+
+    def remove(self, keys) -> int:
+        """Delete the rows stored under `keys`; returns how many were removed"""
+        with self._write_lock:
+            rows = self._filter_rows({"key": list(keys)})
+            if rows.shape[0]:
+                with self._rw.write():
+                    self._tombstone(rows)
+                self._maybe_compact()
+            return int(rows.shape[0])
+
+    def compact(self):
+        """Rewrite storage without tombstoned rows (blocks writers, not searches)"""
+        with self._write_lock:
+            if self._dead_count:
+                self._compact(np.flatnonzero(~self._deleted[:self._size]))
+
+    def rebuild_index(self):
+        """Retrain the ANN index on the current contents (e.g. after heavy drift)"""
+        with self._write_lock, self._rw.write():
+            if self.index is not None and self._size:
+                self.index.train(self.vectors)
+
+    def search(self, query_vector, top_k=5, nprobe: int = None, filters: dict = None):
+        with self._rw.read():
+            return self._search(query_vector, top_k, nprobe, filters)
+
+    def _search(self, query_vector, top_k, nprobe, filters):
+        if not len(self):
             return []
-            
+
         try:
-            vectors = np.array(self.vectors)
-            query_vec = np.array(query_vector)
-            
-            # Handle zero vectors
-            vector_norms = np.linalg.norm(vectors, axis=1, keepdims=True)
-            query_norm = np.linalg.norm(query_vec)
-            
-            if query_norm == 0 or np.any(vector_norms == 0):
+            query_vec = np.asarray(query_vector, dtype=np.float32).ravel()
+            query_norm = float(np.linalg.norm(query_vec))
+            rows = self._filter_rows(filters)
+            if rows is not None and not rows.shape[0]:
+                return []
+
+            if query_norm == 0:
                 # Use random similarities as fallback
-                similarities = np.random.rand(len(vectors))
-            else:
-                # Calculate cosine similarities
-                norm_vectors = vectors / vector_norms
-                norm_query = query_vec / query_norm
-                similarities = np.dot(norm_vectors, norm_query)
-            
-            # Get top K results
-            indices = np.argsort(similarities)[-top_k:][::-1]
-            return [{
-                "similarity": float(similarities[i]),
-                "metadata": self.metadata[i]
-            } for i in indices]
+                if rows is None and self._dead_count:
+                    rows = np.flatnonzero(~self._deleted[:self._size])
+                count = self._size if rows is None else rows.shape[0]
+                return self._results(rows, np.random.rand(count), top_k)
+
+            unit_query = query_vec / query_norm
+            # Filtered searches scan just the matching subset; otherwise the ANN index proposes rows
+            if rows is None and self.index is not None and self.index.trained:
+                rows = self._live(self.index.candidates(unit_query, nprobe))
+            if self._quantized():
+                return self._rerank(rows, unit_query, top_k)
+            if rows is not None:
+                return self._results(rows, self._matrix[rows] @ unit_query, top_k)
+
+            # Rows are unit length, so cosine similarity is a plain dot product
+            return self._results(None, self._mask_dead(self.vectors @ unit_query), top_k)
         except Exception as e:
             self.logger.error(f"Vector search error: {str(e)}")
             return []
+
+    def search_lexical(self, query: str, top_k: int = 5, filters: dict = None) -> list:
+        """BM25 keyword search over `text_fields`; "similarity" holds the BM25 score"""
+        if self.lexical_index is None:
+            raise ValueError("Lexical search needs text_fields")
+        with self._rw.read():
+            self._ensure_metadata_indexed()
+            rows, scores = self.lexical_index.scores(query)
+            if filters:
+                keep = np.isin(rows, self._filter_rows(filters), assume_unique=True)
+            elif self._dead_count:
+                keep = ~self._deleted[rows]
+            else:
+                keep = None
+            if keep is not None:
+                rows, scores = rows[keep], scores[keep]
+            return self._results(rows, scores, top_k)
+
+    def search_batch(self, query_vectors, top_k=5, nprobe: int = None,
+                     filters: dict = None, block_bytes: int = 64 << 20) -> list:
+        """
+        Search many queries at once; returns one result list per query.
+        Exact search runs as blocked matrix-matrix products with a running
+        top-k, so score memory stays under `block_bytes` whatever the store size.
+        """
+        queries = np.atleast_2d(np.asarray(query_vectors, dtype=np.float32))
+        with self._rw.read():
+            return self._search_batch(queries, top_k, nprobe, filters, block_bytes)
+
+    def _search_batch(self, queries, top_k, nprobe, filters, block_bytes):
+        if not len(self) or not queries.shape[0] or top_k <= 0:
+            return [[] for _ in range(queries.shape[0])]
+        if self._quantized() or \
+                (not filters and self.index is not None and self.index.trained):
+            return [self._search(q, top_k, nprobe, filters) for q in queries]
+
+        try:
+            rows = self._filter_rows(filters)
+            count = self._size if rows is None else rows.shape[0]
+            if not count:
+                return [[] for _ in range(queries.shape[0])]
+
+            query_norms = np.linalg.norm(queries, axis=1)
+            zero = query_norms == 0
+            unit_queries = queries / np.where(zero, 1.0, query_norms)[:, None]
+
+            k = min(top_k, count)
+            best_scores = np.full((queries.shape[0], k), -np.inf, dtype=np.float32)
+            best_rows = np.zeros((queries.shape[0], k), dtype=np.int64)
+            block = max(k, block_bytes // (4 * queries.shape[0]))
+            for start in range(0, count, block):
+                stop = min(start + block, count)
+                block_ids = np.arange(start, stop) if rows is None else rows[start:stop]
+                block_matrix = self._matrix[start:stop] if rows is None else self._matrix[block_ids]
+                block_scores = unit_queries @ block_matrix.T
+                if rows is None and self._dead_count:
+                    block_scores[:, self._deleted[start:stop]] = -np.inf
+                block_rows = np.broadcast_to(block_ids, block_scores.shape)
+                # Merge this block into the running top-k of every query
+                scores = np.concatenate([best_scores, block_scores], axis=1)
+                merged_rows = np.concatenate([best_rows, block_rows], axis=1)
+                keep = np.argpartition(scores, -k, axis=1)[:, -k:]
+                best_scores = np.take_along_axis(scores, keep, axis=1)
+                best_rows = np.take_along_axis(merged_rows, keep, axis=1)
+
+            results = []
+            for i in range(queries.shape[0]):
+                if zero[i]:
+                    # Use random similarities as fallback
+                    live = np.flatnonzero(~self._deleted[:self._size]) if rows is None else rows
+                    results.append(self._results(live, np.random.rand(live.shape[0]), top_k))
+                else:
+                    results.append(self._results(best_rows[i], best_scores[i], top_k))
+            return results
+        except Exception as e:
+            self.logger.error(f"Vector batch search error: {str(e)}")
+            return [[] for _ in range(queries.shape[0])]
+
+    def _filter_rows(self, filters: dict):
+        """Rows matching `filters`, or None when the search is unfiltered"""
+        if not filters:
+            return None
+        self._ensure_metadata_indexed()
+        return self._live(self.metadata_index.select(filters))
+
+    def _live(self, rows: np.ndarray) -> np.ndarray:
+        """`rows` without tombstoned ones"""
+        return rows[~self._deleted[rows]] if self._dead_count else rows
+
+    def _mask_dead(self, scores: np.ndarray) -> np.ndarray:
+        """Sink the scores of tombstoned rows (scores cover every row, in order)"""
+        if self._dead_count:
+            scores[self._deleted[:self._size]] = -np.inf
+        return scores
+
+    def _tombstone(self, rows: np.ndarray):
+        if self._store is not None:
+            self._store.delete(rows)
+        else:
+            self._deleted[rows] = True
+        self._dead_count += int(rows.shape[0])
+
+    def _maybe_compact(self):
+        """Start compaction once tombstones pass `compaction_threshold` of all rows"""
+        if not self._dead_count or self._dead_count < self.compaction_threshold * self._size:
+            return
+        if not self.background_compaction:
+            self.compact()
+        elif self._compactor is None or not self._compactor.is_alive():
+            self._compactor = threading.Thread(target=self._compact_in_background,
+                                               name="VectorDBCompaction", daemon=True)
+            self._compactor.start()
+
+    def _compact_in_background(self):
+        try:
+            self.compact()
+        except Exception as e:
+            self.logger.error(f"Background compaction error: {str(e)}")
+
+    def _ensure_metadata_indexed(self):
+        """Build the metadata (and lexical) index of a reopened store on first use"""
+        if self._metadata_indexed:
+            return
+        # Concurrent searches may all get here; one builds, the rest wait for it
+        with self._build_lock:
+            if not self._metadata_indexed:
+                self.metadata_index.rebuild(self.metadata)
+                if self.lexical_index is not None:
+                    self.lexical_index.rebuild(self._text(record) for record in self.metadata)
+                self._metadata_indexed = True
+
+    def _text(self, metadata) -> str:
+        if not isinstance(metadata, dict):
+            return ""
+        return " ".join(str(metadata.get(field, "")) for field in self.text_fields)
+
+    def _compact(self, keep: np.ndarray):
+        """
+        Rewrite storage with only the `keep` rows and renumber every structure over
+        rows. The compacted copies are built while searches keep reading the
+        current ones; searches are held off only for the final swap.
+        Callers hold _write_lock.
+        """
+        mapping = np.full(self._size, -1, dtype=np.int64)
+        mapping[keep] = np.arange(keep.shape[0])
+        index, quantizer = self.index, self.quantizer
+        metadata_index, lexical_index = self.metadata_index, self.lexical_index
+        if index is not None and index.trained:
+            index = copy.deepcopy(index)
+            index.remap(mapping)
+        if quantizer is not None:
+            quantizer = copy.deepcopy(quantizer)
+            quantizer.compact(keep)
+        if self._metadata_indexed:
+            metadata_index = copy.deepcopy(metadata_index)
+            metadata_index.remap(mapping)
+            if lexical_index is not None:
+                lexical_index = copy.deepcopy(lexical_index)
+                lexical_index.remap(mapping)
+
+        if self._store is not None:
+            generation = self._store.write_generation(keep)
+        else:
+            matrix = self._matrix[keep]
+            norms = self._norms[keep]
+            metadata = [self.metadata[row] for row in keep]
+
+        with self._rw.write():
+            if self._store is not None:
+                self._store.switch_generation(generation, keep.shape[0])
+                self._sync_from_store()
+            else:
+                self._matrix, self._norms, self.metadata = matrix, norms, metadata
+                self._deleted = np.zeros(keep.shape[0], dtype=np.bool_)
+                self._size = self._capacity = keep.shape[0]
+            self.index, self.quantizer = index, quantizer
+            self.metadata_index, self.lexical_index = metadata_index, lexical_index
+            self._dead_count = 0
+        self.logger.info(f"Compacted vector database to {keep.shape[0]} rows")
+
+    def _sync_quantizer(self):
+        """Train the quantizer once enough rows exist and encode rows it has not seen"""
+        if self.quantizer is None or not self._size:
+            return
+        if not self.quantizer.trained:
+            if self._size < self.quantizer.train_size:
+                return
+            self.quantizer.train(self.vectors)
+        if self.quantizer.size < self._size:
+            self.quantizer.add(self._matrix[self.quantizer.size:self._size])
+
+    def _quantized(self) -> bool:
+        if self.quantizer is None:
+            return False
+        if not (self.quantizer.trained and self.quantizer.size == self._size):
+            # Writers keep the codes in sync; searches only catch up a reopened store, one at a time
+            with self._build_lock:
+                self._sync_quantizer()
+        return self.quantizer.trained and self.quantizer.size == self._size
+
+    def _rerank(self, rows, unit_query: np.ndarray, top_k: int) -> list:
+        """Shortlist by approximate code scores, then score the shortlist exactly"""
+        approx = self.quantizer.scores(unit_query, rows)
+        if rows is None:
+            approx = self._mask_dead(approx)
+        shortlist = self._top_k(approx, top_k * self.rerank)
+        # Sorted row order keeps reads from the on-disk matrix sequential
+        candidates = self._live(np.sort(shortlist if rows is None else rows[shortlist]))
+        return self._results(candidates, self._matrix[candidates] @ unit_query, top_k)
+
+    def _results(self, rows, scores: np.ndarray, top_k: int) -> list:
+        """Format the best `top_k` scores; `rows` maps score positions to rows"""
+        order = self._top_k(scores, top_k)
+        # Masked (tombstoned) rows only surface when fewer than top_k rows are live
+        order = order[scores[order] > -np.inf]
+        ids = order if rows is None else rows[order]
+        return [{
+            "similarity": float(scores[i]),
+            "metadata": self.metadata[row]
+        } for i, row in zip(order, ids)]
+
+    def _reserve(self, needed: int):
+        """Grow the backing arrays (amortized doubling) to hold `needed` rows"""
+        if needed <= self._capacity:
+            return
+
+        capacity = max(self._capacity, self._initial_capacity)
+        while capacity < needed:
+            capacity *= 2
+
+        matrix = np.empty((capacity, self.dim), dtype=np.float32)
+        norms = np.empty(capacity, dtype=np.float32)
+        deleted = np.zeros(capacity, dtype=np.bool_)
+        if self._size:
+            matrix[:self._size] = self._matrix[:self._size]
+            norms[:self._size] = self._norms[:self._size]
+            deleted[:self._size] = self._deleted[:self._size]
+        self._matrix, self._norms, self._deleted, self._capacity = matrix, norms, deleted, capacity
+
+    def _sync_from_store(self):
+        """Point at the store's current mappings (they move when the files grow)"""
+        self._matrix = self._store.vectors
+        self._norms = self._store.norms
+        self._deleted = self._store.deleted
+        self._capacity = self._store.capacity
+        self._size = self._store.count
+        self.metadata = self._store.records
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, top_k: int) -> np.ndarray:
+        """Indices of the `top_k` highest scores, best first"""
+        n = scores.shape[0]
+        if top_k <= 0:
+            return np.empty(0, dtype=np.int64)
+        if top_k >= n:
+            return np.argsort(scores)[::-1]
+        candidates = np.argpartition(scores, n - top_k)[n - top_k:]
+        return candidates[np.argsort(scores[candidates])[::-1]]
@@ -34,7 +34,7 @@ Requirements:
 ```python
 """
         
-        return self.llm_engine.generate(prompt)
+        return self.llm_engine.run(prompt)
 
     def execute_script(self, filename):
         try:
@@ -55,7 +55,7 @@ Explain the output of the program:
 <|assistant|>
 Explanation:"""
             
-            return self.llm_engine.generate(prompt)
+            return self.llm_engine.run(prompt)
         except Exception as e:
             return f"Error: {str(e)}"
 
@@ -74,7 +74,7 @@ Provide:
 </s>
 <|assistant|>
 """
-        return self.llm_engine.generate(prompt)
+        return self.llm_engine.run(prompt)
 
     def format_code(self, code):
         return f"```python\n{code}\n```"
@@ -27,7 +27,8 @@ Include 3 relevant results with titles and brief descriptions.
 </s>
 <|assistant|>"""
         
-        return self.llm_engine.generate(prompt)
+        # Repeated queries are answered from the response cache
+        return self.llm_engine.run(prompt, cache=True)
 
     def fetch_url(self, url):
         try:
@@ -42,6 +43,6 @@ Summarize the key information from this webpage content:
 <|assistant|>
 Summary:"""
             
-            return self.llm_engine.generate(prompt)
+            return self.llm_engine.run(prompt)
         except Exception as e:
             return f"Error: {str(e)}"
@@ -0,0 +1,80 @@
+"""
+Low-overhead latency metrics.
+Histograms use fixed log-spaced buckets, so recording a sample is one bucket
+lookup and a few integer increments with no lock; under concurrent updates an
+occasional count may be lost, which is fine for percentiles.
+"""
+import bisect
+import math
+import time
+from contextlib import contextmanager
+
+# Bucket upper bounds from 10us to ~170s, four buckets per doubling (<19% relative error)
+_BOUNDS = [1e-5 * 2 ** (i / 4) for i in range(97)]
+
+
+class LatencyHistogram:
+    """Latency distribution of one operation, in seconds"""
+
+    def __init__(self):
+        self.counts = [0] * (len(_BOUNDS) + 1)  # last bucket holds overflow
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the `q`-th percentile (0-100), in seconds"""
+        counts = list(self.counts)
+        target = math.ceil(sum(counts) * q / 100)
+        seen = 0
+        for bucket, count in enumerate(counts):
+            seen += count
+            if count and seen >= target:
+                return min(_BOUNDS[bucket], self.max) if bucket < len(_BOUNDS) else self.max
+        return 0.0
+
+    def snapshot(self) -> dict:
+        """Count plus mean, p50/p95/p99 and max in milliseconds"""
+        return {
+            "count": self.count,
+            "mean_ms": 1000 * self.total / self.count if self.count else 0.0,
+            "p50_ms": 1000 * self.percentile(50),
+            "p95_ms": 1000 * self.percentile(95),
+            "p99_ms": 1000 * self.percentile(99),
+            "max_ms": 1000 * self.max
+        }
+
+
+class LatencyMetrics:
+    """Named latency histograms, created on first use"""
+
+    def __init__(self):
+        self._histograms = {}
+
+    def histogram(self, name: str) -> LatencyHistogram:
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            histogram = self._histograms.setdefault(name, LatencyHistogram())
+        return histogram
+
+    def observe(self, name: str, seconds: float):
+        self.histogram(name).observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str):
+        """Record the duration of the `with` block under `name`, including failures"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self) -> dict:
+        return {name: histogram.snapshot() for name, histogram in sorted(self._histograms.items())}
@@ -0,0 +1,29 @@
+"""
+Server-sent events, used to stream generated text between nodes and to the web UI.
+Each event's data is one JSON document, so chunks may contain newlines.
+"""
+import json
+
+
+def format_event(data, event: str = None) -> str:
+    """One SSE frame carrying `data` as JSON"""
+    frame = f"event: {event}\n" if event else ""
+    return frame + f"data: {json.dumps(data)}\n\n"
+
+
+def iter_events(lines):
+    """(event, data) pairs from an iterable of SSE lines (str or bytes, without newlines)"""
+    event, data = "message", []
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:"):].strip())
+    if data:
+        yield event, json.loads("\n".join(data))